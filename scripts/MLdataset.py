@@ -12,6 +12,8 @@ import torch
 from torch.utils.data import Dataset
 from torch.utils.data import DataLoader
 import statsmodels.api as sm
+from scipy import stats
+from scripts.datasetcache import *
 
 
 def ee_2_deltaG(ee_value, temp=298.15):
@@ -38,76 +40,178 @@ def t_value_test(para_list, target_list, threshold=0.05):
     check whether para_list has significance effect on target_list
     threshold: pvalue <= threshold, return 1, else, return 0
     '''
-    # prepare data
+    # prepare data, pairs with missing values are left out
     y = np.array(target_list, dtype=float)
     x = np.array(para_list, dtype=float)
-    x = sm.add_constant(x)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if valid.sum() < 3:  # not enough data to test
+        return False
+    x = sm.add_constant(x[valid], has_constant='add')
 
     # fit model and get p value
-    model = sm.OLS(y,x)
+    model = sm.OLS(y[valid],x)
     results = model.fit()
     pvalue = abs(results.t_test([0,1]).pvalue)
 
     return pvalue <= threshold
 
+def get_t_test_pvalue(para_array, target_list):
+    '''
+    p values of slope t test of univariate OLS (target ~ const + para) for all columns at once
+    para_array: (n_case, n_para), target_list: (n_case,)
+    cases with missing values are left out column by column, same as t_value_test
+    return t value and p value, (n_para,) each, nan if the column has less than 3 cases or no variance
+    '''
+    x = np.array(para_array, dtype=np.float64).reshape(len(target_list), -1)
+    y = np.array(target_list, dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y)[:, None])
+    n = valid.sum(0)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y[:, None], 0.0)
+
+    # centered sums of squares over valid cases of every column
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = x.sum(0) / n
+        y_mean = y.sum(0) / n
+        dx = np.where(valid, x - x_mean, 0.0)
+        dy = np.where(valid, y - y_mean, 0.0)
+        sxx = (dx * dx).sum(0)
+        sxy = (dx * dy).sum(0)
+        syy = (dy * dy).sum(0)
+        slope = sxy / sxx
+        rss = np.maximum(syy - slope * sxy, 0.0)
+        t_value = slope / np.sqrt(rss / (n - 2) / sxx)
+    bad = (n < 3) | ~(sxx > n * (1e-13 * np.abs(x_mean)) ** 2)  # constant column (up to rounding), slope is not defined
+    t_value[bad] = np.nan
+    p_value = 2 * stats.t.sf(np.abs(t_value), np.maximum(n - 2, 1))
+    return t_value, p_value
+
+def get_fdr_pvalue(p_value):
+    '''
+    Benjamini-Hochberg adjusted p values (false discovery rate), nan p values are not counted
+    '''
+    p_value = np.asarray(p_value, dtype=np.float64)
+    adjusted = np.full(p_value.shape, np.nan)
+    idx = np.nonzero(~np.isnan(p_value))[0]
+    order = idx[np.argsort(p_value[idx], kind='stable')]
+    m = len(order)
+    if m == 0:
+        return adjusted
+    scaled = p_value[order] * m / np.arange(1, m + 1)
+    adjusted[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return adjusted
+
 
 class PairDataset(Dataset):
     """
     expdata_file 是标签, 即实验ee%信息 data/expdata.csv
     pairdata_file 是参数, 即计算所得major-minor pair信息 data/pair_data.csv
+    pairdata_file 也可以是parquet文件 data/pair_data.parquet, 此时只读取筛选后保留的列
     
     可使用filters进行筛选, 默认均为空列表, 即无筛选, 输入参数为删去
     calc_type_filter(list): 获得数据的计算方法, 如DFT-mod
     major_minor_filter(list): 有major, minor, diff三个选项
     parameter_filter(list): 根据计算得到的参数类型决定, 如SPE
     t_test_filter(bool): 是否进行t_test检验, 若是, 则删去t_test不通过的参数
+    t_test_threshold(float): t_test的p value阈值, 默认为0.05
+    t_test_fdr(bool): 是否对p value进行FDR (Benjamini-Hochberg) 校正, 默认为False
     deltaG(bool): 是否将ee%输入转换为ΔG, 默认为False
     percent(bool): 是否将ee%输入换算为小数, 默认为False
     output_new_csv(bool): 是否将处理后的数据输出到新的csv文件中, 默认为False
     structure_filter(list): 筛选complex structure, 如Xu08-1a-2a
+    nan_policy(str): 缺失值(nan)的处理方式, 在t_test之前进行, 默认为None, 即保留
+        drop_row: 删去含缺失值的structure, drop_column: 删去含缺失值的参数, impute: 用参数平均值填充
+        缺失位置保存在nan_mask中
+    dtype(torch.dtype): 参数与标签tensor的类型, 默认为torch.float64
+    pin_memory(bool): 是否将tensor放入pinned memory, 仅在cuda可用时生效, 默认为False
+    筛选后的参数与标签只转换一次为连续tensor (para_tensor, target_tensor), 按idx取数据时直接切片
+    use_cache(bool): 相同输入文件(内容hash)与相同筛选设置的结果从缓存读取, 不再重复读取和筛选, 默认为True
+    cache_dir(str): 缓存同时保存为cache_dir中的npz文件, 默认为None, 即只保存在内存中(LRU)
     """
     def __init__(self, expdata_file, pair_data_file,
                  calc_type_filter=[],
                  major_minor_filter=[],
                  parameter_filter=[],
                  t_test_filter=False,
+                 t_test_threshold=0.05,
+                 t_test_fdr=False,
                  deltaG=False,
                  percent=False,
                  output_new_csv=False,
                  structure_filter=[],
+                 nan_policy=None,
+                 dtype=torch.float64,
+                 pin_memory=False,
+                 use_cache=True,
+                 cache_dir=None,
                  ):
-        
+
+        # settings
+        assert not (deltaG and percent), 'cannot set deltaG and percent True at the same time!'
+        assert nan_policy in [None, 'drop_row', 'drop_column', 'impute'], 'nan_policy should be None, drop_row, drop_column or impute'
+        self.pair_data_file = pair_data_file
+        self.structure_filter = structure_filter
+        self.deltaG = deltaG
+        self.percent = percent
+        self.calc_type_filter = calc_type_filter
+        self.major_minor_filter = major_minor_filter
+        self.parameter_filter = parameter_filter
+        self.total_filter_set = set(self.calc_type_filter + self.major_minor_filter + self.parameter_filter)
+        self.nan_policy = nan_policy
+        self.t_test_filter = t_test_filter
+        self.t_test_threshold = t_test_threshold
+        self.t_test_fdr = t_test_fdr
+
+        # filtered data are loaded from cache if the same files and settings were used before
+        setting_dict = {'structure_filter': sorted(structure_filter), 'deltaG': deltaG, 'percent': percent,
+                        'name_filter': sorted(self.total_filter_set), 'nan_policy': nan_policy,
+                        't_test': [t_test_filter, t_test_threshold, t_test_fdr] if t_test_filter else None}
+        self.cache_key = get_dataset_key([expdata_file, pair_data_file], setting_dict) if use_cache else None
+        state = DATASET_CACHE.get(self.cache_key, cache_dir) if use_cache else None
+        if state is None:
+            self._filter_data(expdata_file)
+            if use_cache:
+                DATASET_CACHE.put(self.cache_key, {name: getattr(self, name, None) for name in STATE_LIST}, cache_dir)
+        else:
+            self.__dict__.update(state)
+        self.structure_name_list = self.expdata_df.index
+
+        # output new csv
+        if output_new_csv:
+            self.filtered_pair_data_df.to_csv(pair_data_file.rsplit('.', 1)[0] + '_new.csv', index=True)
+
+        # materialize filtered data once as contiguous tensors
+        # torch.tensor copies, tensors never share the (read-only) buffers of dataframes, which may also be kept in cache
+        self.para_tensor = torch.tensor(np.ascontiguousarray(self.filtered_pair_data_df.to_numpy(dtype=np.float64)), dtype=dtype)
+        self.target_tensor = torch.tensor(np.ascontiguousarray(self.expdata_enantio_df.to_numpy(dtype=np.float64)), dtype=dtype)
+        if pin_memory and torch.cuda.is_available():
+            self.para_tensor = self.para_tensor.pin_memory()
+            self.target_tensor = self.target_tensor.pin_memory()
+
+    def _filter_data(self, expdata_file):
+        '''
+        read expdata and pair data, apply structure, name, nan and t test filters
+        '''
         # read expdata and modify
         self.expdata_df = pd.read_csv(expdata_file, index_col=0).sort_index()  # read experimental results to a dataframe
-        self.structure_filter = structure_filter
         # apply structure filter
         if self.structure_filter != []:
             self.expdata_df = self.expdata_df.drop(self.structure_filter)
         self.expdata_enantio_df = self.expdata_df['ee(%)']  # extract ee value to a list
-        self.deltaG = deltaG
-        self.percent = percent
         if self.deltaG:  # convert ee% to delta G
-            assert self.percent == False, 'cannot set deltaG and percent True at the same time!'
             self.expdata_enantio_df = self.expdata_enantio_df.apply(ee_2_deltaG)
         if self.percent:  # divide ee% value by 100
-            assert self.deltaG == False, 'cannot set deltaG and percent True at the same time!'
             self.expdata_enantio_df = self.expdata_enantio_df / 100
 
         # read calculation data
-        self.full_pair_data_df = pd.read_csv(pair_data_file, index_col=0).sort_index()  # read calculation results to a dataframe
-        full_name_list = list(self.full_pair_data_df)  # initialize data name list for later filter
-        # apply structure filter
-        if self.structure_filter != []:
-            self.full_pair_data_df = self.full_pair_data_df.drop(self.structure_filter)
-        
-        # assert exp data match calc data
-        assert list(self.expdata_df.index) == list(self.full_pair_data_df.index), 'cases do not match!'
+        if self.pair_data_file.endswith('.parquet'):  # columnar store, only read column names here
+            from scripts.datastore import read_column_names, read_descriptor_table  # pyarrow is only needed for parquet files
+            full_name_list = read_column_names(self.pair_data_file)
+        else:
+            self.full_pair_data_df = pd.read_csv(self.pair_data_file, index_col=0).sort_index()  # read calculation results to a dataframe
+            full_name_list = list(self.full_pair_data_df)  # initialize data name list for later filter
 
         # collect name filters
-        self.calc_type_filter = calc_type_filter
-        self.major_minor_filter = major_minor_filter
-        self.parameter_filter = parameter_filter
-        self.total_filter_set = set(self.calc_type_filter + self.major_minor_filter + self.parameter_filter)
         self.data_name_list = []
         self.filted_name_list = []
         for head in full_name_list:  # filter by name
@@ -116,34 +220,74 @@ class PairDataset(Dataset):
             else:
                 self.filted_name_list.append(head)
 
+        if self.pair_data_file.endswith('.parquet'):  # only load columns kept by name filters
+            self.full_pair_data_df = read_descriptor_table(self.pair_data_file, columns=self.data_name_list).sort_index()
+
+        # apply structure filter
+        if self.structure_filter != []:
+            self.full_pair_data_df = self.full_pair_data_df.drop(self.structure_filter)
+        
+        # assert exp data match calc data
+        assert list(self.expdata_df.index) == list(self.full_pair_data_df.index), 'cases do not match!'
+
         # apply name filters
-        self.filtered_pair_data_df = self.full_pair_data_df.drop(self.filted_name_list, axis=1)
+        self.filtered_pair_data_df = self.full_pair_data_df.drop(self.filted_name_list, axis=1, errors='ignore')
 
-        # calculate p value and apply t_test filter
-        self.t_test_filter = t_test_filter
+        # handle missing values, masks are found column-wise instead of row by row
+        self.nan_mask = self.filtered_pair_data_df.isna()  # missing values before drop or impute
+        if self.nan_mask.to_numpy().any():
+            print('{} missing values in {} parameters, {} structures'.format(self.nan_mask.to_numpy().sum(),
+                  self.nan_mask.any(axis=0).sum(), self.nan_mask.any(axis=1).sum()))
+        self.nan_filted_name_list = []  # para names dropped by drop_column
+        if self.nan_policy == 'drop_row':
+            nan_structure_list = list(self.filtered_pair_data_df.index[self.nan_mask.any(axis=1)])
+            self.filtered_pair_data_df = self.filtered_pair_data_df.drop(nan_structure_list)
+            self.expdata_df = self.expdata_df.drop(nan_structure_list)
+            self.expdata_enantio_df = self.expdata_enantio_df.drop(nan_structure_list)
+            if nan_structure_list != []:
+                print('structures with missing values dropped:', nan_structure_list)
+        elif self.nan_policy == 'drop_column':
+            self.nan_filted_name_list = list(self.filtered_pair_data_df.columns[self.nan_mask.any(axis=0)])
+            self.filtered_pair_data_df = self.filtered_pair_data_df.drop(self.nan_filted_name_list, axis=1)
+            self.data_name_list = [head for head in self.data_name_list if head not in set(self.nan_filted_name_list)]
+        elif self.nan_policy == 'impute':
+            self.filtered_pair_data_df = self.filtered_pair_data_df.fillna(self.filtered_pair_data_df.mean())
+
+        # calculate p value of all parameters at once and apply t_test filter
+        self.t_test_pvalue = None
+        self.t_test_filted_name_list = []
         if self.t_test_filter:
-            self.t_test_filted_name_list = []  # para names that do not pass t test
-            for para in self.filtered_pair_data_df.keys()[1:]:
-                if not t_value_test(self.filtered_pair_data_df[para], self.expdata_enantio_df):
-                    self.t_test_filted_name_list.append(para)
-                    self.data_name_list.remove(para)
+            para_name_list = list(self.filtered_pair_data_df.keys()[1:])  # first parameter is not tested
+            _, p_value = get_t_test_pvalue(self.filtered_pair_data_df[para_name_list].to_numpy(dtype=np.float64),
+                                           self.expdata_enantio_df.to_numpy(dtype=np.float64))
+            if self.t_test_fdr:
+                p_value = get_fdr_pvalue(p_value)
+            self.t_test_pvalue = pd.Series(p_value, index=para_name_list)  # nan if not testable
+            self.t_test_filted_name_list = [para for para, passed in zip(para_name_list, p_value <= self.t_test_threshold) if not passed]  # para names that do not pass t test
+            filted_name_set = set(self.t_test_filted_name_list)
+            self.data_name_list = [head for head in self.data_name_list if head not in filted_name_set]
             if self.t_test_filted_name_list != []:
                 self.filtered_pair_data_df = self.filtered_pair_data_df.drop(self.t_test_filted_name_list, axis=1)
-        
-        self.structure_name_list = self.expdata_df.index
 
-        # output new csv
-        if output_new_csv:
-            self.filtered_pair_data_df.to_csv(pair_data_file[:-4] + '_new.csv', index=True)
-        
     def __len__(self):
         return len(self.expdata_df)
-    
+
     def __getitem__(self,idx):
-        reaction_ee = torch.tensor(self.expdata_enantio_df[idx])  # get exp ee value of reaction with idx (float to tensor) 
-        reaction_para = torch.tensor(self.filtered_pair_data_df.iloc[idx])  # get computational parameters of reaction with idx (list to tensor)
+        return self.para_tensor[idx], self.target_tensor[idx]  # computational parameters and exp ee value of reaction with idx
+
+    def get_batch(self, idx_list):
+        '''
+        parameters (batch, n_para) and targets (batch,) of reactions in idx_list, sliced in one call
+        '''
+        idx = torch.as_tensor(idx_list, dtype=torch.long)
+        return self.para_tensor[idx], self.target_tensor[idx]
 
-        return reaction_para, reaction_ee
+    def __getitems__(self, idx_list):
+        '''
+        used by DataLoader to fetch a whole batch at once, samples are sliced together and collated by default_collate
+        '''
+        para_batch, target_batch = self.get_batch(idx_list)
+        return list(zip(para_batch.unbind(0), target_batch.unbind(0)))
     
 class MVLRdataloader():
     '''
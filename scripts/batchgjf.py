@@ -1,25 +1,20 @@
 import os
 import sys
 import argparse
-# TODO: add similarity calculation and filter(RMSD) in conformation output 
+import numpy as np
+try:
+    from scripts.molecule import Molecule
+    from scripts.conformer import select_conformers
+except ImportError:  # run as a script in scripts/
+    from molecule import Molecule
+    from conformer import select_conformers
 # TODO: change cf output into a class
-# TODO: add structure cluster method to cf class
 
-num_to_ele = {'1': 'H', '2': 'He', '3': 'Li', '4': 'Be', '5': 'B', '6': 'C', '7': 'N', '8': 'O', '9': 'F', '10': 'Ne', '11': 'Na', '12': 'Mg', '13': 'Al', '14': 'Si', '15': 'P', '16': 'S', '17': 'Cl', '18': 'Ar', '19': 'K', '20': 'Ca', '21': 'Sc', '22': 'Ti', '23': 'V', '24': 'Cr', '25': 'Mn', '26': 'Fe', '27': 'Co', '28': 'Ni', '29': 'Cu', '30': 'Zn', '31': 'Ga', '32': 'Ge', '33': 'As', '34': 'Se', '35': 'Br', '36': 'Kr', '37': 'Rb', '38': 'Sr', '39': 'Y', '40': 'Zr', '41': 'Nb', '42': 'Mo', '43': 'Tc', '44': 'Ru', '45': 'Rh', '46': 'Pd', '47': 'Ag', '48': 'Cd', '49': 'In', '50': 'Sn', '51': 'Sb', '52': 'Te', '53': 'I', '54': 'Xe', '55': 'Cs', '56': 'Ba', '57': 'La', '58': 'Ce', '59': 'Pr', '60': 'Nd', '61': 'Pm', '62': 'Sm', '63': 'Eu', '64': 'Gd', '65': 'Tb', '66': 'Dy', '67': 'Ho', '68': 'Er', '69': 'Tm', '70': 'Yb', '71': 'Lu', '72': 'Hf', '73': 'Ta', '74': 'W', '75': 'Re', '76': 'Os', '77': 'Ir', '78': 'Pt', '79': 'Au', '80': 'Hg', '81': 'Tl', '82': 'Pb', '83': 'Bi', '84': 'Po', '85': 'At', '86': 'Rn', '87': 'Fr', '88': 'Ra', '89': 'Ac', '90': 'Th', '91': 'Pa', '92': 'U', '93': 'Np', '94': 'Pu', '95': 'Am', '96': 'Cm', '97': 'Bk', '98': 'Cf', '99': 'Es', '100': 'Fm', '101': 'Md', '102': 'No', '103': 'Lr', '104': 'Rf', '105': 'Db', '106': 'Sg', '107': 'Bh', '108': 'Hs', '109': 'Mt', '110': 'Ds', '111': 'Rg', '112': 'Cn', '113': 'Nh', '114': 'Fl', '115': 'Mc', '116': 'Lv', '117': 'Ts', '118': 'Og'}
-
-def get_coord_elements(structure_list):
+def get_coord_elements(molecule):
     '''
     extract all elements in coord
     '''
-    element_list = []
-    for line in structure_list:
-        atom = line.split()[0]
-        if atom.isdigit():
-            ele = num_to_ele[atom]
-        else:
-            ele = atom
-        element_list.append(ele)
-    return set(element_list)
+    return molecule.get_element_set()
     
 def get_model_file(model_file):
     # model_file = input('please input model file name:')
@@ -34,8 +29,10 @@ def get_model_file(model_file):
     mftail = mflines[emptyindex[2]:]
     return mfhead, mftail
 
-def generate_gjf_file(structure_list, mfhead, mftail, ofile_name, chk_name=None, title=None, c_m=None):
-    
+def generate_gjf_file(molecule, mfhead, mftail, ofile_name, chk_name=None, title=None, c_m=None):
+    '''
+    write molecule into gjf file with head and tail of model file
+    '''
     ofile_name = ofile_name.split('.')[0]  # modify output file name
 
     if title == None:  # blabalb # blabalb # blabalb
@@ -45,7 +42,7 @@ def generate_gjf_file(structure_list, mfhead, mftail, ofile_name, chk_name=None,
     if chk_name == None:
         chk_name = ofile_name.split('/')[-1]
     
-    mfhead[-3] = title + '\n'
+    mfhead[-3] = title.rstrip('\n') + '\n'  # irc titles end with newline
 
     for i in range(len(mfhead)):  # add chk info
         if r'%chk=' in mfhead[i]:
@@ -66,7 +63,7 @@ def generate_gjf_file(structure_list, mfhead, mftail, ofile_name, chk_name=None,
     
     if len(basis_element_lineid) > 0:  # basis part exist
         element_set = set(element_dict.keys())
-        coord_element_set = get_coord_elements(structure_list)  # get elements in structure, output set
+        coord_element_set = get_coord_elements(molecule)  # get elements in structure, output set
         basis_element_list = mftail[basis_element_lineid[0]].split()[:-1]
         if len(element_set.difference(coord_element_set)) > 0:
             for e in element_set.difference(coord_element_set):
@@ -80,7 +77,7 @@ def generate_gjf_file(structure_list, mfhead, mftail, ofile_name, chk_name=None,
         basis_element_line = ' '.join(basis_element_list) + '\n'
         mftail[basis_element_lineid[0]] = basis_element_line
 
-    out_gjf_list = mfhead + structure_list + mftail
+    out_gjf_list = mfhead + molecule.get_gjf_lines() + mftail
     with open(ofile_name+'.gjf', mode='w') as gjf:
         gjf.writelines(out_gjf_list)
 
@@ -89,168 +86,229 @@ def get_coord_from_gjf(gjf_file):
     '''
     read coord from gjf file
     include isotope info
-    return list of coord
+    return Molecule with charge and multiplicity
     '''
-    with open(gjf_file) as gf:
-        gflines = gf.readlines()
-    emptyindex = []
-    for i in range(len(gflines)):
-        if gflines[i] == '\n':
-            emptyindex.append(i)
+    return Molecule.from_gjf(gjf_file)
 
-    coord_list = gflines[emptyindex[1]+2:emptyindex[2]] 
-    c_m = gflines[emptyindex[1]+1]# include charge and multiplicity
-    return coord_list, c_m
+def iter_cf_xyz_frames(xyz_file, skip=2):
+    '''
+    read conformation search output xyz file frame by frame
+    skip: header lines before the first frame
+    each frame is atom number line, title line ('{energy} {id} ...'), coord lines, blank lines between frames are ignored
+    yield (title, Molecule), only one frame is kept in memory
+    '''
+    with open(xyz_file) as xf:
+        for i in range(skip):
+            xf.readline()
+        while True:
+            line = xf.readline()
+            if line == '':
+                return
+            if line.strip() == '':
+                continue
+            atomnum = int(line.strip())
+            title = xf.readline()
+            yield title, Molecule.from_coord_lines([xf.readline() for i in range(atomnum)])
 
 def get_coord_from_cf_xyz(xyz_file):
     # xyz_file = input('please input xyz file name:')
-    with open(xyz_file) as xf:
-        xflines = xf.readlines()[2:]
-    atomnum = int(xflines[0].strip())
-    structure_len = atomnum + 4
-    all_structure_list = [xflines[d:d+structure_len] for d in range(0, len(xflines), structure_len)]
-    for n in range(len(all_structure_list)):
-        all_structure_list[n] = [line for line in all_structure_list[n] if line.strip() !='']
-    # print(len(all_structure_list[0]))
-    # print(all_structure_list[5])
-    all_structure_dict = {all_structure_list[i][1].split()[1]:all_structure_list[i][2:] for i in range(len(all_structure_list))}
-    all_title_dict = {all_structure_list[i][1].split()[1]:all_structure_list[i][1] for i in range(len(all_structure_list))}
-    # print('total structure:', len(all_structure_dict))
+    all_structure_dict = {}
+    all_title_dict = {}
+    for title, molecule in iter_cf_xyz_frames(xyz_file):
+        all_structure_dict[title.split()[1]] = molecule
+        all_title_dict[title.split()[1]] = title
     return all_structure_dict, all_title_dict
 
-def get_coord_from_irc(irc_file):
-    with open(irc_file) as ircf:
-        irclines = ircf.readlines()
-    structure_index_list = []
-    for i in range(len(irclines)):
-        if 'NAtoms= ' in irclines[i]:
-            atomnum = int(irclines[i].split()[1])
-        if 'Input orientation:' in irclines[i]:
-            structure_index_list.append(i)
-    structure_index_list = structure_index_list[:-1]
-    
-    ircpoints = int(len(structure_index_list))
+def index_irc_frames(irc_file):
+    '''
+    first pass over irc log file, only byte offsets of structures are kept
+    the last Input orientation is dropped
+    return atom number, [offset of first coord line of each point, ...]
+    '''
+    atomnum = 0
+    offset_list = []
+    offset = 0
+    skip = 0
+    with open(irc_file, 'rb') as ircf:
+        for line in ircf:
+            offset += len(line)
+            if skip > 0:
+                skip -= 1
+                if skip == 0:
+                    offset_list.append(offset)
+                continue
+            if b'NAtoms= ' in line:
+                atomnum = int(line.split()[1])
+            if b'Input orientation:' in line:
+                skip = 4  # table header
+    return atomnum, offset_list[:-1]
+
+def iter_irc_frames(irc_file):
+    '''
+    read irc log file point by point in reorganized order: points of one direction reversed, then the other direction
+    structures are read by seeking to offsets from index_irc_frames, only one structure is kept in memory
+    yield (title, Molecule)
+    '''
+    atomnum, offset_list = index_irc_frames(irc_file)
+    ircpoints = len(offset_list)
     print(ircpoints)
-    all_structure_list = [irclines[d+5:d+5+atomnum] for d in structure_index_list]
-    for n in range(len(all_structure_list)):
-        for m in range(atomnum):
-            tmplist = all_structure_list[n][m].split()[1:]
-            all_structure_list[n][m] = '  '.join(tmplist) + '\n'
-    
-    reorg_structure_list = [all_structure_list[-i] for i in range(1, (ircpoints+1)//2)] + all_structure_list[:(ircpoints+1)//2]
-    
-    all_structure_dict = {str(i+1):reorg_structure_list[i] for i in range(len(reorg_structure_list))}
-    all_title_dict = {str(i+1):'point ' + str(i+1) + ' ' + irc_file + '\n' for i in range(len(reorg_structure_list))}
+    reorg_offset_list = [offset_list[-i] for i in range(1, (ircpoints+1)//2)] + offset_list[:(ircpoints+1)//2]
+    with open(irc_file, 'rb') as ircf:
+        for i, offset in enumerate(reorg_offset_list):
+            ircf.seek(offset)
+            table = b''.join([ircf.readline() for j in range(atomnum)])
+            yield 'point ' + str(i+1) + ' ' + irc_file + '\n', Molecule.from_log_table(table)
+
+def get_coord_from_irc(irc_file):
+    all_structure_dict = {}
+    all_title_dict = {}
+    for i, (title, molecule) in enumerate(iter_irc_frames(irc_file)):
+        all_structure_dict[str(i+1)] = molecule
+        all_title_dict[str(i+1)] = title
     return all_structure_dict, all_title_dict
     
 def get_coord_from_log(log_file):
     '''
     read coords from log file's final structure
     '''
-    with open(log_file) as logf:
-        loglines = logf.readlines()
-    structure_index_list = []
-    for i in range(len(loglines)):
-        if 'NAtoms= ' in loglines[i]:
-            atomnum = int(loglines[i].split()[1])
-        if 'Input orientation:' in loglines[i]:
-            structure_index_list.append(i)
-    structure_index = structure_index_list[-1]
-
-    coord_list = loglines[structure_index+5:structure_index+5+atomnum]
-    for m in range(atomnum):
-        tmplist = coord_list[m].split()[1:]
-        coord_list[m] = '  '.join(tmplist) + '\n'
-    return coord_list
+    return Molecule.from_log(log_file)
 
 def get_coord_from_single_xyz(xyz_file):
-    with open(xyz_file) as xf:
-        xflines = xf.readlines()
-    atomnum = int(xflines[0].strip())
-    return xflines[2:atomnum+3]
+    return Molecule.from_xyz(xyz_file)
 
 
-def from_cf_to_gjf(xyz_file, model_file, selection_list=None):
+def get_cf_energy(title):
+    '''
+    energy of conformation in title line, the first number, unit in Eh
+    return None if not found
+    '''
+    try:
+        return float(title.split()[0])
+    except (ValueError, IndexError):
+        return None
+
+def select_cf_conformers(xyz_file, selection_list=None, rmsd_threshold=0.5, energy_window=None, cluster_method='leader', heavy_only=True):
+    '''
+    filter conformations before writing gjf files, see select_conformers
+    selection_list: conformation ids to be filtered, None or [] for all
+    heavy_only: only heavy atoms are used in RMSD
+    return ids of selected conformations, sorted by energy
+    '''
+    selection_set = set(selection_list or [])
+    id_list = []
+    energy_list = []
+    coord_list = []
+    for title, molecule in iter_cf_xyz_frames(xyz_file):
+        tstmpe = title.split()[1]
+        if selection_set and tstmpe not in selection_set:
+            continue
+        id_list.append(tstmpe)
+        energy_list.append(get_cf_energy(title))
+        coord_list.append(molecule.coord)
+        atom_mask = molecule.atom_number > 1 if heavy_only else None
+    if id_list == []:
+        return []
+
+    energy = None if None in energy_list else np.array(energy_list)
+    assert energy is not None or energy_window is None, 'energy not found in title lines of ' + xyz_file
+    idx_list = select_conformers(np.stack(coord_list), energy, energy_window, rmsd_threshold, cluster_method, atom_mask)
+    return [id_list[i] for i in idx_list]
+
+def from_cf_to_gjf(xyz_file, model_file, selection_list=None, rmsd_threshold=None, energy_window=None, cluster_method='leader', heavy_only=True):
+    '''
+    write selected conformations into gjf files, frames are streamed from xyz_file
+    selection_list: conformation ids in title line, [] for all
+    rmsd_threshold: only the lowest energy conformation of each RMSD cluster (angstrom) is written, None for no filter
+    energy_window: only conformations within energy_window (kcal/mol) of the lowest one are written, None for no window
+    cluster_method: leader or hierarchical, heavy_only: RMSD of heavy atoms only
+    '''
     xyz_preflix = xyz_file.split('.')[0]
     mfhead, mftail = get_model_file(model_file)
-    all_structure_dict, all_title_dict = get_coord_from_cf_xyz(xyz_file)
     if selection_list == None:
         selection_list = input('please input selected structure tstmpe numbers:(seperate by spaces)').split()
-    if selection_list == []:
-        selection_list = all_structure_dict.keys()
-    for tstmpe in selection_list:
-        generate_gjf_file(all_structure_dict[tstmpe], mfhead, mftail, 
-        xyz_preflix + '-' + tstmpe.rjust(5,'0'))
+    if rmsd_threshold is not None or energy_window is not None:  # redundant conformations are dropped before any job is written
+        selection_list = select_cf_conformers(xyz_file, selection_list, rmsd_threshold, energy_window, cluster_method, heavy_only)
+        if selection_list == []:
+            return
+    selection_set = set(selection_list)
+    for title, molecule in iter_cf_xyz_frames(xyz_file):
+        tstmpe = title.split()[1]
+        if selection_list == [] or tstmpe in selection_set:
+            selection_set.discard(tstmpe)
+            generate_gjf_file(molecule, mfhead, mftail, 
+            xyz_preflix + '-' + tstmpe.rjust(5,'0'))
+    for tstmpe in selection_set:
+        print('structure {} not found in {}'.format(tstmpe, xyz_file))
 
 def from_irc_to_gjf(irc_file, model_file, split_index=None):
+    '''
+    write every irc point into gjf files, points are streamed from irc_file
+    split_index: split each point into two fragments at atom split_index, model_file is a list of two model files
+    '''
     irc_preflix = irc_file.split('.')[0]
     if split_index is None:
         mfhead, mftail = get_model_file(model_file)
-        all_structure_dict, all_title_dict = get_coord_from_irc(irc_file)
-        for points in all_structure_dict.keys():
-            generate_gjf_file(all_structure_dict[points], mfhead, mftail,
-             irc_preflix+'-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-p'+points.rjust(3,'0'), title=all_title_dict[points])
+        for i, (title, molecule) in enumerate(iter_irc_frames(irc_file)):
+            points = str(i+1)
+            generate_gjf_file(molecule, mfhead, mftail,
+             irc_preflix+'-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-p'+points.rjust(3,'0'), title=title)
     else: 
         split_index = int(split_index)
         assert len(model_file) == 2, 'a list including two model files needed!'
         mfhead_a, mftail_a = get_model_file(model_file[0])
         mfhead_b, mftail_b = get_model_file(model_file[1])
-        all_structure_dict, all_title_dict = get_coord_from_irc(irc_file)
-        for points in all_structure_dict.keys():
-            generate_gjf_file(all_structure_dict[points][:split_index], mfhead_a, mftail_a,
-             irc_preflix+'-a-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-a-p'+points.rjust(3,'0'), title='a-'+all_title_dict[points])
-            generate_gjf_file(all_structure_dict[points][split_index:], mfhead_b, mftail_b,
-             irc_preflix+'-b-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-b-p'+points.rjust(3,'0'), title='b-'+all_title_dict[points])
+        for i, (title, molecule) in enumerate(iter_irc_frames(irc_file)):
+            points = str(i+1)
+            generate_gjf_file(molecule[:split_index], mfhead_a, mftail_a,
+             irc_preflix+'-a-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-a-p'+points.rjust(3,'0'), title='a-'+title)
+            generate_gjf_file(molecule[split_index:], mfhead_b, mftail_b,
+             irc_preflix+'-b-p'+points.rjust(3,'0'), chk_name=irc_preflix+'-b-p'+points.rjust(3,'0'), title='b-'+title)
     
 def from_log_to_gjf(log_file, model_file, ofile_name=None):
     '''
     get coord from the last structure in a log file
     output new gjf based on this structure and a model file
     '''
-    coord_list = get_coord_from_log(log_file)
+    molecule = get_coord_from_log(log_file)
     mfhead, mftail = get_model_file(model_file)
     if ofile_name == None:
         ofile_name = log_file.split('.')[-2]
     
-    generate_gjf_file(coord_list, mfhead, mftail, ofile_name)
+    generate_gjf_file(molecule, mfhead, mftail, ofile_name)
 
 def from_gjf_to_gjf(inp_gjf, model_file, ofile_name=None):
     '''
     get coord from a gjf file
     output new gjf based on this structure and a model file
     '''
-    coord_list, c_m = get_coord_from_gjf(inp_gjf)
+    molecule = get_coord_from_gjf(inp_gjf)
     mfhead, mftail = get_model_file(model_file)
     if ofile_name == None:
         ofile_name = inp_gjf
     
-    generate_gjf_file(coord_list, mfhead, mftail, ofile_name, c_m=c_m)
+    generate_gjf_file(molecule, mfhead, mftail, ofile_name, c_m='{} {}\n'.format(molecule.charge, molecule.multiplicity))
 
 def from_gjf_to_xyz(inp_gjf, ofile_name=None):
     '''
     get coord from a gjf file
     output xyz file
     '''
-    coord_list, c_m = get_coord_from_gjf(inp_gjf)
-    atom_num = len(coord_list)
+    molecule = get_coord_from_gjf(inp_gjf)
     if ofile_name == None:
         ofile_name = inp_gjf.split('.')[0]
-    with open(ofile_name + '.xyz', 'w') as of:
-        of.write(str(atom_num) + '\n')
-        of.write(inp_gjf.split('.')[0] + '\n')
-        of.writelines(coord_list)
+    molecule.write_xyz(ofile_name + '.xyz', inp_gjf.split('.')[0])
 
 def from_xyz_to_gjf(inp_xyz, model_file, ofile_name=None):
     '''
     get coord from a xyz file
     output gjf file
     '''
-    coord_list = get_coord_from_single_xyz(inp_xyz)
+    molecule = get_coord_from_single_xyz(inp_xyz)
     mfhead, mftail = get_model_file(model_file)
     if ofile_name == None:
         ofile_name = inp_xyz
     
-    generate_gjf_file(coord_list, mfhead, mftail, ofile_name)
+    generate_gjf_file(molecule, mfhead, mftail, ofile_name)
 
 
 def parse_args():
@@ -297,6 +355,18 @@ def parse_args():
         help='conformation search output xyz file used in from_cf_to_gjf',
         default=None,
     )
+    p.add_argument(
+        '--rmsd',
+        type=float,
+        help='RMSD threshold (angstrom) of duplicate conformations in from_cf_to_gjf, optional',
+        default=None,
+    )
+    p.add_argument(
+        '--energy_window',
+        type=float,
+        help='energy window (kcal/mol) of conformations in from_cf_to_gjf, optional',
+        default=None,
+    )
     p.add_argument(
         '--xyz_file', '-x',
         type=str,
@@ -310,7 +380,7 @@ def parse_args():
         job type, currently can choose from: cf, irc, log, gjf.\n\n
 
         if cf\n
-        --cf_file and --model_gjf are needed\n
+        --cf_file and --model_gjf are needed, --rmsd and --energy_window are optional\n
         from_cf_to_gjf() will run, you will have to further input tstmpe number;\n\n
         
         if irc\n
@@ -356,7 +426,7 @@ if __name__ == '__main__':
     elif args.type == 'cf':
         assert os.path.isfile(cf_file), 'please input cf_file !'
         assert os.path.isfile(model_gjf), 'please input model_gjf !'
-        from_cf_to_gjf(cf_file, model_gjf)
+        from_cf_to_gjf(cf_file, model_gjf, rmsd_threshold=args.rmsd, energy_window=args.energy_window)
 
     elif args.type == 'irc':
         assert os.path.isfile(irc_file), 'please input irc_file !'
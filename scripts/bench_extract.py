@@ -0,0 +1,98 @@
+'''
+Benchmark of descriptor extraction with 1 worker and N workers
+a synthetic database with gaussian and xtb logs is created in a temporary directory
+
+usage: python -m scripts.bench_extract -n 200 -w 8
+'''
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from scripts.generator import *
+
+
+def write_gau_log(file_name, atom_num, padding):
+    '''
+    write a synthetic gaussian optimization log file
+    '''
+    lines = [' NAtoms=    {} NActive=    {}\n'.format(atom_num, atom_num)]
+    lines += [' synthetic SCF cycle output\n'] * padding
+    lines += ['                          Input orientation:\n',
+              ' ---------------------------------------------------------------------\n',
+              ' Center     Atomic      Atomic             Coordinates (Angstroms)\n',
+              ' Number     Number       Type             X           Y           Z\n',
+              ' ---------------------------------------------------------------------\n']
+    lines += ['{:7d}{:11d}{:12d}{:16.6f}{:12.6f}{:12.6f}\n'.format(i+1, 6, 0, 0.1*i, 0.2*i, 0.3*i) for i in range(atom_num)]
+    lines += [' ---------------------------------------------------------------------\n',
+              ' Mulliken charges:\n', '               1\n']
+    lines += ['{:6d}  C   {:.6f}\n'.format(i+1, 0.01*i) for i in range(atom_num)]
+    lines += [' Sum of Mulliken charges =   0.00000\n',
+              ' Maximum Force            0.000012     0.000450     YES\n',
+              ' RMS     Force            0.000003     0.000300     YES\n',
+              ' Thermal correction to Gibbs Free Energy=         0.123456\n',
+              ' Sum of electronic and thermal Free Energies=        -1001.234567\n',
+              ' 1\\1\\GINC-NODE\\FOpt\\RB3LYP\\6-31G(d)\\C\\USER\\01-Jan-2023\\0\\\\#p opt\\\\title\\\\0,1\n',
+              ' \\Version=ES64L-G09RevD.01\\State=1-A\\HF=-1001.3579246\\RMSD=1.0e-09\\@\n',
+              ' Normal termination of Gaussian 09\n']
+    with open(file_name, 'w') as f:
+        f.writelines(lines)
+
+def write_xtb_files(file_prefix, atom_num, padding):
+    '''
+    write synthetic xtb log and charges files
+    '''
+    lines = [' synthetic xtb output\n'] * padding
+    lines += ['        40        2.0000           -0.4123412             -11.2198 (HOMO)\n',
+              '        41                         -0.2123412              -5.7780 (LUMO)\n',
+              '          :: TOTAL ENERGY             -42.123456 Eh    ::\n',
+              '          :: GRADIENT NORM              0.000123 Eh/a0 ::\n',
+              '          :: HOMO-LUMO GAP              5.441800 eV    ::\n']
+    with open(file_prefix + '.log', 'w') as f:
+        f.writelines(lines)
+    with open(file_prefix + '.charges', 'w') as f:
+        f.writelines(['{:.8f}\n'.format(0.01*i) for i in range(atom_num)])
+
+def create_database(db_dir, structure_num, atom_num, padding):
+    '''
+    create rawmodel, DFT-mod and xtb-mod dirs with synthetic outputs
+    '''
+    os.makedirs(os.path.join(db_dir, 'rawmodel'))
+    os.makedirs(os.path.join(db_dir, 'DFT-mod', 'log'))
+    os.makedirs(os.path.join(db_dir, 'xtb-mod'))
+    for i in range(structure_num // 2):
+        for label in ['major', 'minor']:
+            model = 'Bench{:05d}-1a-2a-{}'.format(i, label)
+            open(os.path.join(db_dir, 'rawmodel', model + '.gjf'), 'w').close()
+            write_gau_log(os.path.join(db_dir, 'DFT-mod', 'log', model + '-gau.log'), atom_num, padding)
+            write_xtb_files(os.path.join(db_dir, 'xtb-mod', model + '-xtb'), atom_num, padding)
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument('--structure_num', '-n', type=int, help='number of synthetic structures', default=200)
+    p.add_argument('--workers', '-w', type=int, help='number of workers compared with 1 worker', default=os.cpu_count())
+    p.add_argument('--atom_num', type=int, help='number of atoms in each structure', default=50)
+    p.add_argument('--padding', type=int, help='number of filler lines in each log file', default=20000)
+    return p.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    atom_list = ['1', '2', '3', '4', '5']
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        create_database(db_dir, args.structure_num, args.atom_num, args.padding)
+        DB = DBgenerator(os.path.join(db_dir, 'rawmodel'))
+
+        result_dict = {}
+        for workers in [1, args.workers]:
+            DB.data_dict = {'structure': DB.model_list}
+            start = time.perf_counter()
+            DB.extract_gaussian_result(dir_list=['DFT-mod'], discriptor_list=['SPE', 'ForceRMS', 'ForceMax', 'G', 'charge'], atom_list=atom_list, workers=workers, use_cache=False)
+            DB.extract_xtb_result(dir_list=['xtb-mod'], atom_list=atom_list, workers=workers, use_cache=False)
+            result_dict[workers] = (time.perf_counter() - start, DB.data_dict)
+
+    assert result_dict[1][1] == result_dict[args.workers][1], 'results differ between 1 and {} workers'.format(args.workers)
+    print('structures: {}, log padding: {} lines'.format(args.structure_num, args.padding))
+    for workers, (elapsed, _) in result_dict.items():
+        print('workers: {:3d}  time: {:.3f} s  speedup: {:.2f}'.format(workers, elapsed, result_dict[1][0] / elapsed))
@@ -0,0 +1,123 @@
+'''
+Conformer filter of conformation search output
+
+Author: Zihao Ye
+
+conformers are compared by Kabsch RMSD (best superposition, no atom permutation) computed in numpy batches
+select_conformers drops conformers outside an energy window, then clusters the rest and keeps the lowest energy one of each cluster
+get_boltzmann_weight gives weights of conformer averaged descriptors
+coord: (n_conf, n_atom, 3) numpy array in angstrom, all conformers have the same atom order
+'''
+
+import numpy as np
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+
+HARTREE_TO_KCAL = 627.509474
+R_KCAL = 0.0019872043  # gas constant, kcal/(mol K)
+
+
+def _center(coord):
+    return coord - coord.mean(-2, keepdims=True)
+
+def _get_rmsd_from_h(h, norm2_a, norm2_b, n_atom):
+    '''
+    RMSD after best rotation from covariance h (..., 3, 3) and squared norms of centered coords
+    reflection is not allowed, the smallest singular value changes sign if det(h) < 0
+    '''
+    s = np.linalg.svd(h, compute_uv=False)
+    d = np.where(np.linalg.det(h) < 0, -1.0, 1.0)
+    e = norm2_a + norm2_b - 2 * (s[..., 0] + s[..., 1] + d * s[..., 2])
+    return np.sqrt(np.maximum(e, 0.0) / n_atom)
+
+def get_rmsd(coord, ref):
+    '''
+    Kabsch RMSD of every conformer in coord (n_conf, n_atom, 3) to ref (n_atom, 3)
+    return (n_conf,)
+    '''
+    a = _center(coord)
+    b = _center(ref)
+    h = np.einsum('cni,nj->cij', a, b)
+    return _get_rmsd_from_h(h, (a ** 2).sum((-1, -2)), (b ** 2).sum(), coord.shape[1])
+
+def get_rmsd_matrix(coord, batch_size=256):
+    '''
+    pairwise Kabsch RMSD matrix (n_conf, n_conf), computed in blocks of batch_size x batch_size conformers
+    '''
+    a = _center(coord)
+    norm2 = (a ** 2).sum((-1, -2))
+    n_conf = coord.shape[0]
+    rmsd_matrix = np.zeros((n_conf, n_conf))
+    for i in range(0, n_conf, batch_size):
+        for j in range(i, n_conf, batch_size):
+            h = np.einsum('ani,bnj->abij', a[i:i+batch_size], a[j:j+batch_size])
+            block = _get_rmsd_from_h(h, norm2[i:i+batch_size, None], norm2[None, j:j+batch_size], coord.shape[1])
+            rmsd_matrix[i:i+batch_size, j:j+batch_size] = block
+            rmsd_matrix[j:j+batch_size, i:i+batch_size] = block.T
+    np.fill_diagonal(rmsd_matrix, 0.0)
+    return rmsd_matrix
+
+def cluster_conformers(coord, rmsd_threshold=0.5, energy=None, method='leader', batch_size=256):
+    '''
+    cluster conformers by RMSD
+    leader: the lowest energy conformer not yet assigned starts a cluster, and takes all unassigned conformers within rmsd_threshold
+    hierarchical: average linkage on the pairwise RMSD matrix, clusters are cut at rmsd_threshold
+    energy: (n_conf,), conformers in file order are used if None
+    return cluster label of each conformer (n_conf,), representative (lowest energy) idx of each cluster
+    '''
+    assert method in ['leader', 'hierarchical'], 'method should be leader or hierarchical'
+    n_conf = coord.shape[0]
+    order = np.arange(n_conf) if energy is None else np.argsort(energy, kind='stable')
+    label = np.full(n_conf, -1)
+    representative_list = []
+
+    if method == 'leader':
+        for idx in order:
+            if label[idx] >= 0:
+                continue
+            free = np.nonzero(label < 0)[0]
+            rmsd = get_rmsd(coord[free], coord[idx])
+            label[free[rmsd <= rmsd_threshold]] = len(representative_list)
+            label[idx] = len(representative_list)
+            representative_list.append(idx)
+    else:
+        if n_conf == 1:
+            return np.zeros(1, dtype=np.int64), [0]
+        tree = linkage(squareform(get_rmsd_matrix(coord, batch_size), checks=False), method='average')
+        cluster = fcluster(tree, rmsd_threshold, criterion='distance')
+        for idx in order:  # clusters are numbered by energy of their representative
+            if label[idx] < 0:
+                label[cluster == cluster[idx]] = len(representative_list)
+                representative_list.append(idx)
+
+    return label, representative_list
+
+def get_boltzmann_weight(energy, temperature=298.15):
+    '''
+    Boltzmann weights of conformers, energy: (n_conf,) in Eh
+    '''
+    energy = np.asarray(energy, dtype=np.float64)
+    weight = np.exp(-(energy - energy.min()) * HARTREE_TO_KCAL / (R_KCAL * temperature))
+    return weight / weight.sum()
+
+def select_conformers(coord, energy=None, energy_window=None, rmsd_threshold=0.5, method='leader', atom_mask=None):
+    '''
+    select unique low energy conformers
+    energy: (n_conf,) in Eh, energy_window: kcal/mol above the lowest conformer, None for no window
+    rmsd_threshold: conformers within rmsd_threshold (angstrom) are duplicates, None to skip clustering
+    atom_mask: (n_atom,) bool, atoms used in RMSD, e.g. heavy atoms
+    return idx of selected conformers, sorted by energy
+    '''
+    idx_array = np.arange(coord.shape[0])
+    if energy is not None:
+        energy = np.asarray(energy, dtype=np.float64)
+        if energy_window is not None and len(idx_array) > 0:
+            idx_array = idx_array[(energy - np.nanmin(energy)) * HARTREE_TO_KCAL <= energy_window]
+        idx_array = idx_array[np.argsort(energy[idx_array], kind='stable')]
+    if rmsd_threshold is None or len(idx_array) == 0:
+        return idx_array.tolist()
+
+    sub_coord = coord[idx_array] if atom_mask is None else coord[idx_array][:, atom_mask]
+    label, representative_list = cluster_conformers(sub_coord, rmsd_threshold, None, method)  # already sorted by energy
+    print('{} conformers selected from {} ({} in energy window)'.format(len(representative_list), coord.shape[0], len(idx_array)))
+    return idx_array[representative_list].tolist()
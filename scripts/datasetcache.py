@@ -0,0 +1,159 @@
+'''
+Memoization of filtered PairDataset data
+
+Author: Zihao Ye
+
+a filtered dataset (feature dataframe, targets and filter results) is keyed by
+content hashes of input files and all settings that change the result (filters, t test, target transform, nan policy)
+recent results are kept in memory with LRU eviction, and optionally saved in cache_dir as {key}.npz
+'''
+
+import os
+import json
+import hashlib
+import functools
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 2  # increase when the filter pipeline or the saved state changes
+FRAME_LIST = ['expdata_df', 'full_pair_data_df', 'filtered_pair_data_df', 'nan_mask']  # dataframes in state
+SERIES_LIST = ['expdata_enantio_df', 't_test_pvalue']  # series in state
+NAME_LIST = ['data_name_list', 'filted_name_list', 'nan_filted_name_list', 't_test_filted_name_list']  # lists of names in state
+STATE_LIST = FRAME_LIST + SERIES_LIST + NAME_LIST  # attributes of a filtered dataset
+
+
+@functools.lru_cache(maxsize=256)
+def _get_file_hash(file_name, file_size, file_mtime):
+    sha1 = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+def get_file_hash(file_name):
+    '''
+    sha1 of file content, kept in memory while file size and mtime are unchanged
+    '''
+    stat = os.stat(file_name)
+    return _get_file_hash(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns)
+
+def get_dataset_key(file_list, setting_dict):
+    '''
+    cache key of a dataset built from file_list with settings, setting values must be json serializable
+    '''
+    key_dict = {'version': CACHE_VERSION, 'files': [get_file_hash(file_name) for file_name in file_list], 'settings': setting_dict}
+    return hashlib.sha1(json.dumps(key_dict, sort_keys=True).encode()).hexdigest()
+
+def _copy_state(state):
+    '''
+    copy dataframes and lists, so datasets never share mutable data with the cache
+    '''
+    return {name: value.copy() if isinstance(value, (pd.DataFrame, pd.Series, list)) else value for name, value in state.items()}
+
+def _get_index_array(index):
+    '''
+    numeric and datetime labels keep their dtype, other labels are saved as strings
+    '''
+    value = index.to_numpy()
+    return value if value.dtype.kind in 'biufcmM' else value.astype(str)
+
+
+class DatasetCache:
+    '''
+    LRU cache of filtered dataset states {attribute name: value}
+    max_size: number of states kept in memory
+    '''
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.state_dict = OrderedDict()  # {key: state}, most recently used last
+
+    def __len__(self):
+        return len(self.state_dict)
+
+    def clear(self):
+        self.state_dict.clear()
+
+    def get(self, key, cache_dir=None):
+        '''
+        return a copy of cached state, memory first, then cache_dir, None if not cached
+        '''
+        if key in self.state_dict:
+            self.state_dict.move_to_end(key)
+            return _copy_state(self.state_dict[key])
+        if cache_dir is not None and os.path.exists(os.path.join(cache_dir, key + '.npz')):
+            state = load_state(os.path.join(cache_dir, key + '.npz'))
+            self._add(key, state)
+            return _copy_state(state)
+        return None
+
+    def put(self, key, state, cache_dir=None):
+        '''
+        keep a copy of state in memory, and save it in cache_dir if given
+        '''
+        self._add(key, _copy_state(state))
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            save_state(os.path.join(cache_dir, key + '.npz'), state)
+
+    def _add(self, key, state):
+        self.state_dict[key] = state
+        self.state_dict.move_to_end(key)
+        while len(self.state_dict) > self.max_size:
+            self.state_dict.popitem(last=False)
+
+
+def save_state(state_file, state):
+    '''
+    save state as npz file, dataframes are split into values, index and columns
+    strings are saved as unicode arrays, so the file is read without pickle, numeric index and columns keep their dtype
+    '''
+    array_dict = {}
+    for name in FRAME_LIST:
+        if state.get(name) is None:
+            continue
+        frame = state[name]
+        array_dict[name + '.index'] = _get_index_array(frame.index)
+        array_dict[name + '.columns'] = _get_index_array(frame.columns)
+        for i, column in enumerate(frame.columns):  # columns keep their own dtype
+            value = frame[column].to_numpy()
+            array_dict['{}.{}'.format(name, i)] = value.astype(str) if value.dtype == object else value
+    for name in SERIES_LIST:
+        if state.get(name) is None:
+            continue
+        array_dict[name + '.index'] = _get_index_array(state[name].index)
+        array_dict[name + '.values'] = state[name].to_numpy(dtype=np.float64)
+    meta_dict = {name: state[name] for name in NAME_LIST if state.get(name) is not None}
+    meta_dict['series_name'] = {name: state[name].name for name in SERIES_LIST if state.get(name) is not None}
+    meta_dict['index_name'] = {name: state[name].index.name for name in FRAME_LIST + SERIES_LIST if state.get(name) is not None}
+    array_dict['meta'] = np.array(json.dumps(meta_dict))
+
+    tmp_file = state_file + '.tmp.npz'
+    np.savez(tmp_file, **array_dict)
+    os.replace(tmp_file, state_file)
+
+def load_state(state_file):
+    '''
+    read state saved by save_state
+    '''
+    with np.load(state_file, allow_pickle=False) as data:
+        meta_dict = json.loads(str(data['meta']))
+        state = {name: meta_dict[name] for name in NAME_LIST if name in meta_dict}
+        for name in FRAME_LIST:
+            if name + '.columns' not in data:
+                state[name] = None
+                continue
+            column_index = pd.Index(data[name + '.columns'])
+            state[name] = pd.DataFrame({i: data['{}.{}'.format(name, i)] for i in range(len(column_index))},
+                                       index=pd.Index(data[name + '.index'], name=meta_dict['index_name'][name]))
+            state[name].columns = column_index
+        for name in SERIES_LIST:
+            if name + '.values' not in data:
+                state[name] = None
+                continue
+            state[name] = pd.Series(data[name + '.values'], name=meta_dict['series_name'][name],
+                                    index=pd.Index(data[name + '.index'], name=meta_dict['index_name'][name]))
+    return state
+
+
+DATASET_CACHE = DatasetCache()  # shared by all PairDataset
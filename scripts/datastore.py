@@ -0,0 +1,78 @@
+'''
+Columnar descriptor store based on Parquet
+
+Author: Zihao Ye
+
+descriptor tables (data.parquet, pair_data.parquet) keep 'structure' as a string column
+and all descriptors as float64 columns
+columns are grouped by calculation method (the part before the first '_', e.g. DFT-mod_SPE_major -> DFT-mod),
+groups are saved in file metadata, so a subset of columns can be read without loading the full table
+'''
+
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def get_column_group(column_name):
+    '''
+    get calculation method of a descriptor column
+    '''
+    return column_name.split('_')[0]
+
+def write_descriptor_table(data_df, out_file, index_name='structure'):
+    '''
+    write descriptor dataframe into parquet file
+    data_df: dataframe with index_name column, other columns are converted to float64
+    '''
+    data_df = data_df.copy()
+    data_df[index_name] = data_df[index_name].astype(str)
+    column_list = [column for column in data_df.columns if column != index_name]
+    data_df[column_list] = data_df[column_list].apply(pd.to_numeric, errors='coerce').astype('float64')
+
+    column_group_dict = {}
+    for column in column_list:
+        column_group_dict.setdefault(get_column_group(column), []).append(column)
+
+    table = pa.Table.from_pandas(data_df[[index_name] + column_list], preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'column_groups'] = json.dumps(column_group_dict).encode()
+    metadata[b'index_name'] = index_name.encode()
+    pq.write_table(table.replace_schema_metadata(metadata), out_file)
+
+def read_column_names(in_file):
+    '''
+    read descriptor column names from parquet schema, index column excluded
+    '''
+    schema = pq.read_schema(in_file)
+    index_name = schema.metadata.get(b'index_name', b'structure').decode()
+    return [name for name in schema.names if name != index_name]
+
+def read_column_groups(in_file):
+    '''
+    read {method: [column, ...]} from parquet metadata
+    '''
+    schema = pq.read_schema(in_file)
+    return json.loads(schema.metadata[b'column_groups'].decode())
+
+def read_descriptor_table(in_file, columns=None, groups=None):
+    '''
+    read descriptor table from parquet file, index is structure name
+    columns: list of columns to be read, default all
+    groups: list of calculation methods to be read, combined with columns
+    only selected columns are loaded from disk
+    '''
+    schema = pq.read_schema(in_file)
+    index_name = schema.metadata.get(b'index_name', b'structure').decode()
+    if columns is None and groups is None:
+        column_list = read_column_names(in_file)
+    else:
+        column_list = list(columns) if columns is not None else []
+        if groups is not None:
+            column_group_dict = read_column_groups(in_file)
+            for group in groups:
+                column_list += [column for column in column_group_dict.get(group, []) if column not in column_list]
+
+    data_df = pd.read_parquet(in_file, columns=[index_name] + column_list)
+    return data_df.set_index(index_name)
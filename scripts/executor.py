@@ -0,0 +1,124 @@
+'''
+Subprocess executor of calculation jobs
+
+Author: Zihao Ye
+
+every job is started with subprocess in its own process group and reaped with os.wait4,
+so exit code, wall time, cpu time and peak RSS are recorded for each job
+jobs exceeding timeout are terminated (SIGTERM, then SIGKILL) together with their children
+job records can be appended to a ledger file (json lines, default data/job_ledger.jsonl)
+'''
+
+import os
+import json
+import time
+import signal
+import threading
+import subprocess
+
+
+def kill_process_group(proc, grace=5.0):
+    '''
+    send SIGTERM to the process group of proc, SIGKILL if still alive after grace seconds
+    '''
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.time() + grace
+    while time.time() < deadline:
+        if proc.returncode is not None:
+            return
+        time.sleep(0.1)
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def run_command(cmd, cwd=None, env=None, stdout=None, timeout=None, grace=5.0, started=None):
+    '''
+    run cmd (argument list) and wait for it
+    stdout: file object of stdout and stderr, default discarded
+    timeout: seconds before the job is killed, None for no limit
+    started: function called with the Popen object once the job is started, e.g. to keep it for cancelling
+    return job record {'cmd', 'returncode', 'wall_time', 'cpu_time', 'max_rss_mb', 'timed_out', 'start_time'}
+    returncode is negative signal number if the job is killed, None if cmd cannot be started
+    '''
+    record = {'cmd': ' '.join(cmd), 'returncode': None, 'wall_time': 0.0, 'cpu_time': 0.0,
+              'max_rss_mb': 0.0, 'timed_out': False, 'start_time': time.time()}
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=stdout if stdout is not None else subprocess.DEVNULL,
+                                stderr=subprocess.STDOUT, start_new_session=True)
+    except OSError as e:
+        print(e)
+        return record
+
+    if started is not None:
+        started(proc)
+
+    timer = None
+    if timeout is not None:
+        def on_timeout():
+            record['timed_out'] = True
+            kill_process_group(proc, grace)
+        timer = threading.Timer(timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+
+    while True:
+        try:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            break
+        except InterruptedError:
+            continue
+    proc.returncode = os.waitstatus_to_exitcode(status)  # process is reaped by wait4, let Popen know
+    if timer is not None:
+        timer.cancel()
+
+    record['returncode'] = proc.returncode
+    record['wall_time'] = time.perf_counter() - start
+    record['cpu_time'] = rusage.ru_utime + rusage.ru_stime
+    record['max_rss_mb'] = rusage.ru_maxrss / 1024  # ru_maxrss is in KB on linux
+    return record
+
+
+class JobLedger:
+    '''
+    append-only ledger of job records, one json record per line
+    safe to be shared by threads of one process
+    '''
+    def __init__(self, ledger_file):
+        self.ledger_file = os.path.abspath(ledger_file)
+        os.makedirs(os.path.dirname(self.ledger_file), exist_ok=True)
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        '''
+        append one job record
+        '''
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            with open(self.ledger_file, 'a') as f:
+                f.write(line)
+
+    def read(self):
+        '''
+        read all job records
+        '''
+        if not os.path.exists(self.ledger_file):
+            return []
+        with open(self.ledger_file) as f:
+            return [json.loads(line) for line in f if line.strip() != '']
+
+    def get_slow_jobs(self, n=10, key='wall_time'):
+        '''
+        get n job records with largest key (wall_time, cpu_time or max_rss_mb)
+        '''
+        return sorted(self.read(), key=lambda record: record.get(key, 0.0), reverse=True)[:n]
+
+    def get_failed_jobs(self):
+        '''
+        get job records with nonzero exit code or timeout
+        '''
+        return [record for record in self.read() if record.get('returncode') != 0 or record.get('timed_out')]
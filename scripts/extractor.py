@@ -11,11 +11,11 @@ Target:
 
 1. read all raw structures from ZS-CMJ/rawmodel, generate class, which provides methods to get data needed  
 TODO: read ee value, yield, reaction contiditions etc. from csv  
-TODO: read from hdf5 and recreate class, which can add new data to  
+data.parquet is read back into data_dict by `DBgenerator.read_original_data()`, so new data can be added to it  
 
 2. extract data specified by user and add to tmp data  
 
-3. generate hdf5 files and input data for pytorch at command 
+3. generate csv and parquet files and input data for pytorch at command 
 
 Version v0.1 target:
 mainly realize extract global data/feature  
@@ -23,39 +23,58 @@ output data into csv file
 '''
 
 import os
+import re
 import sys
+import mmap
+import functools
+import numpy as np
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
+from scripts.fileio import *
+from scripts.molecule import Molecule
+from scripts.batchgjf import iter_cf_xyz_frames
+
+BOHR_TO_ANGSTROM = 0.529177210903
+ORBITAL_WINDOW = 5  # number of orbitals kept below HOMO and above LUMO, EHOMO-4 ... ELUMO+4
+CHARGE_KIND_LIST = ['mulliken', 'hirshfeld', 'cm5', 'nbo']  # charges in gaussian log, 'charge' discriptor is mulliken
+
+# status code of every extracted value, failed values are nan
+STATUS_OK = 0
+STATUS_NOT_FOUND = 1  # item not in output file, e.g. G without frequency job
+STATUS_PARSE_ERROR = 2  # item found but not a number, e.g. ********
+STATUS_OUT_OF_RANGE = 3  # atom idx larger than atom number
+STATUS_MISSING_FILE = 4  # output file not found
+STATUS_NAME_LIST = ['ok', 'not_found', 'parse_error', 'out_of_range', 'missing_file']  # idx is status code
+
+def get_value_status(value):
+    '''
+    status code of values without known failure reason, STATUS_OK if finite else STATUS_NOT_FOUND
+    '''
+    return np.where(np.isfinite(np.asarray(value, dtype=np.float64)), STATUS_OK, STATUS_NOT_FOUND)
 
 
 def extract_xtb_SPE(file_name):
     '''
     extract single point energy from xtb log file
-    unit in Eh
+    unit in Eh, None if not found
     '''
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-    
-    for i in range(-1, -len(lines), -1):
-        if 'TOTAL ENERGY' in lines[i]:
-            # SPE = format(float(lines[i].split()[3]), '.6f')
-            SPE = float(lines[i].split()[3])
-            break
-    
+    line = find_last_line(file_name, 'TOTAL ENERGY')
+    if line is None:  # not found, e.g. truncated log
+        return None
+    SPE = float(line.split()[3])
+
     return SPE
 
 def extract_xtb_Grad(file_name):
     '''
     extract Gradient from xtb log file
-    unit in Eh/α
+    unit in Eh/α, None if not found
     '''
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-    
-    for i in range(-1, -len(lines), -1):
-        if 'GRADIENT NORM' in lines[i]:
-            # Grad = format(float(lines[i].split()[3]), '.6f')
-            Grad = float(lines[i].split()[3])
-            break
-    
+    line = find_last_line(file_name, 'GRADIENT NORM')
+    if line is None:  # not found, e.g. truncated log
+        return None
+    Grad = float(line.split()[3])
+
     return Grad
 
 def extract_xtb_Force(file_name):
@@ -67,233 +86,754 @@ def extract_xtb_Force(file_name):
 def extract_xtb_Gap(file_name):
     '''
     extract HOMO-LUMO gap from xtb log file
-    unit in eV
+    unit in eV, None if not found
     '''
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-    
-    for i in range(-1, -len(lines), -1):
-        if 'HOMO-LUMO GAP' in lines[i]:
-            # Gap = format(float(lines[i].split()[3]), '.6f')
-            Gap = float(lines[i].split()[3])
-            break
-    
+    line = find_last_line(file_name, 'HOMO-LUMO GAP')
+    if line is None:  # not found, e.g. truncated log
+        return None
+    Gap = float(line.split()[3])
+
     return Gap
 
-def extract_xtb_charge(file_name, atom_idx):
+def extract_xtb_charges(file_name):
     '''
-    extract charge info from xtb charges file
+    extract charges of all atoms from xtb charges file
+    return numpy array, atom idx starts from 0
     '''
     with open(file_name, 'r') as f:
-        lines = f.readlines()
+        return np.array(f.read().split(), dtype=np.float64)
 
+def extract_xtb_charge(file_name, atom_idx):
+    '''
+    extract charge info from xtb charges file
+    '''
     # charge = format(float(lines[atom_idx-1]), '.6f')
-    charge = float(lines[atom_idx-1])
+    charge = float(extract_xtb_charges(file_name)[atom_idx-1])
     return charge
 
+def load_xtb_wbo(file_name):
+    '''
+    read all atom pairs in xtb wbo file
+    return (n_pair, 3) numpy array of [atom_idx1, atom_idx2, wbo], atom idx starts from 1
+    '''
+    with open(file_name, 'r') as f:
+        return np.array(f.read().split(), dtype=np.float64).reshape(-1, 3)
+
+def get_wbo_matrix(wbo_array, atom_num=None):
+    '''
+    build symmetric sparse bond order matrix from [atom_idx1, atom_idx2, wbo] rows
+    matrix idx starts from 0, atom_num: matrix size, default the largest atom idx
+    '''
+    wbo_array = np.asarray(wbo_array, dtype=np.float64).reshape(-1, 3)
+    row = wbo_array[:, 0].astype(np.int64) - 1
+    col = wbo_array[:, 1].astype(np.int64) - 1
+    if atom_num is None:
+        atom_num = int(max(row.max(), col.max())) + 1 if len(wbo_array) > 0 else 0
+    upper = sparse.coo_matrix((wbo_array[:, 2], (row, col)), shape=(atom_num, atom_num)).tocsr()
+    return (upper + upper.T - sparse.diags(upper.diagonal())).tocsr()
+
+@functools.lru_cache(maxsize=256)
+def _load_wbo_matrix(file_name, file_size, file_mtime):
+    return get_wbo_matrix(load_xtb_wbo(file_name))
+
+def load_xtb_wbo_matrix(file_name):
+    '''
+    load symmetric sparse bond order matrix of xtb wbo file
+    matrices are cached per file, a changed file (size or mtime) is read again
+    '''
+    stat = os.stat(file_name)
+    return _load_wbo_matrix(os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns)
+
+def get_pair_wbo(wbo_matrix, pair_list):
+    '''
+    get bond orders of atom pairs [(atom_idx1, atom_idx2), ...] (idx starts from 1) from wbo matrix
+    pairs not in matrix are 0.0
+    return numpy array
+    '''
+    pair_array = np.array(pair_list, dtype=np.int64).reshape(-1, 2) - 1
+    wbo_list = np.zeros(len(pair_array))
+    valid = (pair_array >= 0).all(axis=1) & (pair_array < wbo_matrix.shape[0]).all(axis=1)
+    if valid.any():
+        wbo_list[valid] = np.asarray(wbo_matrix[pair_array[valid, 0], pair_array[valid, 1]]).ravel()
+    return wbo_list
+
 def extract_xtb_wbo(file_name, atom_idx1, atom_idx2):
     '''
     extract wbo info from xtb wbo file
-    if atom_idx1 > atom_idx2, swap them
     if atom pair not in file, return 0
     '''
-    if atom_idx1 > atom_idx2:
-        atom_idx1, atom_idx2 = atom_idx2, atom_idx1
-
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-
-    for line in lines:
-        if line.split()[0] == str(atom_idx1) and line.split()[1] == str(atom_idx2):
-            return float(line.split()[2])
-    
-    return 0.0
+    return float(get_pair_wbo(load_xtb_wbo_matrix(file_name), [(atom_idx1, atom_idx2)])[0])
 
 def extract_xtb_ELUMO(file_name):
     '''
     extract LUMO energy from xtb log file
-    unit in eV
+    unit in eV, None if not found
     '''
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-    
-    for i in range(-1, -len(lines), -1):
-        if '(LUMO)' in lines[i]:
-            # ELUMO = format(float(lines[i].split()[-2]), '.4f')
-            ELUMO = float(lines[i].split()[-2])
-            break
-    
+    line = find_last_line(file_name, '(LUMO)')
+    if line is None:  # not found, e.g. truncated log
+        return None
+    ELUMO = float(line.split()[-2])
+
     return ELUMO
 
 def extract_xtb_EHOMO(file_name):
     '''
     extract HOMO energy from xtb log file
-    unit in eV
+    unit in eV, None if not found
     '''
-    with open(file_name, 'r') as f:
-        lines = f.readlines()
-    
-    for i in range(-1, -len(lines), -1):
-        if '(HOMO)' in lines[i]:
-            # EHOMO = format(float(lines[i].split()[-2]), '.4f')
-            EHOMO = float(lines[i].split()[-2])
-            break
-    
+    line = find_last_line(file_name, '(HOMO)')
+    if line is None:  # not found, e.g. truncated log
+        return None
+    EHOMO = float(line.split()[-2])
+
     return EHOMO
 
-def extract_gau_SPE(file_name):  # TODO: debug on rare cases
+class GaussianLogRecord:
+    '''
+    single pass parser of Gaussian log file
+    walk through the log file line by line and collect
+    SPE, free energy, thermal correction, force RMS/max, atomic charges and final geometry
+    charges: Mulliken, Hirshfeld and CM5 (pop=hirshfeld), NBO natural charges (pop=nbo), when present
+    items not found are kept as nan (SPE, free energy, force) or empty list (charges, geometry)
+    items found but not a number are nan, and their status is kept in status_dict
+    '''
+    def __init__(self, file_name, parse=True):
+        self.file_name = file_name
+        self.SPE = np.nan  # single point energy in archive, unit in Eh
+        self.free_correction = np.nan  # thermal correction to Gibbs free energy
+        self.free_energy = np.nan  # sum of electronic and thermal free energies
+        self.force_rms = np.nan  # last RMS Force in optimization
+        self.force_max = np.nan  # last Maximum Force in optimization
+        self.mulliken_charge_list = []  # last Mulliken charges, atom idx starts from 1
+        self.hirshfeld_charge_list = []  # last Hirshfeld charges
+        self.cm5_charge_list = []  # last CM5 charges
+        self.nbo_charge_list = []  # last NBO natural charges (total density)
+        self.atom_number_list = []  # atomic numbers of final geometry
+        self.coord_list = []  # [x, y, z] of final geometry, unit in angstrom
+        self.status_dict = {}  # {item: status code} of items found but not parsed, e.g. {'SPE': STATUS_PARSE_ERROR}
+
+        if parse:
+            self._parse()
+
+    def to_dict(self):
+        '''
+        output record as dict, used by parse cache
+        '''
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, record_dict):
+        '''
+        recreate record from dict without reading log file
+        '''
+        record = cls(record_dict['file_name'], parse=False)
+        record.__dict__.update(record_dict)
+        return record
+
+    def _parse(self):
+        '''
+        read log file once, keep the last appearance of each item
+        '''
+        archive = ''  # archive block, lines between '1\1\' and '@'
+        in_archive = 0
+        in_charge = 0
+        in_hirshfeld = 0  # 1: column label line, 2: charge table
+        in_nbo = 0  # 1: before table, 2: charge table
+        nbo_spin = 0  # in alpha/beta spin part of open-shell NBO output
+        in_coord = 0
+        skip = 0
+        charge_list = []
+        cm5_list = []
+        coord_line_list = []
+        last_coord_line_list = []  # last complete geometry table
+        with open(self.file_name) as f:
+            for line in f:
+                if skip > 0:  # skip table headers
+                    skip -= 1
+                    continue
+
+                if in_archive:
+                    archive += line.strip()
+                    if '@' in line:
+                        in_archive = 0
+                    continue
+                if in_charge:
+                    if 'Sum of Mulliken' in line:
+                        in_charge = 0
+                        self.mulliken_charge_list = charge_list
+                    else:
+                        charge_list.append(self._to_float(line.split()[2]))
+                    continue
+                if in_hirshfeld == 1:
+                    label_list = line.split()
+                    hirshfeld_idx = label_list.index('Q-H') + 2 if 'Q-H' in label_list else None  # atom idx, element before values
+                    cm5_idx = label_list.index('Q-CM5') + 2 if 'Q-CM5' in label_list else None
+                    in_hirshfeld = 2
+                    continue
+                if in_hirshfeld == 2:
+                    tmplist = line.split()
+                    if len(tmplist) < 3 or not tmplist[0].isdigit():
+                        in_hirshfeld = 0
+                        if hirshfeld_idx is not None:
+                            self.hirshfeld_charge_list = charge_list
+                        if cm5_idx is not None:
+                            self.cm5_charge_list = cm5_list
+                    else:
+                        if hirshfeld_idx is not None:
+                            charge_list.append(self._to_float(tmplist[hirshfeld_idx]))
+                        if cm5_idx is not None:
+                            cm5_list.append(self._to_float(tmplist[cm5_idx]))
+                    continue
+                if in_nbo == 1:
+                    if line.startswith(' ---'):
+                        in_nbo = 2
+                    continue
+                if in_nbo == 2:
+                    if line.startswith(' ==='):
+                        in_nbo = 0
+                        self.nbo_charge_list = charge_list
+                    else:
+                        charge_list.append(self._to_float(line.split()[2]))
+                    continue
+                if in_coord:
+                    if line.startswith(' ---'):
+                        in_coord = 0
+                        last_coord_line_list = coord_line_list
+                    else:
+                        coord_line_list.append(line)
+                    continue
+
+                if line.startswith(' 1\\1\\'):
+                    archive = line.strip()
+                    in_archive = '@' not in line
+                elif 'Mulliken charges:' in line or 'Mulliken charges and spin densities:' in line:
+                    in_charge = 1
+                    skip = 1  # column index line
+                    charge_list = []
+                elif line.startswith(' Hirshfeld ') and 'using IRadAn' in line:
+                    in_hirshfeld = 1
+                    charge_list = []
+                    cm5_list = []
+                elif 'N A T U R A L   A T O M I C   O R B I T A L' in line:  # start of NBO output
+                    nbo_spin = 0
+                elif 'Alpha spin orbitals' in line or 'Beta  spin orbitals' in line:
+                    nbo_spin = 1
+                elif 'Summary of Natural Population Analysis:' in line and not nbo_spin:
+                    in_nbo = 1
+                    charge_list = []
+                elif 'Input orientation:' in line:
+                    in_coord = 1
+                    skip = 4  # table header
+                    coord_line_list = []
+                elif 'Maximum Force' in line:
+                    self._set_float('force_max', line.split()[2])
+                elif 'RMS     Force' in line:
+                    self._set_float('force_rms', line.split()[2])
+                elif 'Thermal correction to Gibbs Free Energy=' in line:
+                    self._set_float('free_correction', line.split()[-1])
+                elif 'Sum of electronic and thermal Free Energies=' in line:
+                    self._set_float('free_energy', line.split()[-1])
+
+        if last_coord_line_list != []:  # last geometry is converted once
+            molecule = Molecule.from_log_table(''.join(last_coord_line_list))
+            self.atom_number_list = molecule.atom_number.tolist()
+            self.coord_list = molecule.coord.tolist()
+
+        for item in archive.split('\\'):
+            if item.startswith('HF='):
+                self._set_float('SPE', item[3:])
+
+    @staticmethod
+    def _to_float(string):
+        '''
+        convert string to float, return nan if failed
+        '''
+        try:
+            return float(string)
+        except ValueError:
+            return np.nan
+
+    def _set_float(self, item, string):
+        '''
+        set item from string, the last appearance decides its status
+        '''
+        value = self._to_float(string)
+        setattr(self, item, value)
+        if np.isnan(value):
+            self.status_dict[item] = STATUS_PARSE_ERROR
+        else:
+            self.status_dict.pop(item, None)
+
+    def get_status(self, item):
+        '''
+        status code of scalar item, e.g. SPE, free_energy, force_rms
+        '''
+        if item in self.status_dict:
+            return self.status_dict[item]
+        return STATUS_OK if np.isfinite(getattr(self, item)) else STATUS_NOT_FOUND
+
+    def get_molecule(self):
+        '''
+        final geometry as Molecule
+        '''
+        return Molecule(self.atom_number_list, self.coord_list)
+
+    def get_charge_vector(self, kind='mulliken'):
+        '''
+        get charges of all atoms as numpy array, kind: mulliken, hirshfeld, cm5 or nbo
+        atom idx starts from 0, empty if not found
+        '''
+        assert kind in CHARGE_KIND_LIST, 'charge kind should be ' + ', '.join(CHARGE_KIND_LIST)
+        return np.array(getattr(self, kind + '_charge_list'), dtype=np.float64)
+
+    def get_charge(self, atom_idx, kind='mulliken'):
+        '''
+        get charge of atom_idx (starts from 1), kind: mulliken, hirshfeld, cm5 or nbo
+        return nan if not found
+        '''
+        charge_list = getattr(self, kind + '_charge_list')
+        if 0 < atom_idx <= len(charge_list):
+            return charge_list[atom_idx-1]
+        return np.nan
+
+    def get_charge_status(self, atom_idx, kind='mulliken'):
+        '''
+        status code of get_charge(atom_idx, kind)
+        '''
+        charge_list = getattr(self, kind + '_charge_list')
+        if charge_list == []:
+            return STATUS_NOT_FOUND
+        if not 0 < atom_idx <= len(charge_list):
+            return STATUS_OUT_OF_RANGE
+        return STATUS_OK if np.isfinite(charge_list[atom_idx-1]) else STATUS_PARSE_ERROR
+
+
+def extract_gau_SPE(file_name):
     '''
     extract single point energy from Gaussian log file
+    if error occurs, return nan
     '''
-    with open(file_name) as f:
-        gauf = f.readlines()
-    
-    end_idx = len(gauf)-2  # if no @ exist, read all lines
-    for i in range(len(gauf)):
-        if "@" in gauf[i]:
-            end_idx = i
-    gauf = gauf[:end_idx+1]
-
-    try:
-        for i in range(1,len(gauf)):
-            if 'HF=' in gauf[-i]:
-                tmplist = gauf[-i].split('\\')
-                for j in range(len(tmplist)-1):
-                    if 'HF=' in tmplist[j]:
-                        spenergy = tmplist[j][3:].strip()
-                if 'HF=' in tmplist[-1]:
-                    nextlist = gauf[-i+1].split('\\')
-                    spenergy = tmplist[-1][3:-1].strip() + nextlist[0].strip()
-                break
-            elif 'HF' in gauf[-i]:
-                spenergy = gauf[-(i-1)].split('\\')[0].strip()[1:]
-                break
-            elif 'F=-' in gauf[-i]:
-                spenergy = gauf[-i].split('\\')[0].strip()[2:]
-                break
-        spenergy = float(spenergy)
-    except:
-        spenergy = -1.0
-
-    # spenergy = format(spenergy, '.6f')
-    return spenergy
+    return GaussianLogRecord(file_name).SPE
 
 def extract_gau_Free_Energy(gau_file):
     '''
     get free energy data in gaussian output file
-    if error occurs, return -1.0
+    if error occurs, return nan
     '''
-    with open(gau_file) as f:
-        gauf = f.readlines()
-    
-    free_correction = 0.0
-    free_energy = 0.0
-    try:
-        for i in range(len(gauf)):
-            if 'Thermal correction to Gibbs Free Energy=' in gauf[i]:
-                free_correction = float(gauf[i].split()[-1])
-            if 'Sum of electronic and thermal Free Energies=' in gauf[i]:
-                free_energy = float(gauf[i].split()[-1])
-
-    except:
-        free_correction = -1.0
-        free_energy = -1.0
-
-    # free_correction = format(free_correction, '.6f')
-    # free_energy = format(free_energy, '.6f')
-    return free_correction, free_energy
+    record = GaussianLogRecord(gau_file)
+    return record.free_correction, record.free_energy
 
 def extract_gau_Force(model_name):
     '''
     extract Force from Gaussian log file
+    if error occurs, return nan
     '''
-    with open(model_name) as f:
-        gauf = f.readlines()
-    gauf.reverse()
-
-    force_rms = 0.0
-    force_max = 0.0
-    try:
-        for i in range(len(gauf)):
-            if 'Maximum Force' in gauf[i]:
-                force_max = float(gauf[i].split()[2])
-                break
-            if 'RMS     Force' in gauf[i]:
-                force_rms = float(gauf[i].split()[2])
-
-    except:
-        force_rms = -1.0
-        force_max = -1.0
-
-    # force_rms = format(force_rms, '.6f')
-    # force_max = format(force_max, '.6f')
-
-    return force_rms, force_max
+    record = GaussianLogRecord(model_name)
+    return record.force_rms, record.force_max
 
 def extract_gau_Charge(model_name, atom_idx):
     '''
     extract charge info from Gaussian log file
+    if error occurs, return nan
     '''
-    with open(model_name) as f:
-        gauf = f.readlines()
-    gauf.reverse()
+    return GaussianLogRecord(model_name).get_charge(atom_idx)
 
-    charge = 0.0
-    try:
-        for i in range(len(gauf)):
-            if 'Mulliken charges:' in gauf[i]:
-                charge_idx = i
-                break
-        charge = float(gauf[charge_idx-atom_idx-1].split()[2])
-    except:
-        charge = -1.0
-
-    # charge = format(charge, '.6f')
-    return charge
+def extract_gau_charges(file_name, kind='mulliken'):
+    '''
+    extract charges of all atoms from Gaussian log file in one read
+    kind: mulliken, hirshfeld, cm5 or nbo
+    return numpy array, atom idx starts from 0
+    '''
+    return GaussianLogRecord(file_name).get_charge_vector(kind)
+
+class FchkFile:
+    '''
+    reader of Gaussian formatted checkpoint (fchk) file
+    section headers are indexed in one pass over the memory-mapped file,
+    array sections are converted into numpy arrays only when requested and then kept
+    e.g. FchkFile(f).get('Alpha Orbital Energies'), FchkFile(f).get('Number of alpha electrons')
+    '''
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.section_dict = {}  # {name: (type, value)} for scalars, {name: (type, (start, end))} for arrays
+        self.array_dict = {}  # parsed arrays
+        with open(file_name, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(file_name) > 0 else b''
+        self._index()
+
+    def _index(self):
+        '''
+        header line: name (40 columns), type (I, R, C, L, H), value or N= number of array items
+        data lines of arrays start with space
+        '''
+        data = self.data
+        pos = data.find(b'\n') + 1  # title line
+        pos = data.find(b'\n', pos) + 1  # job type line
+        if pos == 0:
+            return
+        last_array = None
+        while 0 < pos < len(data):
+            end = data.find(b'\n', pos)
+            if end == -1:
+                end = len(data)
+            if data[pos:pos+1] not in [b' ', b'\n', b'\r']:  # header line
+                if last_array is not None:
+                    name, data_type, start = last_array
+                    self.section_dict[name] = (data_type, (start, pos))
+                    last_array = None
+                line = data[pos:end].decode()
+                name = line[:40].strip()
+                data_type = line[40:].split()[0]
+                if 'N=' in line[40:]:
+                    last_array = (name, data_type, end + 1)
+                else:
+                    value = line[40:].split(None, 1)[1].strip()
+                    if data_type == 'I':
+                        value = int(value)
+                    elif data_type == 'R':
+                        value = float(value.replace('D', 'E'))
+                    self.section_dict[name] = (data_type, value)
+            pos = end + 1
+        if last_array is not None:
+            name, data_type, start = last_array
+            self.section_dict[name] = (data_type, (start, len(data)))
+
+    def keys(self):
+        return list(self.section_dict.keys())
+
+    def __contains__(self, name):
+        return name in self.section_dict
+
+    def get(self, name, default=None):
+        '''
+        get scalar value or numpy array of section
+        return default if section not found
+        '''
+        if name not in self.section_dict:
+            return default
+        data_type, value = self.section_dict[name]
+        if not isinstance(value, tuple):
+            return value
+        if name not in self.array_dict:
+            start, end = value
+            text = bytes(self.data[start:end])
+            if data_type == 'I':
+                self.array_dict[name] = np.array(text.split(), dtype=np.int64)
+            elif data_type == 'R':
+                self.array_dict[name] = np.array(text.replace(b'D', b'E').split(), dtype=np.float64)
+            else:
+                self.array_dict[name] = text.decode()
+        return self.array_dict[name]
+
+    def get_coord(self):
+        '''
+        get (n_atom, 3) coordinates, unit in angstrom
+        '''
+        return self.get('Current cartesian coordinates').reshape(-1, 3) * BOHR_TO_ANGSTROM
+
+    def get_molecule(self):
+        '''
+        current geometry as Molecule
+        '''
+        return Molecule(self.get('Atomic numbers'), self.get_coord(), int(self.get('Charge', 0)), int(self.get('Multiplicity', 1)))
+
+    def get_orbital_energy(self):
+        '''
+        get occupied and virtual orbital energies of both spins, unit in Eh
+        restricted wavefunction (no beta orbitals in file): every spatial orbital is counted once
+        return occupied energies (descending), virtual energies (ascending)
+        '''
+        alpha_energy = self.get('Alpha Orbital Energies')
+        beta_energy = self.get('Beta Orbital Energies')
+        alpha_num = self.get('Number of alpha electrons')
+        beta_num = self.get('Number of beta electrons')
+        if beta_energy is None:
+            return np.sort(alpha_energy[:alpha_num])[::-1], np.sort(alpha_energy[alpha_num:])
+        occ_energy = np.concatenate([alpha_energy[:alpha_num], beta_energy[:beta_num]])
+        vir_energy = np.concatenate([alpha_energy[alpha_num:], beta_energy[beta_num:]])
+        return np.sort(occ_energy)[::-1], np.sort(vir_energy)
+
+    def get_orbital_window(self, n=ORBITAL_WINDOW):
+        '''
+        get energies of HOMO, HOMO-1, ..., HOMO-(n-1) and LUMO, LUMO+1, ..., LUMO+(n-1)
+        orbitals out of range are nan
+        open-shell: HOMO is the highest occupied orbital of both spins, LUMO is the lowest virtual orbital of both spins
+        '''
+        occ_energy, vir_energy = self.get_orbital_energy()
+        homo_window = np.full(n, np.nan)
+        lumo_window = np.full(n, np.nan)
+        homo_window[:min(n, len(occ_energy))] = occ_energy[:n]
+        lumo_window[:min(n, len(vir_energy))] = vir_energy[:n]
+        return homo_window, lumo_window
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
 
 def extract_gau_MO(fchk_file):
     '''
     extract EHOMO ELUMO gap from fchk file
     '''
-    with open(fchk_file) as ff:
-        fchkf = ff.readlines()
-    
-    Ehomo = 0.0
-    Elumo = 0.0
-    for i in range(len(fchkf)):
-        if 'Number of electrons' in fchkf[i]:
-            tot_electron = int(fchkf[i].split()[-1])
-            if tot_electron%2 == 0:
-                occ_orbital = tot_electron/2
-            else:
-                occ_orbital = tot_electron//2 + 1
-            break
-    
-    orbital_idx = 0
-    for i in range(len(fchkf)):
-        if 'Alpha Orbital Energies ' in fchkf[i]:
-            orbital_idx = i
-            break
+    fchk = FchkFile(fchk_file)
+    homo_window, lumo_window = fchk.get_orbital_window(1)
+    fchk.close()
+    Ehomo = float(homo_window[0])
+    Elumo = float(lumo_window[0])
+    gap = Ehomo - Elumo
     
-    HOMO_location = [int(occ_orbital//5), int(occ_orbital%5)]
-    LUMO_location = [int((occ_orbital+1)//5), int((occ_orbital+1)%5)]
+    return Ehomo, Elumo, gap
 
-    if HOMO_location[1] == 0:
-        homostr = fchkf[orbital_idx + HOMO_location[0]].split()[-1]
-    else:
-        homostr = fchkf[orbital_idx + HOMO_location[0] + 1].split()[HOMO_location[1] - 1]
 
-    if LUMO_location[1] == 0:
-        lumostr = fchkf[orbital_idx + LUMO_location[0]].split()[-1]
-    else:
-        lumostr = fchkf[orbital_idx + LUMO_location[0] + 1].split()[LUMO_location[1] - 1]
-
-    # gap = format(float(homostr) - float(lumostr), '.6f')
-    # Ehomo = format(float(homostr), '.6f')
-    # Elumo = format(float(lumostr), '.6f')
-    gap = float(homostr) - float(lumostr)
-    Ehomo = float(homostr)
-    Elumo = float(lumostr)
-    
-    return Ehomo, Elumo, gap
+def parse_xtb_log(file_name):
+    '''
+    parse all global data in xtb log file
+    items not found (e.g. truncated log) or not a number are None, their status codes are kept in status_dict
+    '''
+    record = {'status_dict': {}}
+    for item, func in [('SPE', extract_xtb_SPE), ('Grad', extract_xtb_Grad), ('Gap', extract_xtb_Gap),
+                       ('ELUMO', extract_xtb_ELUMO), ('EHOMO', extract_xtb_EHOMO)]:
+        try:
+            record[item] = func(file_name)
+            record['status_dict'][item] = STATUS_OK if record[item] is not None else STATUS_NOT_FOUND  # None: line not found
+        except (ValueError, IndexError):  # line found but value not readable
+            record[item] = None
+            record['status_dict'][item] = STATUS_PARSE_ERROR
+    return record
+
+def parse_xtb_charges(file_name):
+    '''
+    parse charges of all atoms in xtb charges file
+    '''
+    return {'charge': extract_xtb_charges(file_name).tolist()}
+
+def parse_xtb_wbo(file_name):
+    '''
+    parse all atom pairs in xtb wbo file
+    '''
+    return {'wbo': load_xtb_wbo(file_name).tolist()}
+
+def parse_xyz(file_name):
+    '''
+    parse atoms and coordinates in xyz file, unit in angstrom
+    '''
+    molecule = Molecule.from_xyz(file_name)
+    return {'atom_number_list': molecule.atom_number.tolist(), 'coord_list': molecule.coord.tolist()}
+
+def parse_xyz_ensemble(file_name):
+    '''
+    parse conformers in multi-frame xyz file, energy (Eh) is the first number of title line
+    '''
+    record = {'energy_list': [], 'atom_number_list': [], 'coord_list': []}
+    for title, molecule in iter_cf_xyz_frames(file_name, skip=0):
+        record['energy_list'].append(float(title.split()[0]))
+        record['atom_number_list'].append(molecule.atom_number.tolist())
+        record['coord_list'].append(molecule.coord.tolist())
+    return record
+
+def parse_gau_log(file_name):
+    '''
+    parse gaussian log file into GaussianLogRecord dict
+    '''
+    return GaussianLogRecord(file_name).to_dict()
 
+def parse_gau_fchk(file_name):
+    '''
+    parse orbital energies in fchk file
+    HOMO-n and LUMO+n energies are kept in homo_window and lumo_window (nan as None)
+    '''
+    fchk = FchkFile(file_name)
+    homo_window, lumo_window = fchk.get_orbital_window()
+    fchk.close()
+    Ehomo = float(homo_window[0])
+    Elumo = float(lumo_window[0])
+    return {'EHOMO': Ehomo, 'ELUMO': Elumo, 'Gap': Ehomo - Elumo,
+            'homo_window': [None if np.isnan(e) else float(e) for e in homo_window],
+            'lumo_window': [None if np.isnan(e) else float(e) for e in lumo_window]}
+
+# parser name: (parser, version), increase version when the record of a parser changes
+PARSER_DICT = {
+    'xtb_log': (parse_xtb_log, 2),
+    'xtb_charges': (parse_xtb_charges, 1),
+    'xtb_wbo': (parse_xtb_wbo, 1),
+    'xyz': (parse_xyz, 1),
+    'xyz_ensemble': (parse_xyz_ensemble, 1),
+    'gau_log': (parse_gau_log, 3),
+    'gau_fchk': (parse_gau_fchk, 3),
+}
+
+def parse_file(parser_name, file_name):
+    '''
+    parse one file by parser_name
+    missing or unreadable files give {'file_status': status code} instead of raising, so one bad file does not stop the extraction
+    '''
+    try:
+        return PARSER_DICT[parser_name][0](file_name)
+    except FileNotFoundError:
+        return {'file_status': STATUS_MISSING_FILE}
+    except Exception as e:  # truncated or broken file
+        print('failed to parse {}: {}'.format(file_name, e))
+        return {'file_status': STATUS_PARSE_ERROR}
+
+def get_file_status(record):
+    '''
+    status code of the whole file of a record, STATUS_OK if the file was parsed
+    '''
+    return record.get('file_status', STATUS_OK)
+
+def parse_structure(job_list):
+    '''
+    parse all files of one structure
+    job_list: [(parser_name, file_name), ...]
+    return list of records in the same order
+    '''
+    return [parse_file(parser_name, file_name) for parser_name, file_name in job_list]
+
+def parse_all_structures(structure_job_list, workers=1, cache=None):
+    '''
+    run parse_structure for every structure
+    workers > 1: structures are parsed in a process pool, result order follows structure_job_list
+    cache: ParseCache, only files not in cache (or changed) are parsed
+    records of missing or unreadable files are {'file_status': status code}, they are not cached
+    '''
+    structure_record_list = [[None] * len(job_list) for job_list in structure_job_list]
+
+    # collect jobs missing in cache, still grouped by structure
+    miss_idx_list = []  # [(structure idx, [job idx, ...]), ...]
+    for i, job_list in enumerate(structure_job_list):
+        job_idx_list = []
+        for j, (parser_name, file_name) in enumerate(job_list):
+            record = None
+            if cache is not None:
+                record = cache.get(file_name, parser_name, PARSER_DICT[parser_name][1])
+            if record is None:
+                job_idx_list.append(j)
+            else:
+                structure_record_list[i][j] = record
+        if job_idx_list != []:
+            miss_idx_list.append((i, job_idx_list))
+
+    miss_job_list = [[structure_job_list[i][j] for j in job_idx_list] for i, job_idx_list in miss_idx_list]
+    if cache is not None:  # stamps are taken before parsing, files still being written are not cached as complete
+        miss_stamp_list = [[cache.get_file_stamp(file_name) for parser_name, file_name in job_list] for job_list in miss_job_list]
+    if workers is None or workers <= 1:
+        miss_record_list = [parse_structure(job_list) for job_list in miss_job_list]
+    else:
+        chunksize = max(1, len(miss_job_list) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            miss_record_list = list(executor.map(parse_structure, miss_job_list, chunksize=chunksize))
+
+    cache_item_list = []
+    for k, ((i, job_idx_list), record_list) in enumerate(zip(miss_idx_list, miss_record_list)):
+        for l, (j, record) in enumerate(zip(job_idx_list, record_list)):
+            structure_record_list[i][j] = record
+            parser_name, file_name = structure_job_list[i][j]
+            if cache is not None and get_file_status(record) == STATUS_OK:
+                cache_item_list.append((file_name, parser_name, PARSER_DICT[parser_name][1], record, miss_stamp_list[k][l]))
+    if cache_item_list != []:
+        cache.put_many(cache_item_list)
+    parsed_num = sum([len(job_idx_list) for i, job_idx_list in miss_idx_list])
+    failed_num = sum([get_file_status(record) != STATUS_OK for record_list in miss_record_list for record in record_list])
+    print('parsed {} files ({} missing or failed), {} loaded from cache'.format(parsed_num, failed_num, sum([len(job_list) for job_list in structure_job_list]) - parsed_num))
+
+    return structure_record_list
+
+def extract_xtb_record(dir, record_dict, discriptor_list, atom_list, pair_list=None, status_dict=None):
+    '''
+    extract all discriptors of one structure in xtb dir
+    record_dict: {parser_name: record}
+    pair_list: atom pairs of wbo discriptor, [('1', '2'), ...]
+    status_dict: filled with {data_name: status code} if given
+    return dict of {data_name: data}, failed data are nan
+    '''
+    data_dict = {}
+    if status_dict is None:
+        status_dict = {}
+    for discriptor in discriptor_list:
+        if discriptor == 'charge':
+            file_status = get_file_status(record_dict['xtb_charges'])
+            charge_list = record_dict['xtb_charges'].get('charge', [])
+            for atom in atom_list:
+                data_name = dir + '_' + discriptor + '-' + atom
+                if file_status != STATUS_OK:
+                    data_dict[data_name] = np.nan
+                    status_dict[data_name] = file_status
+                elif 0 < int(atom) <= len(charge_list):
+                    data_dict[data_name] = charge_list[int(atom)-1]
+                    status_dict[data_name] = STATUS_OK
+                else:
+                    data_dict[data_name] = np.nan
+                    status_dict[data_name] = STATUS_OUT_OF_RANGE
+            continue
+        if discriptor == 'wbo':  # wbo matrix is built once, all pairs are read from it
+            file_status = get_file_status(record_dict['xtb_wbo'])
+            if file_status == STATUS_OK:
+                wbo_list = get_pair_wbo(get_wbo_matrix(record_dict['xtb_wbo']['wbo']), [(int(i), int(j)) for i, j in pair_list])
+            else:
+                wbo_list = np.full(len(pair_list), np.nan)
+            for (i, j), wbo in zip(pair_list, wbo_list):
+                data_dict[dir + '_' + discriptor + '-' + str(i) + '-' + str(j)] = float(wbo)
+                status_dict[dir + '_' + discriptor + '-' + str(i) + '-' + str(j)] = file_status
+            continue
+        file_status = get_file_status(record_dict['xtb_log'])
+        if file_status != STATUS_OK:
+            data_dict[dir + '_' + discriptor] = np.nan
+            status_dict[dir + '_' + discriptor] = file_status
+            continue
+        data = record_dict['xtb_log'][discriptor]
+        data_dict[dir + '_' + discriptor] = np.nan if data is None else data
+        status_dict[dir + '_' + discriptor] = record_dict['xtb_log']['status_dict'][discriptor]
+
+    return data_dict
+
+def extract_gau_record(dir, record_dict, discriptor_list, atom_list, status_dict=None):
+    '''
+    extract all discriptors of one structure in gaussian dir
+    record_dict: {parser_name: record}
+    status_dict: filled with {data_name: status code} if given
+    return dict of {data_name: data}, failed data are nan
+    '''
+    log_status = get_file_status(record_dict['gau_log']) if 'gau_log' in record_dict else STATUS_OK
+    fchk_status = get_file_status(record_dict['gau_fchk']) if 'gau_fchk' in record_dict else STATUS_OK
+    if 'gau_log' in record_dict and log_status == STATUS_OK:
+        record = GaussianLogRecord.from_dict(record_dict['gau_log'])
+
+    data_dict = {}
+    if status_dict is None:
+        status_dict = {}
+    for discriptor in discriptor_list:
+        if discriptor in ['charge'] + CHARGE_KIND_LIST:  # whole charge vector is read once, columns are sliced from it
+            kind = 'mulliken' if discriptor == 'charge' else discriptor
+            for atom in atom_list:
+                if log_status != STATUS_OK:
+                    data_dict[dir + '_' + discriptor + '-' + atom] = np.nan
+                    status_dict[dir + '_' + discriptor + '-' + atom] = log_status
+                    continue
+                data_dict[dir + '_' + discriptor + '-' + atom] = record.get_charge(int(atom), kind)
+                status_dict[dir + '_' + discriptor + '-' + atom] = record.get_charge_status(int(atom), kind)
+            continue
+
+        file_status = fchk_status if re.match(r'^(EHOMO|ELUMO|Gap)', discriptor) else log_status  # orbitals are read from fchk file
+        if file_status != STATUS_OK:
+            data_dict[dir + '_' + discriptor] = np.nan
+            status_dict[dir + '_' + discriptor] = file_status
+            continue
+        status = None
+        if discriptor == 'SPE':
+            data, status = record.SPE, record.get_status('SPE')
+        elif discriptor == 'G':
+            data, status = record.free_energy, record.get_status('free_energy')
+        elif discriptor == 'ForceRMS':
+            data, status = record.force_rms, record.get_status('force_rms')
+        elif discriptor == 'ForceMax':
+            data, status = record.force_max, record.get_status('force_max')
+        elif discriptor in ['EHOMO', 'ELUMO', 'Gap']:
+            data = record_dict['gau_fchk'][discriptor]
+        elif re.match(r'^EHOMO-\d+$', discriptor):
+            data = record_dict['gau_fchk']['homo_window'][int(discriptor.split('-')[1])]
+        elif re.match(r'^ELUMO\+\d+$', discriptor):
+            data = record_dict['gau_fchk']['lumo_window'][int(discriptor.split('+')[1])]
+        data = np.nan if data is None else data  # orbitals out of range are saved as None
+        data_dict[dir + '_' + discriptor] = data
+        status_dict[dir + '_' + discriptor] = status if status is not None else int(get_value_status(data))
+
+    return data_dict
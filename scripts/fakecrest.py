@@ -0,0 +1,55 @@
+'''
+Fake crest for testing conformation search without CREST
+
+Author: Zihao Ye
+
+usage: python fakecrest.py input.xyz [--gfn2 --chrg 0 --uhf 0 -T 1]
+crest_conformers.xyz is written in current dir, conformers are rotated and slightly shaken copies of the input,
+every second conformer is a near duplicate of the previous one, energies (Eh) increase along the ensemble
+FAKECREST_NCONF (number of conformers, default 6), FAKECREST_SLEEP (seconds) and FAKECREST_FAIL (exit code) environment variables
+'''
+
+import os
+import sys
+import time
+import zlib
+import numpy as np
+
+
+def random_rotation(rng):
+    q = rng.normal(size=4)
+    q /= np.linalg.norm(q)
+    w, x, y, z = q
+    return np.array([[1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)],
+                     [2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+                     [2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)]])
+
+
+if __name__ == '__main__':
+    time.sleep(float(os.environ.get('FAKECREST_SLEEP', '0')))
+    xyz_name = sys.argv[1]
+    if int(os.environ.get('FAKECREST_FAIL', '0')) != 0:
+        print(' crest failed')
+        sys.exit(int(os.environ['FAKECREST_FAIL']))
+
+    with open(xyz_name) as f:
+        atom_num = int(f.readline().split()[0])
+        f.readline()
+        line_list = [f.readline().split() for i in range(atom_num)]
+    element_list = [tmplist[0] for tmplist in line_list]
+    coord = np.array([tmplist[1:4] for tmplist in line_list], dtype=np.float64)
+
+    rng = np.random.default_rng(zlib.crc32(os.path.basename(xyz_name).encode()))
+    lines = []
+    conf_coord = coord
+    for i in range(int(os.environ.get('FAKECREST_NCONF', '6'))):
+        if i % 2 == 0:  # new conformer
+            conf_coord = coord + rng.normal(scale=0.5, size=coord.shape)
+        shaken = conf_coord + rng.normal(scale=0.01, size=coord.shape)
+        shaken = (shaken - shaken.mean(0)) @ random_rotation(rng).T
+        lines.append('{}\n'.format(atom_num))
+        lines.append('      {:.8f}\n'.format(-10.0 + 0.002 * i))
+        lines += ['{:<2s} {:14.8f} {:14.8f} {:14.8f}\n'.format(element, *xyz) for element, xyz in zip(element_list, shaken)]
+    with open('crest_conformers.xyz', 'w') as f:
+        f.writelines(lines)
+    print(' CREST terminated normally.')
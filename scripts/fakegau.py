@@ -0,0 +1,91 @@
+'''
+Fake gaussian and formchk for testing job submission without gaussian
+
+Author: Zihao Ye
+
+usage: python fakegau.py < input.gjf > output.log
+       python fakegau.py formchk input.chk output.fchk
+coordinates in gjf are written back as Input orientation of a normally terminated log file,
+the chk file named by %chk is created for formchk
+FAKEGAU_SLEEP (seconds) and FAKEGAU_FAIL (exit code) environment variables control the run time and failure
+'''
+
+import os
+import sys
+import time
+
+ATOM_NUMBER_DICT = {'H': 1, 'C': 6, 'N': 7, 'O': 8, 'F': 9, 'P': 15, 'S': 16, 'Cl': 17, 'Br': 35, 'I': 53}
+
+
+def read_gjf(gjf_lines):
+    '''
+    get chk file name and coord list [[element, x, y, z], ...] from gjf lines
+    '''
+    chk_name = None
+    for line in gjf_lines:
+        if line.lower().startswith('%chk='):
+            chk_name = line.strip().split('=', 1)[1]
+    coord_list = []
+    blank_num = 0
+    for line in gjf_lines:
+        if line.strip() == '':
+            blank_num += 1
+            if blank_num == 3:
+                break
+        elif blank_num == 2 and len(line.split()) == 4:
+            coord_list.append(line.split())
+    return chk_name, coord_list
+
+def write_log(coord_list):
+    lines = [' Entering Gaussian System, fake gaussian\n',
+             ' NAtoms=    {} NActive=    {}\n'.format(len(coord_list), len(coord_list))]
+    lines += ['                          Input orientation:\n',
+              ' ---------------------------------------------------------------------\n',
+              ' Center     Atomic      Atomic             Coordinates (Angstroms)\n',
+              ' Number     Number       Type             X           Y           Z\n',
+              ' ---------------------------------------------------------------------\n']
+    for i, coord in enumerate(coord_list):
+        atom_number = ATOM_NUMBER_DICT.get(coord[0], 6)
+        lines.append('{:7d}{:11d}{:12d}{:16.6f}{:12.6f}{:12.6f}\n'.format(i+1, atom_number, 0, *[float(x) for x in coord[1:]]))
+    lines += [' ---------------------------------------------------------------------\n',
+              ' Mulliken charges:\n', '               1\n']
+    lines += ['{:6d}  {}   {:.6f}\n'.format(i+1, coord[0], 0.0) for i, coord in enumerate(coord_list)]
+    lines += [' Sum of Mulliken charges =   0.00000\n',
+              ' 1\\1\\GINC-FAKE\\SP\\RB3LYP\\6-31G(d)\\C\\USER\\01-Jan-2023\\0\\\\#p sp\\\\title\\\\0,1\n',
+              ' \\Version=ES64L-G09RevD.01\\State=1-A\\HF=-{:.7f}\\RMSD=1.0e-09\\@\n'.format(100.0 + len(coord_list)),
+              ' Normal termination of Gaussian 09\n']
+    sys.stdout.writelines(lines)
+
+def write_fchk(chk_name, fchk_name):
+    with open(chk_name) as f:
+        atom_num = int(f.read().split()[0])
+    electron_num = 2 * atom_num
+    orbital_num = electron_num
+    energy_list = [-1.0 + 0.01*i for i in range(orbital_num)]
+    lines = ['fake fchk\n',
+             'SP        RB3LYP                                                      6-31G(d)\n',
+             '{:<40s}   I     {:12d}\n'.format('Number of atoms', atom_num),
+             '{:<40s}   I     {:12d}\n'.format('Number of electrons', electron_num),
+             '{:<40s}   I     {:12d}\n'.format('Number of alpha electrons', electron_num // 2),
+             '{:<40s}   I     {:12d}\n'.format('Number of beta electrons', electron_num // 2),
+             '{:<40s}   R   N={:12d}\n'.format('Alpha Orbital Energies', orbital_num)]
+    for i in range(0, orbital_num, 5):
+        lines.append(''.join(['{:16.8E}'.format(e) for e in energy_list[i:i+5]]) + '\n')
+    with open(fchk_name, 'w') as f:
+        f.writelines(lines)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'formchk':
+        write_fchk(sys.argv[2], sys.argv[3])
+        sys.exit(0)
+
+    time.sleep(float(os.environ.get('FAKEGAU_SLEEP', '0')))
+    chk_name, coord_list = read_gjf(sys.stdin.readlines())
+    if int(os.environ.get('FAKEGAU_FAIL', '0')) != 0:
+        print(' Error termination via Lnk1e')
+        sys.exit(int(os.environ['FAKEGAU_FAIL']))
+    write_log(coord_list)
+    if chk_name is not None:
+        with open(chk_name, 'w') as f:
+            f.write('{}\n'.format(len(coord_list)))
@@ -0,0 +1,49 @@
+'''
+File reading helpers shared by extractor and gaucheck
+
+Author: Zihao Ye
+'''
+
+import os
+
+
+def reverse_readline(file_name, block_size=65536):
+    '''
+    yield lines of file_name from the last line to the first one
+    file is read from the end in fixed size blocks, so memory use does not grow with file size
+    stop iterating as soon as the wanted line is found
+    '''
+    with open(file_name, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        file_size = position
+        remainder = b''  # incomplete line at the beginning of last block
+        ending = 1
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            line_list = block.split(b'\n')
+            remainder = line_list.pop(0)  # may be cut by block boundary, keep for next block
+            if ending:  # file ends with '\n', no empty line after it
+                ending = 0
+                if line_list and line_list[-1] == b'':
+                    line_list.pop()
+            for line in reversed(line_list):
+                yield line.decode(errors='replace') + '\n'
+        if file_size > 0:  # first line of file
+            yield remainder.decode(errors='replace') + '\n'
+
+def find_last_line(file_name, marker, max_lines=None):
+    '''
+    find the last line containing marker in file_name
+    only check the last max_lines lines if max_lines is given
+    return None if not found
+    '''
+    for i, line in enumerate(reverse_readline(file_name)):
+        if max_lines is not None and i >= max_lines:
+            break
+        if marker in line:
+            return line
+    return None
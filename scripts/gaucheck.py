@@ -4,23 +4,19 @@
 
 import os
 import sys
+try:
+    from scripts.fileio import find_last_line
+except ImportError:  # run as a script in scripts/
+    from fileio import find_last_line
 
 
 def get_termination(gau_file):
     '''
     judge whether the job has terminated normally
     '''
-    with open(gau_file) as f:
-        gauf = f.readlines()
-
-    is_normal = 0 
-    try:
-        for i in range(1,10):
-            if 'Normal termination' in gauf[-i]:
-                is_normal = 1
-                break
-    except:
-        is_normal = 0
+    is_normal = 0
+    if find_last_line(gau_file, 'Normal termination', max_lines=9) is not None:
+        is_normal = 1
 
     return is_normal
 
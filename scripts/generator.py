@@ -10,7 +10,6 @@ Target:
 1. read all raw structures from ZS-CMJ/rawmodel  
 
 2. generate inp file of DFT-mod, xtb-mod, xtb-fixmod, gauxtb-mod based on model files or rules provided  
-TODO: generate conformation search input file
 TODO: add nocheck to all generator
 
 3. submit(gau) or run(xtb) jobs  
@@ -21,11 +20,11 @@ Target:
 
 1. read all raw structures from ZS-CMJ/rawmodel, generate class, which provides methods to get data needed  
 TODO: read ee value, yield, reaction contiditions etc. from csv  
-TODO: read from hdf5 and recreate class, which can add new data to  
+data.parquet is read back into data_dict by `read_original_data()`, so new data can be added to it  
 
 2. extract data specified by user and add to tmp data  
 
-3. generate hdf5 files and input data for pytorch at command 
+3. generate csv and parquet files and input data for pytorch at command 
 
 Version v0.1 target:
 mainly realize extract global data/feature  
@@ -34,18 +33,33 @@ output data into csv file
 
 import os
 import sys
+import shutil
+import copy
+import functools
+import numpy as np
 import pandas as pd
 from scripts.batchgjf import *
 from scripts.runxtb import *
+from scripts.runcrest import *
+from scripts.conformer import *
+from scripts.executor import *
+from scripts.scheduler import *
+from scripts.pipeline import *
 from scripts.extractor import *
+from scripts.geometry import *
 from scripts.gaucheck import *
+from scripts.parsecache import *
+from scripts.datastore import *
+from scripts.statusindex import *
+from scripts.stageregistry import *
 
 class DBgenerator:
-    def __init__(self, rawmodel_dir='rawmodel/'):
+    def __init__(self, rawmodel_dir='rawmodel/', use_conformation=False):
         '''
         set up working directory, read models from rawmodel_dir
 
         rawmodel_dir: the directory of raw model structures
+        use_conformation: first step stages start from the lowest energy conformation in conformation/ instead of rawmodel
         '''
         self.rawmodel_dir = os.path.abspath(rawmodel_dir)  # /home/yzh/Database/ZS-CMJ/rawmodel
         assert os.path.exists(self.rawmodel_dir), 'rawmodel_dir not found!'
@@ -55,556 +69,172 @@ class DBgenerator:
         self.model_list = [model.split('.')[0] for model in os.listdir(self.rawmodel_dir)]  # ['Xu01-1a-2a-major', 'Xu01-1a-2a-minor', ...]
         self.model_list.sort()  # sort model list
         self.data_dict = {'structure':self.model_list}
+        self.status_dict = {}  # {data_name: [status code, ...]} of extracted data, see STATUS_NAME_LIST in scripts/extractor.py
         self.db_size = len(self.model_list)  # model file number
         self.pair_db_size = self.db_size/2  # pair model file number, currently simply divide by 2
         # TODO: extract pair information from model name
         print('Database size: %d' % self.db_size)
         print('Paired database size: %d' % self.pair_db_size)
 
-        self.generator_dict = {
-            'DFT-mod': 0,  # 0: no dir, 1: dir exists, TODO: 2: all input files are generated, 3: all output files are generated
-            'xtb-mod': 0,
-            'xtb-fixmod': 0,
-            'gauxtb-mod': 0,
-            'DFT-mod-gau-sp': 0,
-            'gauxtb-mod-gau-sp': 0,
-            'xtb-mod-xtb-sp': 0,
-            'xtb-fixmod-xtb-sp': 0,
-            'xtb-mod-gau-sp': 0,
-            'xtb-fixmod-gau-sp': 0,
-            # 'conformation': 0,
-        }
+        # stages defined in scripts/stageregistry.py, extra stages can be defined in utils/stages.json
+        # every generator has its own registry, stages of one database are not seen by others
+        stage_file = os.path.join(self.db_dir, 'utils', 'stages.json')
+        self.stage_dict = get_stage_registry(stage_file if os.path.exists(stage_file) else None)
+        self.use_conformation = use_conformation
+        if use_conformation:  # first step stages become children of conformation search
+            for stage_name, stage in self.stage_dict.items():
+                if stage.parent is None and stage.engine != 'crest':
+                    stage = copy.copy(stage)
+                    stage.parent, stage.source_file = 'conformation', '{}-best.gjf'
+                    self.stage_dict[stage_name] = stage
+
+        # 0: no dir, 1: dir exists, 2: all input files are generated, 3: all output files are generated
+        self.generator_dict = {stage_name: 0 for stage_name in self.get_stage_list()}
+        self.parse_cache = None  # ParseCache of extracted files, opened when first used
+        self.status_index = StatusIndex(self.db_dir)  # file names of all stage dirs, refreshed by check functions
 
         # check current file status and update generator_dict
         self.check_all()
 
-    # check status
-    def _check_DFT_mod(self):
+    def get_stage_list(self, engine_list=None):
         '''
-        check DFT-mod status
-        update self.generator_dict
-        output status and provide choice
+        get names of stages used by this generator, filtered by engine
+        crest stage (conformation) is only used with use_conformation, but can still be run by its own methods
         '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod')):
-            self.generator_dict['DFT-mod'] = 0
-            print('dir DFT-mod not found!')
-            print('generate DFT-mod by running generate_DFT_mod()')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir DFT-mod found!')
-            self.generator_dict['DFT-mod'] = 1
-
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod', model+'-gau.gjf')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['DFT-mod'] = 2
-            print('all DFT-mod input files found!')
-        else:
-            print('generate DFT-mod input files by running generate_DFT_mod()')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod/log', model+'-gau.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod/fchk', model+'-gau.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['DFT-mod'] = 3
-            print('all DFT-mod output files found!')
-        else:
-            print('generate DFT-mod output file by running submit_DFT_mod() or submit gaussian jobs manually!')
-            return out_list
+        return [stage_name for stage_name in get_stage_list(engine_list, self.stage_dict)
+                if self.use_conformation or self.stage_dict[stage_name].engine != 'crest']
 
-    def _check_xtb_mod(self):
+    # check status
+    def _check_stage(self, stage_name):
         '''
-        check xtb-mod status
+        check stage status
         update self.generator_dict
         output status and provide choice
+        return models without input files, or models without output files if all input files exist
         '''
+        stage = self.stage_dict[stage_name]
+        self.status_index.scan(stage_name)  # list dir, log/ and fchk/ once
         inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod')):
-            self.generator_dict['xtb-mod'] = 0
-            print('dir xtb-mod not found!')
-            print('generate xtb-mod by running generate_xtb_mod()')
+        if not self.status_index.exists(stage_name):
+            self.generator_dict[stage_name] = 0
+            print('dir {} not found!'.format(stage_name))
+            print("generate {} by running generate_stage('{}')".format(stage_name, stage_name))
             inp_list = self.model_list
             return inp_list
         else:
-            print('dir xtb-mod found!')
-            self.generator_dict['xtb-mod'] = 1
+            print('dir {} found!'.format(stage_name))
+            self.generator_dict[stage_name] = 1
 
         inp_exist = 1
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', 'constrain.inp')):
-            print('constrain.inp not found!')
-            inp_exist = 0
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', model+'-xtb.xyz')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
+        for file in stage.util_list:
+            if not self.status_index.exists(stage_name, file):
+                print(file, 'not found!')
                 inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['xtb-mod'] = 2
-            print('all xtb-mod input files found!')
-        elif os.path.exists(os.path.join(self.db_dir, 'utils', 'constrain.inp')):
-            print('generate xtb-mod input files by running generate_xtb_mod(), constrain.inp found!')
-            return inp_list
-        else:
-            print('create constrain.inp first and generate xtb-mod input files by running generate_xtb_mod()')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', model+'-xtb.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', model+'-xtb-out.xyz')):
-                # print('output xyz file for %s not found!' % model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', model+'-xtb.charges')):
-                # print('charge file for %s not found!' % model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod', model+'-xtb.wbo')):
-                # print('wbo file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['xtb-mod'] = 3
-            print('all xtb-mod output files found!')
-        else:
-            print('generate xtb-mod output file by running run_xtb_mod() or submit xtb jobs manually!')
-            return out_list
-
-    def _check_xtb_fixmod(self):
-        '''
-        check xtb-fixmod status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod')):
-            self.generator_dict['xtb-fixmod'] = 0
-            print('dir xtb-fixmod not found!')
-            print('generate xtb-fixmod by running generate_xtb_fixmod()')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir xtb-fixmod found!')
-            self.generator_dict['xtb-fixmod'] = 1
-
-        inp_exist = 1
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod', 'fix.inp')):
-            print('fix.inp not found!')
-            inp_exist = 0
         for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod', model+'-xtbfix.xyz')):
+            if not self.status_index.exists(stage_name, stage.get_input_file(model)):
                 # print('input file for %s not found!' % model)
                 inp_list.append(model)
                 inp_exist = 0
         if inp_exist:  # all input files exist
-            self.generator_dict['xtb-fixmod'] = 2
-            print('all xtb-fixmod input files found!')
-        elif os.path.exists(os.path.join(self.db_dir, 'utils', 'fix.inp')):
-            print('generate xtb-fixmod input files by running generate_xtb_fixmod(), fix.inp found!')
-            return inp_list
+            self.generator_dict[stage_name] = 2
+            print('all {} input files found!'.format(stage_name))
         else:
-            print('create fix.inp first and generate xtb-fixmod input files by running generate_xtb_fixmod()')
+            util_missing_list = [file for file in stage.util_list if not self.status_index.exists('utils', file)]
+            if util_missing_list != []:
+                print('create {} in utils first and generate {} input files by running generate_stage(\'{}\')'.format(', '.join(util_missing_list), stage_name, stage_name))
+            else:
+                print("generate {} input files by running generate_stage('{}')".format(stage_name, stage_name))
             return inp_list
-            
+
         out_exist = 1
         out_list = []
         for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod', model+'-xtbfix.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod', model+'-xtbfix.charges')):
-                # print('charge file for %s not found!' % model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod', model+'-xtbfix.wbo')):
-                # print('wbo file for %s not found!' % model)
-                out_exist = 0
+            for file in stage.get_output_list(model):
+                if not self.status_index.exists(stage_name, file):
+                    # print('output file %s not found!' % file)
+                    out_exist = 0
+                    if model not in out_list:
+                        out_list.append(model)
         if out_exist:  # all output files exist
-            self.generator_dict['xtb-fixmod'] = 3
-            print('all xtb-fixmod output files found!')
+            self.generator_dict[stage_name] = 3
+            print('all {} output files found!'.format(stage_name))
+        elif stage.engine == 'xtb':
+            print("generate {} output file by running run_stage('{}') or submit xtb jobs manually!".format(stage_name, stage_name))
+            return out_list
+        elif stage.engine == 'crest':
+            print("generate {} output file by running run_conformation()!".format(stage_name))
+            return out_list
         else:
-            print('generate xtb-fixmod output file by running run_xtb_fixmod() or submit xtb jobs manually!')
+            print("generate {} output file by running submit_stage('{}') or submit gaussian jobs manually!".format(stage_name, stage_name))
             return out_list
 
-    def _check_gauxtb_mod(self):
-        '''
-        check gauxtb-mod status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod')):
-            self.generator_dict['gauxtb-mod'] = 0
-            print('\ndir gauxtb-mod not found!\n')
-            print('\ngenerate gauxtb-mod by running generate_gauxtb_mod()\n')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir gauxtb-mod found!')
-            self.generator_dict['gauxtb-mod'] = 1
+    def _check_DFT_mod(self):
+        return self._check_stage('DFT-mod')
 
-        inp_exist = 1
-        for file in ['extderi', 'genxyz', 'xtb.sh']:
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod', file)):
-                print(file, 'not found!')
-                inp_exist = 0
-                break
+    def _check_xtb_mod(self):
+        return self._check_stage('xtb-mod')
 
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod', model+'-gauxtb.gjf')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['gauxtb-mod'] = 2
-            print('\nall gauxtb-mod input files found!\n')
-        else:
-            print('\ngenerate gauxtb-mod input files by running generate_gauxtb_mod()\n')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod/log', model+'-gauxtb.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod/fchk', model+'-gauxtb.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['gauxtb-mod'] = 3
-            print('\nall gauxtb-mod output files found!\n')
-        else:
-            print('\ngenerate gauxtb-mod output file by running submit_gauxtb_mod() or submit gaussian jobs manually!\n')
-            return out_list
+    def _check_xtb_fixmod(self):
+        return self._check_stage('xtb-fixmod')
 
-    def _check_DFT_mod_gau_sp(self):
-        '''
-        check DFT-mod-gau-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod-gau-sp')):
-            self.generator_dict['DFT-mod-gau-sp'] = 0
-            print('\ndir DFT-mod-gau-sp not found!\n')
-            print('\ngenerate DFT-mod-gau-sp by running generate_DFT_mod_gau_sp()\n')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir DFT-mod-gau-sp found!')
-            self.generator_dict['DFT-mod-gau-sp'] = 1
+    def _check_gauxtb_mod(self):
+        return self._check_stage('gauxtb-mod')
 
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod-gau-sp', model+'-gaugausp.gjf')):
-                print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['DFT-mod-gau-sp'] = 2
-            print('\nall DFT-mod-gau-sp input files found!\n')
-        else:
-            print('\ngenerate DFT-mod-gau-sp input files by running generate_DFT_mod_gau_sp()\n')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod-gau-sp/log', model+'-gaugausp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'DFT-mod-gau-sp/fchk', model+'-gaugausp.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['DFT-mod-gau-sp'] = 3
-            print('\nall dft-mod-gau-sp output files found!\n')
-        else:
-            print('\ngenerate dft-mod-gau-sp output file by running submit_dft_mod_gau_sp() or submit gaussian jobs manually!\n')
-            return out_list
+    def _check_DFT_mod_gau_sp(self):
+        return self._check_stage('DFT-mod-gau-sp')
 
     def _check_gauxtb_mod_gau_sp(self):
-        '''
-        check gau-mod-gau-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod-gau-sp')):
-            self.generator_dict['gauxtb-mod-gau-sp'] = 0
-            print('\ndir gauxtb-mod-gau-sp not found!\n')
-            print('\ngenerate gauxtb-mod-gau-sp by running generate_gauxtb_mod_gau_sp()\n')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir gauxtb-mod-gau-sp found!')
-            self.generator_dict['gauxtb-mod-gau-sp'] = 1
-
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod-gau-sp', model+'-gauxtbgausp.gjf')):
-                print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['gauxtb-mod-gau-sp'] = 2
-            print('\nall gauxtb-mod-gau-sp input files found!\n')
-        else:
-            print('\ngenerate gauxtb-mod-gau-sp input files by running generate_gauxtb_mod_gau_sp()\n')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod-gau-sp/log', model+'-gauxtbgausp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'gauxtb-mod-gau-sp/fchk', model+'-gauxtbgausp.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['gauxtb-mod-gau-sp'] = 3
-            print('\nall gauxtb-mod-gau-sp output files found!\n')
-        else:
-            print('\ngenerate gauxtb-mod-gau-sp output file by running submit_gauxtb_mod_gau_sp() or submit gaussian jobs manually!\n')
-            return out_list
+        return self._check_stage('gauxtb-mod-gau-sp')
 
     def _check_xtb_mod_xtb_sp(self):
-        '''
-        check xtb-mod-xtb-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-xtb-sp')):
-            self.generator_dict['xtb-mod-xtb-sp'] = 0
-            print('dir xtb-mod-xtb-sp not found!')
-            print('generate xtb-mod-xtb-sp by running generate_xtb_mod_xtb_sp()')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir xtb-mod-xtb-sp found!')
-            self.generator_dict['xtb-mod-xtb-sp'] = 1
-
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-xtb-sp', model+'-xtb-sp.xyz')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['xtb-mod-xtb-sp'] = 2
-            print('all xtb-mod-xtb-sp input files found!')
-        else:
-            print('generate xtb-mod-xtb-sp input files by running generate_xtb_mod_xtb_sp()')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-xtb-sp', model+'-xtb-sp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-xtb-sp', model+'-xtb-sp.charges')):
-                # print('charge file for %s not found!' % model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-xtb-sp', model+'-xtb-sp.wbo')):
-                # print('wbo file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['xtb-mod-xtb-sp'] = 3
-            print('all xtb-mod-xtb-sp output files found!')
-        else:
-            print('generate xtb-mod-xtb-sp output file by running run_xtb_mod_xtb_sp() or submit xtb jobs manually!')
-            return out_list
+        return self._check_stage('xtb-mod-xtb-sp')
 
     def _check_xtb_fixmod_xtb_sp(self):
-        '''
-        check xtb-fixmod-xtb-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-xtb-sp')):
-            self.generator_dict['xtb-fixmod-xtb-sp'] = 0
-            print('dir xtb-fixmod-xtb-sp not found!')
-            print('generate xtb-fixmod-xtb-sp by running generate_xtb_fixmod_xtb_sp()')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir xtb-fixmod-xtb-sp found!')
-            self.generator_dict['xtb-fixmod-xtb-sp'] = 1
-
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-xtb-sp', model+'-xtbfix-sp.xyz')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['xtb-fixmod-xtb-sp'] = 2
-            print('all xtb-fixmod-xtb-sp input files found!')
-        else:
-            print('generate xtb-fixmod-xtb-sp input files by running generate_xtb_fixmod_xtb_sp()')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-xtb-sp', model+'-xtbfix-sp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-xtb-sp', model+'-xtbfix-sp.charges')):
-                # print('charge file for %s not found!' % model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-xtb-sp', model+'-xtbfix-sp.wbo')):
-                # print('wbo file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['xtb-fixmod-xtb-sp'] = 3
-            print('all xtb-fixmod-xtb-sp output files found!')
-        else:
-            print('generate xtb-fixmod-xtb-sp output file by running run_xtb_fixmod_xtb_sp() or submit xtb jobs manually!')
-            return out_list 
+        return self._check_stage('xtb-fixmod-xtb-sp')
 
     def _check_xtb_mod_gau_sp(self):
-        '''
-        check xtb-mod-gau-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-gau-sp')):
-            self.generator_dict['xtb-mod-gau-sp'] = 0
-            print('\ndir xtb-mod-gau-sp not found!\n')
-            print('\ngenerate xtb-mod-gau-sp by running generate_xtb_mod_gau_sp()\n')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir xtb-mod-gau-sp found!')
-            self.generator_dict['xtb-mod-gau-sp'] = 1
-
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-gau-sp', model+'-xtbgausp.gjf')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['xtb-mod-gau-sp'] = 2
-            print('\nall xtb-mod-gau-sp input files found!\n')
-        else:
-            print('\ngenerate xtb-mod-gau-sp input files by running generate_xtb_mod_gau_sp()\n')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-gau-sp/log', model+'-xtbgausp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-mod-gau-sp/fchk', model+'-xtbgausp.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['xtb-mod-gau-sp'] = 3
-            print('\nall xtb-mod-gau-sp output files found!\n')
-        else:
-            print('\ngenerate xtb-mod-gau-sp output file by running submit_xtb_mod_gau_sp() or submit gaussian jobs manually!\n')
-            return out_list
+        return self._check_stage('xtb-mod-gau-sp')
 
     def _check_xtb_fixmod_gau_sp(self):
-        '''
-        check xtb-fixmod-gau-sp status
-        update self.generator_dict
-        output status and provide choice
-        '''
-        inp_list = []
-        if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-gau-sp')):
-            self.generator_dict['xtb-fixmod-gau-sp'] = 0
-            print('\ndir xtb-fixmod-gau-sp not found!\n')
-            print('\ngenerate xtb-fixmod-gau-sp by running generate_xtb_fixmod_gau_sp()\n')
-            inp_list = self.model_list
-            return inp_list
-        else:
-            print('dir xtb-fixmod-gau-sp found!')
-            self.generator_dict['xtb-fixmod-gau-sp'] = 1
+        return self._check_stage('xtb-fixmod-gau-sp')
 
-        inp_exist = 1
-        for model in self.model_list:  # check input file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-gau-sp', model+'-xtbfixgausp.gjf')):
-                # print('input file for %s not found!' % model)
-                inp_list.append(model)
-                inp_exist = 0
-        if inp_exist:  # all input files exist
-            self.generator_dict['xtb-fixmod-gau-sp'] = 2
-            print('\nall xtb-fixmod-gau-sp input files found!\n')
-        else:
-            print('\ngenerate xtb-fixmod-gau-sp input files by running generate_xtb_fixmod_gau_sp()\n')
-            return inp_list
-            
-        out_exist = 1
-        out_list = []
-        for model in self.model_list:  # check output file
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-gau-sp/log', model+'-xtbfixgausp.log')):
-                # print('log file for %s not found!' % model)
-                out_list.append(model)
-                out_exist = 0
-            if not os.path.exists(os.path.join(self.db_dir, 'xtb-fixmod-gau-sp/fchk', model+'-xtbfixgausp.fchk')):
-                # print('fchk file for %s not found!' % model)
-                out_exist = 0
-        if out_exist:  # all output files exist
-            self.generator_dict['xtb-fixmod-gau-sp'] = 3
-            print('\nall xtb-fixmod-gau-sp output files found!\n')
-        else:
-            print('\ngenerate xtb-fixmod-gau-sp output file by running submit_xtb_fixmod_gau_sp() or submit gaussian jobs manually!\n')
-            return out_list
-        
     def check_all(self):
         '''
         check all file status in database
+        each dir is listed once, file checks are done in status index
         '''
-        self._check_DFT_mod()
-        self._check_xtb_mod()
-        self._check_xtb_fixmod()
-        self._check_gauxtb_mod()
-        self._check_DFT_mod_gau_sp()
-        self._check_gauxtb_mod_gau_sp()
-        self._check_xtb_mod_xtb_sp()
-        self._check_xtb_fixmod_xtb_sp()
-        self._check_xtb_mod_gau_sp()
-        self._check_xtb_fixmod_gau_sp()
+        self.status_index = StatusIndex(self.db_dir)
+        for stage_name in self.get_stage_list():
+            self._check_stage(stage_name)
 
         print(self.generator_dict)
 
+    def get_model_state(self, stage=None):
+        '''
+        get per-model state of stage from status index, all stages if stage is None
+        state 0: no dir, 1: dir exists, 2: input files exist, 3: output files exist
+        return {stage: {model: state}}
+        '''
+        if stage is None:
+            stage_list = self.get_stage_list()
+        else:
+            stage_list = [stage]
+
+        model_state_dict = {}
+        for stage_name in stage_list:
+            stage = self.stage_dict[stage_name]
+            input_list = [stage.input_file.format('{}' + stage.suffix)] + stage.util_list
+            output_list = [pattern.format('{}' + stage.suffix) for pattern in stage.output_list]
+            model_state_dict[stage_name] = self.status_index.get_stage_state(stage_name, self.model_list, input_list, output_list)
+        return model_state_dict
+
     def check_gau_files(self, dir_name):
         '''
         check if gaussian jobs terminate normally
         '''
         self.check_all()
-        assert dir_name in ['DFT-mod', 'gauxtb-mod', 'DFT-mod-gau-sp', 'gauxtb-mod-gau-sp', 'xtb-mod-gau-sp', 'xtb-fixmod-gau-sp'], 'dir name should be DFT-mod, gauxtb-mod, gauxtb-mod-gau-sp, xtb-mod-gau-sp or xtb-fixmod-gau-sp'
+        gau_stage_list = self.get_stage_list(['gau', 'gauxtb'])
+        assert dir_name in gau_stage_list, 'dir name should be ' + ', '.join(gau_stage_list)
         assert self.generator_dict[dir_name] == 3, 'generate and process output files first'
         
         gau_check_result = gaucheck(os.path.join(self.db_dir, dir_name, 'log'))
@@ -617,257 +247,245 @@ class DBgenerator:
                 print(f)
 
     # generate input files
+    def get_source_file(self, stage_name, model):
+        '''
+        get file used to generate input file of model in stage
+        rawmodel file if stage has no parent, else output file of parent stage
+        '''
+        stage = self.stage_dict[stage_name]
+        if stage.parent is None:
+            return os.path.join(self.rawmodel_dir, stage.source_file.format(model))
+        parent = self.stage_dict[stage.parent]
+        return os.path.join(self.db_dir, parent.name, stage.source_file.format(model + parent.suffix))
+
+    def generate_model_input(self, stage_name, model):
+        '''
+        generate input file of one model in stage
+        converter is chosen by source file type and input file type
+        '''
+        stage = self.stage_dict[stage_name]
+        source_file = self.get_source_file(stage_name, model)
+        target_file = os.path.join(self.db_dir, stage_name, stage.get_input_file(model))
+        ofile_name = target_file.rsplit('.', 1)[0]
+        source_type = source_file.rsplit('.', 1)[-1]
+        target_type = target_file.rsplit('.', 1)[-1]
+        model_gjf_path = os.path.join(self.db_dir, 'utils', str(stage.model_file))
+
+        if source_type == 'gjf' and target_type == 'gjf':
+            from_gjf_to_gjf(source_file, model_gjf_path, ofile_name)
+        elif source_type == 'gjf' and target_type == 'xyz':
+            from_gjf_to_xyz(source_file, ofile_name)
+        elif source_type == 'log' and target_type == 'gjf':
+            from_log_to_gjf(source_file, model_gjf_path, ofile_name)
+        elif source_type == 'xyz' and target_type == 'gjf':
+            from_xyz_to_gjf(source_file, model_gjf_path, ofile_name)
+        elif source_type == target_type:
+            shutil.copyfile(source_file, target_file)
+        else:
+            print('cannot convert {} to {}'.format(source_type, target_type))
+            return False
+        print('{} input file generated: {}'.format(stage_name, target_file))
+        return True
+
+    def prepare_stage_dir(self, stage_name):
+        '''
+        create stage dir and copy util files into it
+        '''
+        stage = self.stage_dict[stage_name]
+        target_path = os.path.join(self.db_dir, stage_name)
+        if not os.path.exists(target_path):
+            os.mkdir(target_path)
+        for file in stage.util_list:
+            if os.path.exists(os.path.join(self.db_dir, 'utils', file)):
+                shutil.copy(os.path.join(self.db_dir, 'utils', file), target_path)
+            else:
+                print('utils/{} not found!'.format(file))
+
+    def generate_stage(self, stage_name, no_check=False):
+        '''
+        generate input files of stage based on rawmodel or parent stage
+        '''
+        stage = self.stage_dict[stage_name]
+        if stage.parent is not None:
+            self._check_stage(stage.parent)
+        inp_list = self._check_stage(stage_name)
+        if stage.parent is not None and self.generator_dict[stage.parent] < 3 and not no_check:
+            print('{} calculations not done yet!'.format(stage.parent))
+            return
+        if self.generator_dict[stage_name] >= 2 and not no_check:
+            print('{} files already done!'.format(stage_name))
+            return
+
+        self.prepare_stage_dir(stage_name)
+        for model in inp_list or []:
+            self.generate_model_input(stage_name, model)
+
     def generate_DFT_mod(self, no_check=False):
         '''
         generate DFT-mod based on rawmodel
         '''
-        inp_list = self._check_DFT_mod()
-        if self.generator_dict['DFT-mod'] >= 2 and not no_check:
-            print('DFT-mod files already done!')
-            return
-        else:
-            raw_gjf_list = list(map(lambda x: self.rawmodel_dir + '/' + x + '.gjf', inp_list))
-            model_gjf_path = self.db_dir + '/utils/gaumodel.gjf'
-            target_path = self.db_dir + '/DFT-mod'
-            if not os.path.exists(target_path):
-                os.mkdir(target_path)
-            for raw_gjf in raw_gjf_list:
-                raw_name = os.path.basename(raw_gjf).split('.')[0]
-                ofile_name = target_path + '/' + raw_name + '-gau'
-                from_gjf_to_gjf(raw_gjf, model_gjf_path, ofile_name)
-                print('gaussian input file generated: ', ofile_name + '.gjf')
+        self.generate_stage('DFT-mod', no_check)
 
     def generate_xtb_mod(self, no_check=False):
         '''
         generate xtb-mod based on rawmodel
         '''
-        inp_list = self._check_xtb_mod()
-        if self.generator_dict['xtb-mod'] >= 2 and not no_check:
-            print('xtb-mod files already done!')
-            return
-        else:
-            raw_gjf_list = list(map(lambda x: self.rawmodel_dir + '/' + x + '.gjf', inp_list))
-            target_path = self.db_dir + '/xtb-mod'
-            if not os.path.exists(target_path):
-                os.mkdir(target_path)
-            for raw_gjf in raw_gjf_list:
-                raw_name = os.path.basename(raw_gjf).split('.')[0]
-                ofile_name = target_path + '/' + raw_name + '-xtb'
-                from_gjf_to_xyz(raw_gjf, ofile_name)
-                print('xtb input xyz file generated: ', ofile_name + '.xyz')
-            
-            os.system('cp ' + self.db_dir + '/utils/constrain.inp ' + self.db_dir + '/xtb-mod/')
+        self.generate_stage('xtb-mod', no_check)
 
     def generate_xtb_fixmod(self, no_check=False):
         '''
         generate xtb-fixmod based on rawmodel
         '''
-        inp_list = self._check_xtb_fixmod()
-        if self.generator_dict['xtb-fixmod'] >= 2 and not no_check:
-            print('xtb-fixmod files already done!')
-            return
-        else:
-            raw_gjf_list = list(map(lambda x: self.rawmodel_dir + '/' + x + '.gjf', inp_list))
-            target_path = self.db_dir + '/xtb-fixmod'
-            if not os.path.exists(target_path):
-                os.mkdir(target_path)
-            for raw_gjf in raw_gjf_list:
-                raw_name = os.path.basename(raw_gjf).split('.')[0]
-                ofile_name = target_path + '/' + raw_name + '-xtbfix'
-                from_gjf_to_xyz(raw_gjf, ofile_name)
-                print('xtb input xyz file generated: ', ofile_name + '.xyz')
-
-            os.system('cp ' + self.db_dir + '/utils/fix.inp ' + self.db_dir + '/xtb-fixmod/')
+        self.generate_stage('xtb-fixmod', no_check)
 
     def generate_gauxtb_mod(self, no_check=False):
         '''
         generate gauxtb-mod based on rawmodel
         '''
-        inp_list = self._check_gauxtb_mod()
-        if self.generator_dict['gauxtb-mod'] >= 2 and not no_check:
-            print('gauxtb-mod files already done!')
-            return
-        else:
-            os.system('cp ' + self.db_dir + '/utils/extderi ' + self.db_dir + '/gauxtb-mod/')
-            os.system('cp ' + self.db_dir + '/utils/genxyz ' + self.db_dir + '/gauxtb-mod/')
-            os.system('cp ' + self.db_dir + '/utils/xtb.sh ' + self.db_dir + '/gauxtb-mod/')
-            raw_gjf_list = list(map(lambda x: self.rawmodel_dir + '/' + x + '.gjf', inp_list))
-            model_gjf_path = self.db_dir + '/utils/gauxtbmodel.gjf'
-            target_path = self.db_dir + '/gauxtb-mod'
-            if not os.path.exists(target_path):
-                os.mkdir(target_path)
-            for raw_gjf in raw_gjf_list:
-                raw_name = os.path.basename(raw_gjf).split('.')[0]
-                ofile_name = target_path + '/' + raw_name + '-gauxtb'
-                from_gjf_to_gjf(raw_gjf, model_gjf_path, ofile_name)
-                print('gaussian-xtb input file generated: ', ofile_name + '.gjf')
+        self.generate_stage('gauxtb-mod', no_check)
 
     def generate_DFT_mod_gau_sp(self, no_check=False):
         '''
-        generate gauxtb-mod-gau-sp based on rawmodel
+        generate DFT-mod-gau-sp based on DFT-mod log
         '''
-        self._check_DFT_mod()
-        inp_list = self._check_DFT_mod_gau_sp()
-        if self.generator_dict['DFT-mod'] < 3 and not no_check:
-            print('DFT-mod calculations not done yet!')
-            return
-        else:
-            if self.generator_dict['DFT-mod-gau-sp'] >= 2 and not no_check:
-                print('DFT-mod-gau-sp files already done!')
-                return
-            else:
-                raw_log_list = list(map(lambda x: self.db_dir + '/DFT-mod/log/' + x + '-gau.log', inp_list))
-                model_gjf_path = self.db_dir + '/utils/gauspmodel.gjf'
-                target_path = self.db_dir + '/DFT-mod-gau-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_log in raw_log_list:
-                    raw_name = os.path.basename(raw_log).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name + 'gausp'
-                    from_log_to_gjf(raw_log, model_gjf_path, ofile_name)
-                    print('DFT-mod-gau-sp input file generated: ', ofile_name + '.gjf')
+        self.generate_stage('DFT-mod-gau-sp', no_check)
 
     def generate_gauxtb_mod_gau_sp(self, no_check=False):
         '''
-        generate gauxtb-mod-gau-sp based on rawmodel
+        generate gauxtb-mod-gau-sp based on gauxtb-mod log
         '''
-        self._check_gauxtb_mod()
-        inp_list = self._check_gauxtb_mod_gau_sp()
-        if self.generator_dict['gauxtb-mod'] < 3 and not no_check:
-            print('gauxtb-mod calculations not done yet!')
-            return
-        else:
-            if self.generator_dict['gauxtb-mod-gau-sp'] >= 2 and not no_check:
-                print('gauxtb-mod-gau-sp files already done!')
-                return
-            else:
-                raw_log_list = list(map(lambda x: self.db_dir + '/gauxtb-mod/log/' + x + '-gauxtb.log', inp_list))
-                model_gjf_path = self.db_dir + '/utils/gauspmodel.gjf'
-                target_path = self.db_dir + '/gauxtb-mod-gau-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_log in raw_log_list:
-                    raw_name = os.path.basename(raw_log).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name + 'gausp'
-                    from_log_to_gjf(raw_log, model_gjf_path, ofile_name)
-                    print('gauxtb-mod-gau-sp input file generated: ', ofile_name + '.gjf')
+        self.generate_stage('gauxtb-mod-gau-sp', no_check)
 
     def generate_xtb_mod_xtb_sp(self, no_check=False):
         '''
         generate xtb-mod-xtb-sp based on xtb-mod
         '''
-        self._check_xtb_mod()
-        inp_list = self._check_xtb_mod_xtb_sp()
-        if self.generator_dict['xtb-mod'] < 3 and not no_check:
-            print('xtb-mod calculations not done yet!')
-            return
-        else:
-            if self.generator_dict['xtb-mod-xtb-sp'] >= 2 and not no_check:
-                print('xtb-mod-xtb-sp files already done!')
-                return
-            else:
-                raw_xyz_list = list(map(lambda x: self.db_dir + '/xtb-mod/' + x + '-xtb-out.xyz', inp_list))
-                target_path = self.db_dir + '/xtb-mod-xtb-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_xyz in raw_xyz_list:
-                    raw_name = os.path.basename(raw_xyz).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name[:-8] + '-xtb-sp'
-                    os.system('cp ' + raw_xyz + ' ' + ofile_name + '.xyz')
-                    print('xtb sp input xyz file generated: ', ofile_name + '.xyz')
+        self.generate_stage('xtb-mod-xtb-sp', no_check)
 
     def generate_xtb_fixmod_xtb_sp(self, no_check=False):
         '''
         generate xtb-fixmod-xtb-sp based on xtb-fixmod
         '''
-        self._check_xtb_fixmod()
-        inp_list = self._check_xtb_fixmod_xtb_sp()
-        if self.generator_dict['xtb-fixmod'] < 3 and not no_check:
-            print('xtb-fixmod calculations not done yet!')
-            return
-        else:
-            if self.generator_dict['xtb-fixmod-xtb-sp'] >= 2 and not no_check:
-                print('xtb-fixmod-xtb-sp files already done!')
-                return
-            else:
-                raw_xyz_list = list(map(lambda x: self.db_dir + '/xtb-fixmod/' + x + '-xtbfix-out.xyz', inp_list))
-                target_path = self.db_dir + '/xtb-fixmod-xtb-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_xyz in raw_xyz_list:
-                    raw_name = os.path.basename(raw_xyz).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name[:-11] + '-xtbfix-sp'
-                    os.system('cp ' + raw_xyz + ' ' + ofile_name + '.xyz')
-                    print('xtb sp input xyz file generated: ', ofile_name + '.xyz')
+        self.generate_stage('xtb-fixmod-xtb-sp', no_check)
 
     def generate_xtb_mod_gau_sp(self, no_check=False):
         '''
         generate xtb-mod-gau-sp based on xtb-mod output xyz
         '''
-        self._check_xtb_mod()
-        inp_list = self._check_xtb_mod_gau_sp()
-        if self.generator_dict['xtb-mod'] < 3 and not no_check:
-            print('xtb-mod calculations not done yet!')
-            return
-        else:
-            if self.generator_dict['xtb-mod-gau-sp'] >= 2 and not no_check:
-                print('xtb-mod-gau-sp files already done!')
-                return
-            else:
-                raw_xyz_list = list(map(lambda x: self.db_dir + '/xtb-mod/' + x + '-xtb-out.xyz', inp_list))
-                model_gjf_path = self.db_dir + '/utils/gauspmodel.gjf'
-                target_path = self.db_dir + '/xtb-mod-gau-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_xyz in raw_xyz_list:
-                    raw_name = os.path.basename(raw_xyz).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name[:-4] + 'gausp'
-                    from_xyz_to_gjf(raw_xyz, model_gjf_path, ofile_name)
-                    print('xtb-mod-gau-sp input file generated: ', ofile_name + '.gjf')
+        self.generate_stage('xtb-mod-gau-sp', no_check)
 
     def generate_xtb_fixmod_gau_sp(self, no_check=False):
         '''
         generate xtb-fixmod-gau-sp based on xtb-fixmod output xyz
         '''
-        self._check_xtb_fixmod()
-        inp_list = self._check_xtb_fixmod_gau_sp()
-        if self.generator_dict['xtb-fixmod'] < 3 and not no_check:
-            print('xtb-fixmod calculations not done yet!')
-            return
+        self.generate_stage('xtb-fixmod-gau-sp', no_check)
+
+    def generate_conformation(self, no_check=False):
+        '''
+        generate conformation search input xyz files based on rawmodel
+        '''
+        self.generate_stage('conformation', no_check)
+
+    # conformation search
+    def get_model_charge(self, model):
+        '''
+        charge and uhf (multiplicity - 1) of model in rawmodel gjf file, 0 and 0 if not found
+        '''
+        rawmodel_file = os.path.join(self.rawmodel_dir, model + '.gjf')
+        if not os.path.exists(rawmodel_file):
+            return 0, 0
+        molecule = Molecule.from_gjf(rawmodel_file)
+        return molecule.charge, molecule.multiplicity - 1
+
+    def process_conformation(self, model, rmsd_threshold=0.125, energy_window=6.0):
+        '''
+        prune conformers of model found by crest, see select_conformers
+        write pruned ensemble as {model}-cf-ensemble.xyz (energy in Eh as title),
+        and the lowest energy conformer as {model}-cf-best.gjf with charge, multiplicity and keywords of rawmodel gjf
+        return number of conformers kept, 0 if no conformer file
+        '''
+        stage = self.stage_dict['conformation']
+        target_path = os.path.join(self.db_dir, 'conformation')
+        name = model + stage.suffix
+        conformer_file = os.path.join(target_path, name + '-conformers.xyz')
+        if not os.path.exists(conformer_file):
+            return 0
+
+        energy_list = []
+        molecule_list = []
+        for title, molecule in iter_cf_xyz_frames(conformer_file, skip=0):
+            energy_list.append(get_cf_energy(title))
+            molecule_list.append(molecule)
+        atom_mask = molecule_list[0].atom_number > 1  # heavy atoms
+        idx_list = select_conformers(np.stack([molecule.coord for molecule in molecule_list]), energy_list, energy_window, rmsd_threshold,
+                                     atom_mask=atom_mask)
+
+        tmp_file = os.path.join(target_path, name + '-ensemble.xyz.tmp')
+        with open(tmp_file, 'w') as f:
+            for idx in idx_list:
+                f.writelines(molecule_list[idx].get_xyz_lines('{:.10f}'.format(energy_list[idx])))
+        os.replace(tmp_file, os.path.join(target_path, name + '-ensemble.xyz'))
+
+        best = molecule_list[idx_list[0]]
+        rawmodel_file = os.path.join(self.rawmodel_dir, model + '.gjf')
+        if os.path.exists(rawmodel_file):  # keep charge, multiplicity and keywords of rawmodel
+            mfhead, mftail = get_model_file(rawmodel_file)
+            generate_gjf_file(best, mfhead, mftail, os.path.join(target_path, name + '-best'))
         else:
-            if self.generator_dict['xtb-fixmod-gau-sp'] >= 2 and not no_check:
-                print('xtb-fixmod-gau-sp files already done!')
-                return
-            else:
-                raw_xyz_list = list(map(lambda x: self.db_dir + '/xtb-fixmod/' + x + '-xtbfix-out.xyz', inp_list))
-                model_gjf_path = self.db_dir + '/utils/gauspmodel.gjf'
-                target_path = self.db_dir + '/xtb-fixmod-gau-sp'
-                if not os.path.exists(target_path):
-                    os.mkdir(target_path)
-                for raw_xyz in raw_xyz_list:
-                    raw_name = os.path.basename(raw_xyz).split('.')[0]
-                    ofile_name = target_path + '/' + raw_name[:-4] + 'gausp'
-                    from_xyz_to_gjf(raw_xyz, model_gjf_path, ofile_name)
-                    print('xtb-fixmod-gau-sp input file generated: ', ofile_name + '.gjf')
+            generate_gjf_file(best, ['#p\n', '\n', name + '\n', '\n', '0 1\n'], ['\n'], os.path.join(target_path, name + '-best'))
+        return len(idx_list)
 
-    def generate_conformation(self):  # not ready
+    def run_conformation_model(self, model, omp_threads=1, crest_bin='crest', timeout=None, ledger=None, rmsd_threshold=0.125, energy_window=6.0):
+        '''
+        run conformation search of one model and prune its conformers
+        return True if the lowest energy conformer is written
         '''
-        generate conformation search input file
+        stage = self.stage_dict['conformation']
+        xyz_name = os.path.join(self.db_dir, 'conformation', stage.get_input_file(model))
+        charge, uhf = self.get_model_charge(model)
+        if not run_crest_job(xyz_name, charge, uhf, omp_threads, crest_bin, timeout, ledger):
+            return False
+        return self.process_conformation(model, rmsd_threshold, energy_window) > 0
+
+    def run_conformation(self, workers=1, omp_threads=None, crest_bin='crest', timeout=None, rmsd_threshold=0.125, energy_window=6.0):
         '''
-        pass
+        run conformation search of all models without conformers, then prune ensembles not processed yet
+        workers, omp_threads, timeout: see run_stage
+        rmsd_threshold (angstrom), energy_window (kcal/mol): see select_conformers
+        '''
+        stage = self.stage_dict['conformation']
+        out_list = self._check_stage('conformation')
+        if self.generator_dict['conformation'] < 2:
+            print('generate conformation files first!')
+            return
+        elif self.generator_dict['conformation'] == 3:
+            print('conformation search already done!')
+            return
+
+        target_path = os.path.join(self.db_dir, 'conformation')
+        job_list = []
+        for model in out_list:
+            if not os.path.exists(os.path.join(target_path, model + stage.suffix + '-conformers.xyz')):
+                job_list.append((os.path.join(target_path, stage.get_input_file(model)),) + self.get_model_charge(model))
+        if job_list != []:
+            run_crest_jobs(job_list, workers, omp_threads, crest_bin, timeout, self.get_ledger_file())
+        for model in out_list:
+            self.process_conformation(model, rmsd_threshold, energy_window)
+        self._check_stage('conformation')
 
-    def generate_all_xtb(self):
+    def generate_all_xtb(self, workers=1, omp_threads=None):
         '''
         generate and run all xtb calculation files in database
+        workers, omp_threads: see run_stage
         '''
         self.generate_xtb_mod()
         self.generate_xtb_fixmod()
-        self.run_xtb_mod()
-        self.run_xtb_fixmod()
+        self.run_xtb_mod(workers, omp_threads)
+        self.run_xtb_fixmod(workers, omp_threads)
         self.generate_xtb_mod_xtb_sp()
         self.generate_xtb_fixmod_xtb_sp()
-        self.run_xtb_mod_xtb_sp()
-        self.run_xtb_fixmod_xtb_sp()
+        self.run_xtb_mod_xtb_sp(workers, omp_threads)
+        self.run_xtb_fixmod_xtb_sp(workers, omp_threads)
 
         self.check_all()
 
@@ -875,143 +493,157 @@ class DBgenerator:
         '''
         generate and run all first step calculation files in database
         '''
-        self.generate_DFT_mod()
-        self.generate_gauxtb_mod()
-        self.generate_xtb_mod()
-        self.generate_xtb_fixmod()
+        for stage_name in self.get_stage_list():
+            if self.stage_dict[stage_name].parent is None:
+                self.generate_stage(stage_name)
 
         self.check_all()
 
-    def generate_all_sp_step(self):  # not ready
-        pass
+    def generate_all_sp_step(self):
+        '''
+        generate all second step (sp) calculation files whose parent calculations are done
+        '''
+        for stage_name in self.get_stage_list():
+            if self.stage_dict[stage_name].parent is not None:
+                self.generate_stage(stage_name)
+
+        self.check_all()
 
-    # run xtb calculation directly
-    def run_xtb_mod(self):
+    def run_pipeline(self, stage_list=None, xtb_workers=1, omp_threads=None, scheduler=None, interval=10, retry_failed=False, **kwargs):
         '''
-        run xtb-mod
+        run calculations of all stages per structure, a job starts as soon as its own parent job is done
+        progress is saved in data/pipeline.json, run again to resume
+        stage_list: default all xtb stages, and all gaussian stages if scheduler is given
+        other arguments: see Pipeline in scripts/pipeline.py
+        return {stage: {state: number of nodes}}
         '''
-        out_list = self._check_xtb_mod()
-        if self.generator_dict['xtb-mod'] < 2:
-            print('generate xtb-mod files first!')
+        pipeline = Pipeline(self, stage_list, xtb_workers, omp_threads, scheduler=scheduler, **kwargs)
+        summary_dict = pipeline.run(interval, retry_failed)
+        self.check_all()
+        return summary_dict
+
+    # run xtb calculation directly
+    def run_stage(self, stage_name, workers=1, omp_threads=None, xtb_bin='xtb', timeout=None):
+        '''
+        run xtb calculations of stage
+        jobs run concurrently in temporary working directories
+        workers: number of xtb jobs running at the same time
+        omp_threads: OMP_NUM_THREADS of each job, default cpu_count // workers
+        timeout: seconds before each job is killed, None for no limit
+        exit code, wall time, cpu time and peak RSS of each job are recorded in data/job_ledger.jsonl
+        '''
+        stage = self.stage_dict[stage_name]
+        assert stage.engine == 'xtb', '{} is not a xtb stage'.format(stage_name)
+        out_list = self._check_stage(stage_name)
+        if self.generator_dict[stage_name] < 2:
+            print('generate {} files first!'.format(stage_name))
             return
-        elif self.generator_dict['xtb-mod'] == 2:
-            target_path = self.db_dir + '/xtb-mod'
-            for model in out_list:
-                file = model + '-xtb.xyz'
-                submit_xtb_job(target_path + '/' + file, inp_name=target_path + '/constrain.inp', job_type='opt')
-        elif self.generator_dict['xtb-mod'] == 3:
-            print('xtb-mod calculations already done!')
+        elif self.generator_dict[stage_name] == 2:
+            target_path = os.path.join(self.db_dir, stage_name)
+            inp_name = '' if stage.xtb_inp_file is None else os.path.join(target_path, stage.xtb_inp_file)
+            xyz_list = [os.path.join(target_path, stage.get_input_file(model)) for model in out_list]
+            run_xtb_jobs(xyz_list, inp_name=inp_name, job_type=stage.xtb_job_type, workers=workers, omp_threads=omp_threads, xtb_bin=xtb_bin,
+                         timeout=timeout, ledger_file=self.get_ledger_file())
+        elif self.generator_dict[stage_name] == 3:
+            print('{} calculations already done!'.format(stage_name))
             return
 
-    def run_xtb_fixmod(self):
+    def get_ledger_file(self):
+        '''
+        job ledger of database, data/job_ledger.jsonl
+        '''
+        return os.path.join(self.data_dir, 'job_ledger.jsonl')
+
+    def get_slow_jobs(self, n=10, key='wall_time'):
+        '''
+        get n slowest jobs in job ledger, key: wall_time, cpu_time or max_rss_mb
+        '''
+        return JobLedger(self.get_ledger_file()).get_slow_jobs(n, key)
+
+    def run_xtb_mod(self, workers=1, omp_threads=None):
+        '''
+        run xtb-mod
+        '''
+        self.run_stage('xtb-mod', workers, omp_threads)
+
+    def run_xtb_fixmod(self, workers=1, omp_threads=None):
         '''
         run xtb-fixmod
         '''
-        out_list = self._check_xtb_fixmod()
-        if self.generator_dict['xtb-fixmod'] < 2:
-            print('generate xtb-fixmod files first!')
-            return
-        elif self.generator_dict['xtb-fixmod'] == 2:
-            target_path = self.db_dir + '/xtb-fixmod'
-            for model in out_list:
-                file = model + '-xtbfix.xyz'
-                submit_xtb_job(target_path + '/' + file, inp_name=target_path + '/fix.inp', job_type='opt')
-        elif self.generator_dict['xtb-fixmod'] == 3:
-            print('xtb-fixmod calculations already done!')
-            return
-        
-    def run_xtb_mod_xtb_sp(self):
+        self.run_stage('xtb-fixmod', workers, omp_threads)
+
+    def run_xtb_mod_xtb_sp(self, workers=1, omp_threads=None):
         '''
         run xtb-mod-stb-sp
         '''
-        out_list = self._check_xtb_mod_xtb_sp()
-        if self.generator_dict['xtb-mod-xtb-sp'] < 2:
-            print('generate xtb-mod-xtb-sp files first!')
-            return
-        elif self.generator_dict['xtb-mod-xtb-sp'] == 2:
-            target_path = self.db_dir + '/xtb-mod-xtb-sp'
-            for model in out_list:
-                file = model + '-xtb-sp.xyz'
-                submit_xtb_job(target_path + '/' + file, job_type='sp')
-        elif self.generator_dict['xtb-mod-xtb-sp'] == 3:
-            print('xtb-mod-xtb-sp calculations already done!')
-            return
+        self.run_stage('xtb-mod-xtb-sp', workers, omp_threads)
 
-    def run_xtb_fixmod_xtb_sp(self):
+    def run_xtb_fixmod_xtb_sp(self, workers=1, omp_threads=None):
         '''
         run xtb-fixmod-stb-sp
         '''
-        out_list = self._check_xtb_fixmod_xtb_sp()
-        if self.generator_dict['xtb-fixmod-xtb-sp'] < 2:
-            print('generate xtb-fixmod-xtb-sp files first!')
-            return
-        elif self.generator_dict['xtb-fixmod-xtb-sp'] == 2:
-            target_path = self.db_dir + '/xtb-fixmod-xtb-sp'
-            for model in out_list:
-                file = model + '-xtbfix-sp.xyz'
-                submit_xtb_job(target_path + '/' + file, job_type='sp')
-        elif self.generator_dict['xtb-fixmod-xtb-sp'] == 3:
-            print('xtb-fixmod-xtb-sp calculations already done!')
-            return
+        self.run_stage('xtb-fixmod-xtb-sp', workers, omp_threads)
 
     # submit g09 calculation to SGE
-    def submit_DFT_mod(self):
-        '''
-        submit DFT-mod calculation
-        '''
+    def submit_stage(self, stage_name, scheduler=None, gau_bin='g09', formchk_bin='formchk', wait=False, interval=10):
+        '''
+        submit gaussian calculations of stage
+        scheduler: None to submit the whole dir by qg09 script,
+                   or a Scheduler (scripts/scheduler.py) to submit one job per structure,
+                   outputs are written into log/ and fchk/ directly
+        gau_bin, formchk_bin: gaussian and formchk commands of per-structure jobs
+        wait: wait until all submitted jobs are over
+        return {job name: job id} if scheduler is used
+        '''
+        stage = self.stage_dict[stage_name]
+        assert stage.is_gaussian(), '{} is not a gaussian stage'.format(stage_name)
         self.check_all()
-        self._check_DFT_mod()
-        if self.generator_dict['DFT-mod'] < 2:
-            print('generate DFT-mod files first!')
+        out_list = self._check_stage(stage_name)
+        if self.generator_dict[stage_name] < 2:
+            print('generate {} files first!'.format(stage_name))
             return
-        elif self.generator_dict['DFT-mod'] == 2:
-            os.chdir('DFT-mod')
-            os.system('qg09 -p 8 -a')  # submit g09xtb calculation using qg09 script, proc=8
+        elif self.generator_dict[stage_name] == 2 and scheduler is None:
+            os.chdir(os.path.join(self.db_dir, stage_name))
+            os.system('qg09 ' + stage.submit_option)  # submit calculation using qg09 script
             os.chdir(self.db_dir)
-        elif self.generator_dict['DFT-mod'] == 3:
-            print('DFT-mod calculations already done!')
+        elif self.generator_dict[stage_name] == 2:
+            target_path = os.path.join(self.db_dir, stage_name)
+            job_list = [get_gau_job(os.path.join(target_path, stage.get_input_file(model)), stage.nproc, gau_bin, formchk_bin) for model in out_list]
+            job_id_dict = scheduler.submit_all(job_list, interval)
+            print('{} {} jobs submitted'.format(len(job_id_dict), stage_name))
+            if wait:
+                scheduler.wait_all(list(job_id_dict.values()), interval)
+                self._check_stage(stage_name)
+            return job_id_dict
+        elif self.generator_dict[stage_name] == 3:
+            print('{} calculations already done!'.format(stage_name))
             return
 
-    def submit_gauxtb_mod(self):
+    def submit_DFT_mod(self, scheduler=None):
+        '''
+        submit DFT-mod calculation
+        '''
+        return self.submit_stage('DFT-mod', scheduler)
+
+    def submit_gauxtb_mod(self, scheduler=None):
         '''
         submit gauxtb-mod calculation
         '''
-        self.check_all()
-        self._check_gauxtb_mod()
-        if self.generator_dict['gauxtb-mod'] < 2:
-            print('generate gauxtb-mod files first!')
-            return
-        elif self.generator_dict['gauxtb-mod'] == 2:
-            os.chdir('gauxtb-mod')
-            os.system('qg09 -p 1 -x -a')  # submit g09xtb calculation using qg09 script, proc=1
-            os.chdir(self.db_dir)
-        elif self.generator_dict['gauxtb-mod'] == 3:
-            print('gauxtb-mod calculations already done!')
-            return
+        return self.submit_stage('gauxtb-mod', scheduler)
 
-    def submit_gau_sp(self, dir_name):
+    def submit_gau_sp(self, dir_name, scheduler=None):
         '''
         submit gau-sp calculation
         '''
-        self.check_all()
-        assert dir_name in ['DFT-mod-gau-sp', 'gauxtb-mod-gau-sp', 'xtb-mod-gau-sp', 'xtb-fixmod-gau-sp'], 'dir name should be gauxtb-mod-gau-sp, xtb-mod-gau-sp or xtb-fixmod-gau-sp'
-        if self.generator_dict[dir_name] < 2:
-            print('generate {} files first!'.format(dir_name))
-            return
-        elif self.generator_dict[dir_name] == 2:
-            os.chdir(dir_name)
-            os.system('qg09 -p 8 -a')
-            os.chdir(self.db_dir)
-        elif self.generator_dict[dir_name] == 3:
-            print('{} calculations already done!'.format(dir_name))
-            return
+        return self.submit_stage(dir_name, scheduler)
 
     # process g09 calculation results
     def process_gau_result(self, dir_name):
         '''
         process gau result
         '''
-        assert dir_name in ['DFT-mod', 'DFT-mod-gau-sp', 'gauxtb-mod', 'gauxtb-mod-gau-sp', 'xtb-mod-gau-sp', 'xtb-fixmod-gau-sp'], 'dir name should be gauxtb-mod-gau-sp, xtb-mod-gau-sp or xtb-fixmod-gau-sp'
+        gau_stage_list = self.get_stage_list(['gau', 'gauxtb'])
+        assert dir_name in gau_stage_list, 'dir name should be ' + ', '.join(gau_stage_list)
         if self.generator_dict[dir_name] < 2:
             print('{} input file not ready!'.format(dir_name))
             return
@@ -1019,7 +651,7 @@ class DBgenerator:
             print('{} calculations already done!'.format(dir_name))
             return
         elif self.generator_dict[dir_name] == 2:
-            os.chdir(dir_name)
+            os.chdir(os.path.join(self.db_dir, dir_name))
             os.makedirs('log', exist_ok=True)
             os.makedirs('fchk', exist_ok=True)
             for dir in os.listdir():
@@ -1030,137 +662,359 @@ class DBgenerator:
             os.chdir(self.db_dir)
         
     # extract descriptor from xtb calculation results
-    def extract_xtb_result(self, dir_list=None, discriptor_list=None, atom_list=None):
+    def extract_xtb_result(self, dir_list=None, discriptor_list=None, atom_list=None, workers=1, use_cache=True, pair_list=None):
         '''
         extract xtb result according to discritor_list
+        workers: number of processes, structures are parsed in parallel if workers > 1
+        use_cache: load unchanged files from data/parse_cache.sqlite instead of parsing them again
+        pair_list: atom pairs of wbo discriptor, e.g. [('1', '2'), ('2', '5')], columns are dir_wbo-1-2
+        '''
+        key_list, discriptor_list, atom_list = self._get_xtb_key_list(dir_list, discriptor_list, atom_list, pair_list)
+        extract_func = functools.partial(extract_xtb_record, pair_list=pair_list)
+        structure_data_list, structure_status_list = self._extract_records(self.model_list, key_list, extract_func, discriptor_list, atom_list, workers, use_cache)
+        self._merge_structure_data(structure_data_list, structure_status_list)
+
+    def _get_xtb_key_list(self, dir_list=None, discriptor_list=None, atom_list=None, pair_list=None):
+        '''
+        check xtb extract input, return files to be parsed in each dir as [(dir, parser_name), ...]
         '''
         # define avaliable dir and discriptor
-        avaliable_dir_list = ['xtb-mod', 'xtb-fixmod', 'xtb-mod-xtb-sp', 'xtb-fixmod-xtb-sp']
-        avaliable_discriptor_list = ['SPE', 'Grad', 'Gap', 'ELUMO', 'EHOMO', 'charge']
+        avaliable_dir_list = self.get_stage_list(['xtb'])
+        avaliable_discriptor_list = ['SPE', 'Grad', 'Gap', 'ELUMO', 'EHOMO', 'charge', 'wbo']
         # parse dir input
         if dir_list is None:
             dir_list = avaliable_dir_list
         else:
             for dir in dir_list:
-                assert dir in avaliable_dir_list, 'dir should be xtb-mod, xtb-fixmod, xtb-mod-xtb-sp or xtb-fixmod-xtb-sp'
+                assert dir in avaliable_dir_list, 'dir should be ' + ', '.join(avaliable_dir_list)
         # parse discriptor input
         if discriptor_list is None:
-            discriptor_list = avaliable_discriptor_list
+            discriptor_list = avaliable_discriptor_list if pair_list else avaliable_discriptor_list[:-1]
         else:
             for discriptor in discriptor_list:
-                assert discriptor in avaliable_discriptor_list, 'discriptor should be SPE, Grad, Gap, ELUMO, EHOMO or charge+atomidx'
+                assert discriptor in avaliable_discriptor_list, 'discriptor should be SPE, Grad, Gap, ELUMO, EHOMO, charge+atomidx or wbo+atompair'
+            assert 'wbo' not in discriptor_list or pair_list, 'pair_list is needed by wbo'
         # parse atom input
         if atom_list is None:
             atom_list = []
 
+        # files to be parsed in each dir
+        key_list = []  # [(dir, parser_name), ...]
         for dir in dir_list:
-            for discriptor in discriptor_list:
-                if discriptor == 'charge':
-                    chrg_file_list = [file for file in os.listdir(self.db_dir + '/' + dir) if file.endswith('.charges')]
-                    chrg_file_list.sort()
-                    for atom in atom_list:
-                        data_name = dir + '_' + discriptor + '-' + atom
-                        data_list = []
-                        for chrg_file in chrg_file_list:
-                            data = extract_xtb_charge(self.db_dir + '/' + dir + '/' + chrg_file, int(atom))
-                            data_list.append(data)
-                        
-                        self.data_dict[data_name] = data_list
-                    continue
-
-                data_name = dir + '_' + discriptor
-                data_list = []
-                log_file_list = [file for file in os.listdir(self.db_dir + '/' + dir) if file.endswith('.log')]
-                log_file_list.sort()
-                for log_file in log_file_list:
-                    if discriptor == 'SPE':
-                        data = extract_xtb_SPE(self.db_dir + '/' + dir + '/' + log_file)
-                    elif discriptor == 'Grad':
-                        data = extract_xtb_Grad(self.db_dir + '/' + dir + '/' + log_file)
-                    elif discriptor == 'Gap':
-                        data = extract_xtb_Gap(self.db_dir + '/' + dir + '/' + log_file)
-                    elif discriptor == 'ELUMO':
-                        data = extract_xtb_ELUMO(self.db_dir + '/' + dir + '/' + log_file)
-                    elif discriptor == 'EHOMO':
-                        data = extract_xtb_EHOMO(self.db_dir + '/' + dir + '/' + log_file)
-                    data_list.append(data)
-
-                self.data_dict[data_name] = data_list
-
-    def extract_gaussian_result(self, dir_list=None, discriptor_list=None, atom_list=None):
+            if set(discriptor_list) - set(['charge', 'wbo']):
+                key_list.append((dir, 'xtb_log'))
+            if 'charge' in discriptor_list and atom_list != []:
+                key_list.append((dir, 'xtb_charges'))
+            if 'wbo' in discriptor_list:
+                key_list.append((dir, 'xtb_wbo'))
+
+        return key_list, discriptor_list, atom_list
+
+    def extract_gaussian_result(self, dir_list=None, discriptor_list=None, atom_list=None, workers=1, use_cache=True):
         '''
         extract xtb result according to discritor_list
+        workers: number of processes, structures are parsed in parallel if workers > 1
+        use_cache: load unchanged files from data/parse_cache.sqlite instead of parsing them again
+        '''
+        key_list, discriptor_list, atom_list = self._get_gau_key_list(dir_list, discriptor_list, atom_list)
+        structure_data_list, structure_status_list = self._extract_records(self.model_list, key_list, extract_gau_record, discriptor_list, atom_list, workers, use_cache)
+        self._merge_structure_data(structure_data_list, structure_status_list)
+
+    def _get_gau_key_list(self, dir_list=None, discriptor_list=None, atom_list=None):
+        '''
+        check gaussian extract input, return files to be parsed in each dir as [(dir, parser_name), ...]
         '''
         # define avaliable dir and discriptor
-        avaliable_dir_list = ['DFT-mod', 'DFT-mod-gau-sp', 'gauxtb-mod', 'gauxtb-mod-gau-sp', 'xtb-fixmod-gau-sp', 'xtb-mod-gau-sp']
+        avaliable_dir_list = self.get_stage_list(['gau', 'gauxtb'])
         avaliable_discriptor_list = ['SPE', 'ForceRMS', 'ForceMax', 'G', 'EHOMO', 'ELUMO', 'Gap', 'charge']
+        charge_discriptor_list = ['hirshfeld', 'cm5', 'nbo']  # optional charges, only extracted when asked
+        orbital_discriptor_list = ['EHOMO-{}'.format(i) for i in range(1, ORBITAL_WINDOW)] + ['ELUMO+{}'.format(i) for i in range(1, ORBITAL_WINDOW)]
         # parse dir input
         if dir_list is None:
             dir_list = avaliable_dir_list
         else:
             for dir in dir_list:
-                assert dir in avaliable_dir_list, 'dir should be DFT-mod, DFT-mod-gau-sp, gauxtb-mod, gauxtb-mod-gau-sp, xtb-fixmod-gau-sp, xtb-mod-gau-sp'
+                assert dir in avaliable_dir_list, 'dir should be ' + ', '.join(avaliable_dir_list)
         # parse discriptor input
         if discriptor_list is None:
             discriptor_list = avaliable_discriptor_list
         else:
             for discriptor in discriptor_list:
-                assert discriptor in avaliable_discriptor_list, 'discriptor should be SPE, ForceRMS, ForceMax, EHOMO, ELUMO, Gap, G or charge+atomidx'
+                assert discriptor in avaliable_discriptor_list + orbital_discriptor_list + charge_discriptor_list, 'discriptor should be SPE, ForceRMS, ForceMax, EHOMO, ELUMO, Gap, G, EHOMO-n, ELUMO+n (n < {}), or charge, hirshfeld, cm5, nbo + atomidx'.format(ORBITAL_WINDOW)
         # parse atom input
         if atom_list is None:
             atom_list = []
 
+        # files to be parsed in each dir
+        key_list = []  # [(dir, parser_name), ...]
         for dir in dir_list:
-            for discriptor in discriptor_list:
-                if discriptor == 'charge':
-                    chrg_file_list = [file for file in os.listdir(self.db_dir + '/' + dir + '/log') if file.endswith('.log')]
-                    chrg_file_list.sort()
-                    for atom in atom_list:
-                        data_name = dir + '_' + discriptor + '-' + atom
-                        data_list = []
-                        for chrg_file in chrg_file_list:
-                            data = extract_gau_Charge(self.db_dir + '/' + dir + '/log/' + chrg_file, int(atom))
-                            data_list.append(data)
-                        
-                        self.data_dict[data_name] = data_list
-                    continue
-
-                if discriptor in ['EHOMO', 'ELUMO', 'Gap']:
-                    data_name = dir + '_' + discriptor
-                    data_list = []
-                    fchk_file_list = [file for file in os.listdir(self.db_dir + '/' + dir + '/fchk') if file.endswith('.fchk')]
-                    fchk_file_list.sort()
-                    for fchk_file in fchk_file_list:
-                        mo = extract_gau_MO(self.db_dir + '/' + dir + '/fchk/' + fchk_file)
-                        if discriptor == 'EHOMO':
-                            data = mo[0]
-                        elif discriptor == 'ELUMO':
-                            data = mo[1]
-                        elif discriptor == 'Gap':
-                            data = mo[2]
-                        data_list.append(data)
-                    
-                    self.data_dict[data_name] = data_list
-                    continue
-
-                data_name = dir + '_' + discriptor
-                data_list = []
-                log_file_list = [file for file in os.listdir(self.db_dir + '/' + dir + '/log') if file.endswith('.log')]
-                log_file_list.sort()
-                for log_file in log_file_list:
-                    free = extract_gau_Free_Energy(self.db_dir + '/' + dir + '/log/' + log_file)
-                    force = extract_gau_Force(self.db_dir + '/' + dir + '/log/' + log_file)
-                    if discriptor == 'SPE':
-                        data = extract_gau_SPE(self.db_dir + '/' + dir + '/log/' + log_file)
-                    elif discriptor == 'G':
-                        data = free[1]
-                    elif discriptor == 'ForceRMS':
-                        data = force[0]
-                    elif discriptor == 'ForceMax':
-                        data = force[1]
-                    data_list.append(data)
-
-                self.data_dict[data_name] = data_list
+            if set(discriptor_list) & set(['SPE', 'ForceRMS', 'ForceMax', 'G', 'charge'] + charge_discriptor_list):
+                key_list.append((dir, 'gau_log'))
+            if set(discriptor_list) & set(['EHOMO', 'ELUMO', 'Gap'] + orbital_discriptor_list):
+                key_list.append((dir, 'gau_fchk'))
+
+        return key_list, discriptor_list, atom_list
+
+    # extract geometric descriptor from optimized structures
+    def extract_geometry_result(self, dir_list=None, distance_list=None, angle_list=None, dihedral_list=None,
+                                vbur_list=None, sterimol_list=None, sterimol_substituent_list=None, radius=3.5, workers=1, use_cache=True):
+        '''
+        extract geometric discriptors of all models at once, atom idx starts from 1
+        structures are read from xtb xyz files (-out.xyz of opt stages) or final geometry in gaussian log files
+        dir_list: default all first step stages, i.e. optimizations
+        distance_list: [('1', '2'), ...], columns are dir_dist-1-2
+        angle_list: [('1', '2', '3'), ...], vertex is the middle atom, columns are dir_angle-1-2-3
+        dihedral_list: [('1', '2', '3', '4'), ...], columns are dir_dihedral-1-2-3-4
+        vbur_list: center atoms of percent buried volume, ['1', ...], columns are dir_vbur-1
+        sterimol_list: axes of sterimol parameters, [('1', '2'), ...], columns are dir_sterimol-L-1-2, B1 and B5
+        sterimol_substituent_list: substituent atoms of each sterimol axis, [['2', '5', ...], ...],
+                                   default atoms on the '2' side of bond 1-2, nan if the bond is in a ring
+        radius: sphere radius of buried volume in angstrom
+        missing or unreadable structure files give nan with status code
+        '''
+        avaliable_dir_list = list(self.stage_dict.keys())
+        if dir_list is None:
+            dir_list = [dir for dir in avaliable_dir_list if self.stage_dict[dir].parent in [None, 'conformation']  # sp stages keep parent geometry
+                        and self.stage_dict[dir].engine != 'crest']
+        else:
+            for dir in dir_list:
+                assert dir in avaliable_dir_list, 'dir should be ' + ', '.join(avaliable_dir_list)
+        discriptor_dict = {'dist': distance_list or [], 'angle': angle_list or [], 'dihedral': dihedral_list or [],
+                           'vbur': vbur_list or [], 'sterimol': sterimol_list or [], 'sterimol_substituent': sterimol_substituent_list}
+        key_list = [(dir, 'xyz' if self.stage_dict[dir].engine == 'xtb' else 'gau_log') for dir in dir_list]
+
+        structure_job_list = [[(parser_name, self._get_output_file(model, dir, parser_name)) for dir, parser_name in key_list] for model in self.model_list]
+        cache = self._get_parse_cache() if use_cache else None
+        structure_record_list = parse_all_structures(structure_job_list, workers, cache)
+
+        for d, dir in enumerate(dir_list):
+            file_status = np.array([get_file_status(record_list[d]) for record_list in structure_record_list])
+            atom_number, coord = stack_structures([record_list[d].get('atom_number_list', []) for record_list in structure_record_list],
+                                                  [record_list[d].get('coord_list', []) for record_list in structure_record_list])
+            for data_name, data in self._get_geometry_data(dir, atom_number, coord, discriptor_dict, radius).items():
+                self.data_dict[data_name] = data.tolist()
+                self.status_dict[data_name] = np.where(file_status != STATUS_OK, file_status, get_value_status(data)).tolist()
+
+    def _get_geometry_data(self, dir, atom_number, coord, discriptor_dict, radius=3.5):
+        '''
+        compute geometric discriptors of stacked structures
+        discriptor_dict: {'dist', 'angle', 'dihedral', 'vbur', 'sterimol': atom idx lists starting from 1,
+                          'sterimol_substituent': substituent atoms of each sterimol axis or None}
+        return {data_name: (n_struct,) array}
+        '''
+        def get_idx(atom_list):  # 1-based atom strings into 0-based idx array
+            return np.array([[int(atom) - 1 for atom in atoms] for atoms in atom_list], dtype=np.int64)
+
+        data_dict = {}
+        for name, func in [('dist', get_distance), ('angle', get_angle), ('dihedral', get_dihedral)]:
+            if discriptor_dict[name] != []:
+                data = func(coord, get_idx(discriptor_dict[name]))
+                for i, atoms in enumerate(discriptor_dict[name]):
+                    data_dict[dir + '_' + name + '-' + '-'.join(atoms)] = data[:, i]
+        if discriptor_dict['vbur'] != []:
+            data = get_buried_volume(coord, atom_number, get_idx([[atom] for atom in discriptor_dict['vbur']]), radius)
+            for i, atom in enumerate(discriptor_dict['vbur']):
+                data_dict[dir + '_vbur-' + atom] = data[:, i]
+        if discriptor_dict['sterimol'] != []:
+            substituent_list = discriptor_dict.get('sterimol_substituent')
+            if substituent_list is not None:
+                substituent_list = [[int(atom) - 1 for atom in atoms] for atoms in substituent_list]
+            for kind, data in zip(['L', 'B1', 'B5'], get_sterimol(coord, atom_number, get_idx(discriptor_dict['sterimol']), substituent_list)):
+                for i, atoms in enumerate(discriptor_dict['sterimol']):
+                    data_dict[dir + '_sterimol-' + kind + '-' + '-'.join(atoms)] = data[:, i]
+        return data_dict
+
+    def extract_conformation_result(self, distance_list=None, angle_list=None, dihedral_list=None, vbur_list=None, sterimol_list=None,
+                                    sterimol_substituent_list=None, radius=3.5, temperature=298.15, workers=1, use_cache=True):
+        '''
+        extract Boltzmann averaged geometric discriptors over pruned conformer ensembles in conformation/
+        conformers are weighted by their crest energies at temperature (K)
+        discriptor arguments: see extract_geometry_result, columns are conformation_dist-1-2, ...
+        number of conformers of each model is kept in conformation_nconf
+        '''
+        discriptor_dict = {'dist': distance_list or [], 'angle': angle_list or [], 'dihedral': dihedral_list or [],
+                           'vbur': vbur_list or [], 'sterimol': sterimol_list or [], 'sterimol_substituent': sterimol_substituent_list}
+        structure_job_list = [[('xyz_ensemble', self._get_output_file(model, 'conformation', 'xyz_ensemble'))] for model in self.model_list]
+        cache = self._get_parse_cache() if use_cache else None
+        record_list = [record_list[0] for record_list in parse_all_structures(structure_job_list, workers, cache)]
+        file_status = np.array([get_file_status(record) for record in record_list])
+        record_list = [record if get_file_status(record) == STATUS_OK else {'energy_list': [], 'atom_number_list': [], 'coord_list': []}
+                       for record in record_list]  # missing or failed ensembles have no conformers
+
+        # all conformers of all models are computed at once, then averaged per model
+        nconf = np.array([len(record['energy_list']) for record in record_list])
+        atom_number, coord = stack_structures([atoms for record in record_list for atoms in record['atom_number_list']],
+                                              [coords for record in record_list for coords in record['coord_list']])
+        weight = np.concatenate([get_boltzmann_weight(record['energy_list'], temperature) for record in record_list])
+        model_idx = np.repeat(np.arange(len(record_list)), nconf)
+        self.data_dict['conformation_nconf'] = nconf.tolist()
+        self.status_dict['conformation_nconf'] = file_status.tolist()
+        for data_name, data in self._get_geometry_data('conformation', atom_number, coord, discriptor_dict, radius).items():
+            data = np.bincount(model_idx, weights=weight * data, minlength=len(record_list))
+            data = np.where(nconf > 0, data, np.nan)  # models without ensemble are nan, like missing structures
+            self.data_dict[data_name] = data.tolist()
+            self.status_dict[data_name] = np.where(file_status != STATUS_OK, file_status, get_value_status(data)).tolist()
+
+    def _get_output_file(self, model, dir, parser_name):
+        '''
+        get output file of model in dir read by parser_name
+        '''
+        file_name = model + self.stage_dict[dir].suffix
+        if parser_name == 'xtb_log':
+            return os.path.join(self.db_dir, dir, file_name + '.log')
+        elif parser_name == 'xtb_charges':
+            return os.path.join(self.db_dir, dir, file_name + '.charges')
+        elif parser_name == 'xtb_wbo':
+            return os.path.join(self.db_dir, dir, file_name + '.wbo')
+        elif parser_name == 'gau_log':
+            return os.path.join(self.db_dir, dir, 'log', file_name + '.log')
+        elif parser_name == 'gau_fchk':
+            return os.path.join(self.db_dir, dir, 'fchk', file_name + '.fchk')
+        elif parser_name == 'xyz_ensemble':
+            return os.path.join(self.db_dir, dir, file_name + '-ensemble.xyz')
+        elif parser_name == 'xyz':  # optimized structure of xtb opt, else input structure
+            if '{}-out.xyz' in self.stage_dict[dir].output_list:
+                return os.path.join(self.db_dir, dir, file_name + '-out.xyz')
+            return os.path.join(self.db_dir, dir, file_name + '.xyz')
+
+    def _get_parse_cache(self):
+        '''
+        open parse cache under data dir
+        '''
+        if self.parse_cache is None:
+            self.parse_cache = ParseCache(os.path.join(self.data_dir, 'parse_cache.sqlite'))
+        return self.parse_cache
+
+    def _extract_records(self, model_list, key_list, extract_func, discriptor_list, atom_list, workers=1, use_cache=True):
+        '''
+        parse output files of structures in model_list and extract discriptors
+        key_list: [(dir, parser_name), ...], files parsed for each structure
+        extract_func: extract_xtb_record or extract_gau_record
+        return list of {data_name: data} and list of {data_name: status code} in the order of model_list
+        '''
+        structure_job_list = [[(parser_name, self._get_output_file(model, dir, parser_name)) for dir, parser_name in key_list] for model in model_list]
+        cache = self._get_parse_cache() if use_cache else None
+        structure_record_list = parse_all_structures(structure_job_list, workers, cache)
+
+        dir_list = []
+        for dir, parser_name in key_list:
+            if dir not in dir_list:
+                dir_list.append(dir)
+
+        structure_data_list = []
+        structure_status_list = []
+        for record_list in structure_record_list:
+            dir_record_dict = {dir: {} for dir in dir_list}  # {dir: {parser_name: record}}
+            for (dir, parser_name), record in zip(key_list, record_list):
+                dir_record_dict[dir][parser_name] = record
+            structure_data = {}
+            structure_status = {}
+            for dir in dir_list:
+                structure_data.update(extract_func(dir, dir_record_dict[dir], discriptor_list, atom_list, status_dict=structure_status))
+            structure_data_list.append(structure_data)
+            structure_status_list.append(structure_status)
+
+        return structure_data_list, structure_status_list
+
+    def _merge_structure_data(self, structure_data_list, structure_status_list=None):
+        '''
+        merge per structure data (and status codes) into self.data_dict and self.status_dict
+        structure_data_list follows the order of self.model_list
+        '''
+        if len(structure_data_list) == 0:
+            return
+        for data_name in structure_data_list[0].keys():
+            self.data_dict[data_name] = [structure_data[data_name] for structure_data in structure_data_list]
+            if structure_status_list is not None:
+                self.status_dict[data_name] = [structure_status[data_name] for structure_status in structure_status_list]
+
+    # incremental update of descriptor database
+    def update_database(self, xtb_dir_list=None, xtb_discriptor_list=None, gau_dir_list=None, gau_discriptor_list=None,
+                        atom_list=None, workers=1, use_cache=True, data_file=None, rebuild=False, pair_list=None):
+        '''
+        update persistent descriptor table (default data/data.parquet) with new or changed models
+        a model is extracted if it is not in the table, or any of its output files is newer than the table
+        models with missing output files are skipped
+        xtb_dir_list, gau_dir_list: same as dir_list in extract_xtb_result and extract_gaussian_result, [] to skip
+        pair_list: atom pairs of xtb wbo discriptor
+        rebuild: extract all models, needed when dirs or discriptors differ from the existing table
+        self.data_dict is set to the updated table, return list of updated models
+        status codes are kept for updated models, status of other models is derived from values (nan is not found),
+        missing values of skipped models are missing_file
+        '''
+        if data_file is None:
+            data_file = os.path.join(self.data_dir, 'data.parquet')
+
+        # collect extract jobs
+        extract_job_list = []  # [(key_list, extract_func, discriptor_list, atom_list), ...]
+        if xtb_dir_list != []:
+            key_list, discriptor_list, xtb_atom_list = self._get_xtb_key_list(xtb_dir_list, xtb_discriptor_list, atom_list, pair_list)
+            extract_job_list.append((key_list, functools.partial(extract_xtb_record, pair_list=pair_list), discriptor_list, xtb_atom_list))
+        if gau_dir_list != []:
+            key_list, discriptor_list, gau_atom_list = self._get_gau_key_list(gau_dir_list, gau_discriptor_list, atom_list)
+            extract_job_list.append((key_list, extract_gau_record, discriptor_list, gau_atom_list))
+
+        # find new or changed models
+        if os.path.exists(data_file) and not rebuild:
+            data_df = read_descriptor_table(data_file)
+            data_mtime = os.stat(data_file).st_mtime_ns
+        else:
+            data_df = pd.DataFrame(index=pd.Index([], name='structure'))
+            data_mtime = -1
+        exist_model_set = set(data_df.index)
+
+        update_list = []
+        skip_list = []
+        for model in self.model_list:
+            changed = model not in exist_model_set
+            complete = True
+            for key_list, _, _, _ in extract_job_list:
+                for dir, parser_name in key_list:
+                    stamp = ParseCache.get_file_stamp(self._get_output_file(model, dir, parser_name))
+                    if stamp is None:
+                        complete = False
+                    elif stamp[1] > data_mtime:
+                        changed = True
+            if not complete:
+                skip_list.append(model)
+            elif changed:
+                update_list.append(model)
+        print('{} models to be updated, {} models skipped for missing output files'.format(len(update_list), len(skip_list)))
+        for model in skip_list:
+            print('output files of {} not complete, skipped'.format(model))
+
+        # extract and upsert updated models
+        if update_list != []:
+            update_data_list = [{} for model in update_list]
+            update_status_list = [{} for model in update_list]
+            for key_list, extract_func, discriptor_list, job_atom_list in extract_job_list:
+                structure_data_list, structure_status_list = self._extract_records(update_list, key_list, extract_func, discriptor_list, job_atom_list, workers, use_cache)
+                for update_data, structure_data in zip(update_data_list, structure_data_list):
+                    update_data.update(structure_data)
+                for update_status, structure_status in zip(update_status_list, structure_status_list):
+                    update_status.update(structure_status)
+            update_df = pd.DataFrame(update_data_list, index=pd.Index(update_list, name='structure'))
+            update_status_df = pd.DataFrame(update_status_list, index=update_df.index)
+
+            data_df = data_df.drop(update_list, errors='ignore')
+            data_df = pd.concat([data_df, update_df]).sort_index()
+            data_df.index.name = 'structure'
+            os.makedirs(os.path.dirname(data_file), exist_ok=True)
+            write_descriptor_table(data_df.reset_index(), data_file)
+
+        # refresh data_dict with current models
+        data_df = data_df.reindex(self.model_list)
+        self.data_dict = {'structure': self.model_list}
+        for data_name in data_df.columns:
+            self.data_dict[data_name] = data_df[data_name].tolist()
+        status_df = pd.DataFrame(get_value_status(data_df.to_numpy()), index=data_df.index, columns=data_df.columns)
+        if update_list != []:
+            status_df.update(update_status_df.reindex(columns=data_df.columns))
+        skip_mask = status_df.index.isin(skip_list)[:, None] & data_df.isna().to_numpy()  # values missing because output files are missing
+        status_df = status_df.mask(skip_mask, STATUS_MISSING_FILE)
+        self.status_dict = {data_name: status_df[data_name].astype(int).tolist() for data_name in data_df.columns}
+
+        return update_list
 
     # output data_dict as csv file
     def output_original_data_csv(self, out_file=None):
@@ -1174,41 +1028,136 @@ class DBgenerator:
         else:
             data_df.to_csv(out_file, index=False)
 
-    def output_pair_data_csv(self, out_file=None):
+    def get_status_df(self, summary=False):
         '''
-        output paired data as csv file
-        xxx-major and xxx-minor is considered as a pair
+        status code of every value in data_dict as dataframe, index is structure
+        data extracted without status (e.g. geometry, data read from parquet) are ok if finite, else not found
+        summary: return number of values of each status (columns, see STATUS_NAME_LIST) for every data_name instead
         '''
-        # create self.pair_data_dict, rename title names to xxx_major xxx_minor xxx_diff
-        self.pair_data_dict = {}
-        for title in self.data_dict.keys():
-            if title == 'structure':
-                self.pair_data_dict[title] = []
+        status_dict = {}
+        for data_name, data in self.data_dict.items():
+            if data_name == 'structure':
+                continue
+            if data_name in self.status_dict:
+                status_dict[data_name] = np.asarray(self.status_dict[data_name], dtype=np.int8)
             else:
-                self.pair_data_dict[title+'_major'] = []
-                self.pair_data_dict[title+'_minor'] = []
-                self.pair_data_dict[title+'_diff'] = []
-
-        for i in range(int(self.pair_db_size)):
-            major_idx = int(2*i)
-            minor_idx = int(2*i+1)
-            for title in self.data_dict.keys():
-                if title == 'structure':
-                    assert self.data_dict['structure'][major_idx][:-6] == self.data_dict['structure'][minor_idx][:-6], 'pair assign maybe wrong, please check'
-                    self.pair_data_dict['structure'].append(self.data_dict['structure'][major_idx][:-6])
-                else:
-                    self.pair_data_dict[title+'_major'].append(self.data_dict[title][major_idx])
-                    self.pair_data_dict[title+'_minor'].append(self.data_dict[title][minor_idx])
-                    diff_data = float(self.data_dict[title][major_idx]) - float(self.data_dict[title][minor_idx])
-                    self.pair_data_dict[title+'_diff'].append(format(diff_data, '.6f'))
-        
-        pair_data_df = pd.DataFrame(self.pair_data_dict)
+                status_dict[data_name] = get_value_status(pd.to_numeric(pd.Series(data, dtype=object), errors='coerce')).astype(np.int8)
+        status_df = pd.DataFrame(status_dict, index=pd.Index(self.data_dict['structure'], name='structure'))
+        if summary:
+            count = np.stack([(status_df.to_numpy() == code).sum(0) for code in range(len(STATUS_NAME_LIST))], axis=-1)
+            return pd.DataFrame(count, index=pd.Index(status_df.columns, name='data_name'), columns=STATUS_NAME_LIST)
+        return status_df
+
+    def output_status_csv(self, out_file=None):
+        '''
+        output status codes of data_dict as csv file, default data/data_status.csv
+        '''
+        if out_file is None:
+            out_file = os.path.join(self.data_dir, 'data_status.csv')
+        self.get_status_df().to_csv(out_file)
+
+    def get_pair_data_df(self, keep_unpaired=False):
+        '''
+        create paired data dataframe
+        xxx-major and xxx-minor is considered as a pair, paired by name instead of position
+        columns are xxx_major, xxx_minor and xxx_diff (major - minor) in float64
+        keep_unpaired: keep pairs missing major or minor structure with nan, else they are dropped
+        duplicated structures are reported and only the first one is used
+        '''
+        title_list = [title for title in self.data_dict.keys() if title != 'structure']
+        value = np.empty((len(self.data_dict['structure']), len(title_list)))
+        for j, title in enumerate(title_list):
+            try:
+                value[:, j] = np.asarray(self.data_dict[title], dtype=np.float64)
+            except (ValueError, TypeError):  # strings which are not numbers are nan
+                value[:, j] = pd.to_numeric(pd.Series(self.data_dict[title], dtype=object), errors='coerce')
+
+        # split -major/-minor suffix into pair name and label
+        name_split = [structure.rpartition('-') for structure in self.data_dict['structure']]
+        label = np.array([tmp[2] for tmp in name_split])
+        valid = (label == 'major') | (label == 'minor')
+        if not valid.all():
+            print('structures without -major/-minor suffix ignored:', [self.data_dict['structure'][i] for i in np.nonzero(~valid)[0]])
+        pair_code, pair_index = pd.factorize(np.array([tmp[0] for tmp in name_split], dtype=object)[valid])  # pairs in order of first structure
+        is_major = label[valid] == 'major'
+        value = value[valid]
+
+        # duplicated structures are reported, only the first one is kept
+        _, first_idx = np.unique(pair_code * 2 + is_major, return_index=True)
+        keep = np.zeros(len(pair_code), dtype=bool)
+        keep[first_idx] = True
+        if not keep.all():
+            structure_array = np.array(self.data_dict['structure'], dtype=object)[valid]
+            print('duplicated structures dropped, first one kept:', list(structure_array[~keep]))
+            pair_code, is_major, value = pair_code[keep], is_major[keep], value[keep]
+
+        # scatter major and minor rows into pair rows, missing partner is nan
+        major_count = np.bincount(pair_code[is_major], minlength=len(pair_index))
+        minor_count = np.bincount(pair_code[~is_major], minlength=len(pair_index))
+        major = np.full((len(pair_index), len(title_list)), np.nan)
+        minor = np.full((len(pair_index), len(title_list)), np.nan)
+        major[pair_code[is_major]] = value[is_major]
+        minor[pair_code[~is_major]] = value[~is_major]
+        unpaired = (major_count == 0) | (minor_count == 0)
+        if unpaired.any():
+            print('{} pairs without major or minor structure{}:'.format(unpaired.sum(), '' if keep_unpaired else ' dropped'),
+                  list(pair_index[unpaired]))
+            if not keep_unpaired:
+                pair_index, major, minor = pair_index[~unpaired], major[~unpaired], minor[~unpaired]
+
+        # interleave major, minor, diff of every title, diff is nan if either value is missing
+        diff = major - minor
+        missing = np.isnan(diff)
+        if missing.any():
+            print('{} missing diff values in {} columns, {} pairs'.format(missing.sum(), missing.any(0).sum(), missing.any(1).sum()))
+        pair_data = np.stack([major, minor, diff], axis=-1).reshape(len(pair_index), -1)
+        column_list = [title + kind for title in title_list for kind in ['_major', '_minor', '_diff']]
+        pair_data_df = pd.DataFrame(pair_data, columns=column_list)
+        pair_data_df.insert(0, 'structure', list(pair_index))
+        return pair_data_df
+
+    def output_pair_data_csv(self, out_file=None, keep_unpaired=False):
+        '''
+        output paired data as csv file
+        xxx-major and xxx-minor is considered as a pair, see get_pair_data_df
+        '''
+        pair_data_df = self.get_pair_data_df(keep_unpaired)
         if out_file is None:
             out_csv = os.path.join(self.data_dir, 'pair_data.csv')
             pair_data_df.to_csv(out_csv, index=False)
         else:
             pair_data_df.to_csv(out_file, index=False)
-   
+
+    # output data_dict into columnar store
+    def output_original_data_parquet(self, out_file=None):
+        '''
+        output data_dict as parquet file, descriptors stored as float64 columns grouped by method
+        '''
+        if out_file is None:
+            out_file = os.path.join(self.data_dir, 'data.parquet')
+        write_descriptor_table(pd.DataFrame(self.data_dict), out_file)
+
+    def output_pair_data_parquet(self, out_file=None, keep_unpaired=False):
+        '''
+        output paired data as parquet file, can be read by PairDataset directly
+        '''
+        if out_file is None:
+            out_file = os.path.join(self.data_dir, 'pair_data.parquet')
+        write_descriptor_table(self.get_pair_data_df(keep_unpaired), out_file)
+
+    def read_original_data(self, in_file=None):
+        '''
+        read data.parquet back into self.data_dict
+        only structures in self.model_list are kept, missing values are NaN
+        '''
+        if in_file is None:
+            in_file = os.path.join(self.data_dir, 'data.parquet')
+        data_df = read_descriptor_table(in_file).reindex(self.model_list)
+        self.data_dict = {'structure': self.model_list}
+        for data_name in data_df.columns:
+            self.data_dict[data_name] = data_df[data_name].tolist()
+        self.status_dict = {}  # derived from values by get_status_df
+
 
 if __name__ == '__main__':
     dbzs = DBgenerator()
\ No newline at end of file
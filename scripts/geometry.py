@@ -0,0 +1,223 @@
+'''
+Geometric discriptors of optimized structures
+
+Author: Zihao Ye
+
+all functions work on the whole database at once:
+coord: (n_struct, n_atom, 3) numpy array in angstrom, structures with fewer atoms are padded with nan
+atom_number: (n_struct, n_atom) int array, padded with 0
+atom idx in idx arrays starts from 0
+'''
+
+import re
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+ELEMENT_LIST = ['X', 'H', 'He',
+                'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
+                'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar',
+                'K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr',
+                'Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe',
+                'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu',
+                'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn',
+                'Fr', 'Ra', 'Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr',
+                'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og']  # idx is atomic number
+
+# Bondi van der Waals radii in angstrom, 2.0 for elements without Bondi radius
+BONDI_RADIUS_DICT = {'H': 1.20, 'He': 1.40, 'Li': 1.82, 'C': 1.70, 'N': 1.55, 'O': 1.52, 'F': 1.47, 'Ne': 1.54,
+                     'Na': 2.27, 'Mg': 1.73, 'Si': 2.10, 'P': 1.80, 'S': 1.80, 'Cl': 1.75, 'Ar': 1.88,
+                     'K': 2.75, 'Ni': 1.63, 'Cu': 1.40, 'Zn': 1.39, 'Ga': 1.87, 'As': 1.85, 'Se': 1.90, 'Br': 1.85, 'Kr': 2.02,
+                     'Pd': 1.63, 'Ag': 1.72, 'Cd': 1.58, 'In': 1.93, 'Sn': 2.17, 'Te': 2.06, 'I': 1.98, 'Xe': 2.16,
+                     'Pt': 1.75, 'Au': 1.66, 'Hg': 1.55, 'Tl': 1.96, 'Pb': 2.02}
+BONDI_RADIUS = np.array([0.0] + [BONDI_RADIUS_DICT.get(element, 2.0) for element in ELEMENT_LIST[1:]])  # idx is atomic number
+
+# covalent radii (Cordero et al. 2008) in angstrom, used to find bonds, 1.5 for other elements
+COVALENT_RADIUS_DICT = {'H': 0.31, 'B': 0.84, 'C': 0.76, 'N': 0.71, 'O': 0.66, 'F': 0.57,
+                        'Na': 1.66, 'Mg': 1.41, 'Al': 1.21, 'Si': 1.11, 'P': 1.07, 'S': 1.05, 'Cl': 1.02,
+                        'K': 2.03, 'Ti': 1.60, 'Cr': 1.39, 'Mn': 1.39, 'Fe': 1.32, 'Co': 1.26, 'Ni': 1.24, 'Cu': 1.32, 'Zn': 1.22,
+                        'Ge': 1.20, 'As': 1.19, 'Se': 1.20, 'Br': 1.20, 'Ru': 1.46, 'Rh': 1.42, 'Pd': 1.39, 'Ag': 1.45,
+                        'Sn': 1.39, 'Te': 1.38, 'I': 1.39, 'Ir': 1.41, 'Pt': 1.36, 'Au': 1.36}
+COVALENT_RADIUS = np.array([0.0] + [COVALENT_RADIUS_DICT.get(element, 1.5) for element in ELEMENT_LIST[1:]])  # idx is atomic number
+
+
+def get_atom_number(element):
+    '''
+    convert element symbol (or atomic number string) into atomic number
+    decorations after symbol are ignored, e.g. C(Iso=13), Cl1, Pd(Fragment=1)
+    '''
+    if element.isdigit():
+        return int(element)
+    element = re.match(r'[A-Za-z]*', element).group().capitalize()
+    assert element in ELEMENT_LIST, 'unknown element ' + element
+    return ELEMENT_LIST.index(element)
+
+def stack_structures(atom_number_list, coord_list):
+    '''
+    stack structures with different atom numbers into padded arrays
+    atom_number_list: [[atomic number, ...], ...], coord_list: [[[x, y, z], ...], ...]
+    return atom_number (n_struct, n_atom), coord (n_struct, n_atom, 3)
+    '''
+    n_atom = max([len(atom_numbers) for atom_numbers in atom_number_list] + [0])
+    atom_number = np.zeros((len(atom_number_list), n_atom), dtype=np.int64)
+    coord = np.full((len(atom_number_list), n_atom, 3), np.nan)
+    for i, (atom_numbers, coords) in enumerate(zip(atom_number_list, coord_list)):
+        atom_number[i, :len(atom_numbers)] = atom_numbers
+        if len(coords) > 0:
+            coord[i, :len(coords)] = coords
+    return atom_number, coord
+
+def _get_idx_array(idx_list, size):
+    idx_array = np.array(idx_list, dtype=np.int64).reshape(-1, size)
+    return idx_array
+
+def get_distance(coord, idx_list):
+    '''
+    distances of atom pairs, idx_list: [(i, j), ...]
+    return (n_struct, n_pair)
+    '''
+    idx = _get_idx_array(idx_list, 2)
+    return np.linalg.norm(coord[:, idx[:, 0]] - coord[:, idx[:, 1]], axis=-1)
+
+def get_angle(coord, idx_list):
+    '''
+    angles i-j-k in degree, j is the vertex, idx_list: [(i, j, k), ...]
+    return (n_struct, n_angle)
+    '''
+    idx = _get_idx_array(idx_list, 3)
+    v1 = coord[:, idx[:, 0]] - coord[:, idx[:, 1]]
+    v2 = coord[:, idx[:, 2]] - coord[:, idx[:, 1]]
+    cos = (v1 * v2).sum(-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+def get_dihedral(coord, idx_list):
+    '''
+    dihedral angles i-j-k-l in degree (-180, 180], idx_list: [(i, j, k, l), ...]
+    return (n_struct, n_dihedral)
+    '''
+    idx = _get_idx_array(idx_list, 4)
+    b0 = coord[:, idx[:, 0]] - coord[:, idx[:, 1]]
+    b1 = coord[:, idx[:, 2]] - coord[:, idx[:, 1]]
+    b2 = coord[:, idx[:, 3]] - coord[:, idx[:, 2]]
+    b1 = b1 / np.linalg.norm(b1, axis=-1, keepdims=True)
+    v = b0 - (b0 * b1).sum(-1, keepdims=True) * b1
+    w = b2 - (b2 * b1).sum(-1, keepdims=True) * b1
+    x = (v * w).sum(-1)
+    y = (np.cross(b1, v) * w).sum(-1)
+    return np.degrees(np.arctan2(y, x))
+
+def get_buried_volume(coord, atom_number, center_list, radius=3.5, scale=1.17, spacing=0.2, exclude_center=True, chunk_size=32):
+    '''
+    percent buried volume %Vbur of a sphere around center atoms
+    atoms are spheres of Bondi radius * scale, sphere volume is sampled on a cubic grid
+    center_list: [i, ...], exclude_center: center atom itself is not counted
+    chunk_size: number of structures tested against the grid at once
+    return (n_struct, n_center), unit in %
+    '''
+    axis = np.arange(-radius, radius + spacing / 2, spacing)
+    grid = np.stack(np.meshgrid(axis, axis, axis, indexing='ij'), axis=-1).reshape(-1, 3)
+    grid = grid[np.linalg.norm(grid, axis=-1) <= radius].T.astype(np.float32)  # (3, n_point)
+    grid_norm2 = (grid ** 2).sum(0)
+    atom_radius = BONDI_RADIUS[atom_number] * scale  # (n_struct, n_atom)
+    center = np.array(center_list, dtype=np.int64).reshape(-1)
+
+    vbur = np.full((coord.shape[0], len(center)), np.nan)
+    for c, center_idx in enumerate(center):
+        rel = coord - coord[:, center_idx:center_idx+1]  # (n_struct, n_atom, 3)
+        rel_radius = atom_radius.copy()
+        if exclude_center:
+            rel_radius[:, center_idx] = 0.0
+        # atoms too far away can not touch the sphere
+        valid = ~np.isnan(rel).any(-1) & (np.linalg.norm(np.nan_to_num(rel), axis=-1) < radius + rel_radius) & (rel_radius > 0)
+        # keep only atoms touching the sphere, (n_struct, n_near)
+        order = np.argsort(~valid, axis=-1, kind='stable')[:, :max(1, valid.sum(-1).max())]
+        near_rel = np.take_along_axis(np.nan_to_num(rel), order[:, :, None], axis=1).astype(np.float32)
+        near_radius2 = np.where(np.take_along_axis(valid, order, axis=-1),
+                                np.take_along_axis(rel_radius, order, axis=-1) ** 2, -1.0).astype(np.float32)
+        for start in range(0, coord.shape[0], chunk_size):
+            end = min(start + chunk_size, coord.shape[0])
+            # squared distances between atoms and grid points, (chunk, n_near, n_point)
+            dist2 = near_rel[start:end] @ grid
+            dist2 *= -2
+            dist2 += grid_norm2
+            dist2 += (near_rel[start:end] ** 2).sum(-1)[:, :, None]
+            vbur[start:end, c] = (dist2 <= near_radius2[start:end, :, None]).any(1).mean(-1) * 100
+        vbur[np.isnan(coord[:, center_idx]).any(-1), c] = np.nan
+    return vbur
+
+def get_substituent_mask(coord, atom_number, i, j, scale=1.2, chunk_size=64):
+    '''
+    atoms of substituent on the j side of bond i-j, found by cutting the bond in the connectivity graph
+    atoms are bonded if their distance is within scale * sum of covalent radii
+    bonds of all structures form one block diagonal graph, so connected components are found in one call
+    return (n_struct, n_atom) bool, all False if the substituent is not cut off by the bond, e.g. bond in a ring
+    '''
+    n_struct, n_atom = atom_number.shape
+    valid = (atom_number > 0) & ~np.isnan(coord).any(-1)
+    radius = COVALENT_RADIUS[atom_number]
+    xyz = np.nan_to_num(coord)
+    row_list = []
+    col_list = []
+    for start in range(0, n_struct, chunk_size):
+        end = min(start + chunk_size, n_struct)
+        dist = np.linalg.norm(xyz[start:end, :, None] - xyz[start:end, None], axis=-1)  # (chunk, n_atom, n_atom)
+        bond = dist <= scale * (radius[start:end, :, None] + radius[start:end, None])
+        bond &= valid[start:end, :, None] & valid[start:end, None]
+        bond[:, np.arange(n_atom), np.arange(n_atom)] = False
+        bond[:, i, j] = bond[:, j, i] = False  # cut bond i-j
+        struct_idx, a, b = np.nonzero(bond)
+        row_list.append((struct_idx + start) * n_atom + a)
+        col_list.append((struct_idx + start) * n_atom + b)
+    row = np.concatenate(row_list + [np.zeros(0, dtype=np.int64)])
+    col = np.concatenate(col_list + [np.zeros(0, dtype=np.int64)])
+    graph = sparse.csr_matrix((np.ones(len(row), dtype=np.int8), (row, col)), shape=(n_struct * n_atom, n_struct * n_atom))
+    _, label = connected_components(graph, directed=False)
+    label = label.reshape(n_struct, n_atom)
+    cut = (label[:, i] != label[:, j]) & valid[:, i] & valid[:, j]  # bond i-j separates the substituent
+    return (label == label[:, j:j+1]) & valid & cut[:, None]
+
+def get_sterimol(coord, atom_number, idx_list, substituent_list=None, n_direction=360):
+    '''
+    Sterimol parameters of substituent along axis i -> j, idx_list: [(i, j), ...]
+    substituent_list: atom idx of substituent of each axis, [[j, ...], ...],
+                      default atoms on the j side of bond i-j (get_substituent_mask), nan if the bond is in a ring
+    atoms are spheres of Bondi radius
+    L: length along axis from i, B1: minimum width, B5: maximum width perpendicular to axis
+    B1 is searched over n_direction directions in the perpendicular plane
+    return L, B1, B5, each (n_struct, n_axis), unit in angstrom
+    '''
+    idx = _get_idx_array(idx_list, 2)
+    atom_radius = BONDI_RADIUS[atom_number]  # (n_struct, n_atom)
+    theta = np.linspace(0, 2 * np.pi, n_direction, endpoint=False)
+    direction = np.stack([np.cos(theta), np.sin(theta)], axis=-1)  # (n_direction, 2)
+
+    L = np.full((coord.shape[0], len(idx)), np.nan)
+    B1 = np.full((coord.shape[0], len(idx)), np.nan)
+    B5 = np.full((coord.shape[0], len(idx)), np.nan)
+    for a, (i, j) in enumerate(idx):
+        rel = coord - coord[:, i:i+1]  # (n_struct, n_atom, 3)
+        z = rel[:, j] / np.linalg.norm(rel[:, j], axis=-1, keepdims=True)  # axis, (n_struct, 3)
+        # perpendicular basis x, y from a reference vector not parallel to z
+        ref = np.where(np.abs(z[:, :1]) < 0.9, np.array([[1.0, 0.0, 0.0]]), np.array([[0.0, 1.0, 0.0]]))
+        x = np.cross(z, ref)
+        x = x / np.linalg.norm(x, axis=-1, keepdims=True)
+        y = np.cross(z, x)
+
+        mask = (atom_number > 0) & ~np.isnan(rel).any(-1)
+        if substituent_list is not None:
+            substituent_mask = np.zeros(coord.shape[1], dtype=bool)
+            substituent_mask[list(substituent_list[a])] = True
+            mask &= substituent_mask
+        else:
+            mask &= get_substituent_mask(coord, atom_number, i, j)
+        mask[:, i] = False
+        found = mask.any(-1)
+        rel = np.nan_to_num(rel)
+        proj_z = (rel * z[:, None]).sum(-1)  # (n_struct, n_atom)
+        proj_xy = np.stack([(rel * x[:, None]).sum(-1), (rel * y[:, None]).sum(-1)], axis=-1)  # (n_struct, n_atom, 2)
+
+        L[found, a] = np.where(mask, proj_z + atom_radius, -np.inf).max(-1)[found]
+        B5[found, a] = np.where(mask, np.linalg.norm(proj_xy, axis=-1) + atom_radius, -np.inf).max(-1)[found]
+        extent = (proj_xy[:, :, None, :] * direction[None, None]).sum(-1) + atom_radius[:, :, None]  # (n_struct, n_atom, n_direction)
+        B1[found, a] = np.where(mask[:, :, None], extent, -np.inf).max(1).min(-1)[found]
+    return L, B1, B5
@@ -0,0 +1,179 @@
+'''
+Array based molecule shared by file converters and extractors
+
+Author: Zihao Ye
+
+a Molecule keeps atomic numbers as int16 array and coordinates as float64 (n_atom, 3) array in angstrom,
+so a structure is split into numbers once when it is read, and geometry math works on arrays
+readers: gjf, xyz, gaussian log (last Input orientation), xtb output (xyz or turbomole coord)
+writers: gjf coordinate lines, xyz file
+'''
+
+import re
+import mmap
+import numpy as np
+try:
+    from scripts.geometry import ELEMENT_LIST, get_atom_number
+except ImportError:  # run as a script in scripts/
+    from geometry import ELEMENT_LIST, get_atom_number
+
+BOHR_TO_ANGSTROM = 0.529177210903
+GJF_COORD_FORMAT = ' {:<10s} {:15.10f} {:15.10f} {:15.10f}\n'
+XYZ_COORD_FORMAT = '{:<3s} {:15.10f} {:15.10f} {:15.10f}\n'
+
+
+class Molecule:
+    '''
+    atom_number: (n_atom,) int16 array of atomic numbers
+    coord: (n_atom, 3) float64 array, unit in angstrom
+    charge, multiplicity: 0 and 1 if not given in file
+    title: title line of gjf or comment line of xyz
+    label_list: atom labels of gjf written back instead of element symbols, e.g. C(Iso=13), C -1 (frozen atom)
+                None if all atoms are plain element symbols
+    '''
+    __slots__ = ['atom_number', 'coord', 'charge', 'multiplicity', 'title', 'label_list']
+
+    def __init__(self, atom_number, coord, charge=0, multiplicity=1, title='', label_list=None):
+        self.atom_number = np.asarray(atom_number, dtype=np.int16).reshape(-1)
+        self.coord = np.asarray(coord, dtype=np.float64).reshape(-1, 3)
+        assert len(self.atom_number) == len(self.coord), 'atom number and coord do not match'
+        self.charge = charge
+        self.multiplicity = multiplicity
+        self.title = title
+        self.label_list = label_list
+
+    def __len__(self):
+        return len(self.atom_number)
+
+    def __getitem__(self, idx):
+        '''
+        molecule of selected atoms, e.g. molecule[:10] for the first fragment, atom idx starts from 0
+        '''
+        label_list = None if self.label_list is None else list(np.array(self.label_list, dtype=object)[idx])
+        return Molecule(self.atom_number[idx], self.coord[idx], self.charge, self.multiplicity, self.title, label_list)
+
+    def get_element_list(self):
+        return [ELEMENT_LIST[n] for n in self.atom_number]
+
+    def get_element_set(self):
+        return set(self.get_element_list())
+
+    # readers
+    @classmethod
+    def from_coord_lines(cls, line_list, charge=0, multiplicity=1, title=''):
+        '''
+        read coordinate lines '{label} x y z', label is element symbol or atomic number with optional decorations
+        '''
+        label_list = []
+        atom_number_list = []
+        coord_list = []
+        plain = True
+        for line in line_list:
+            tmplist = line.split()
+            if tmplist == []:
+                continue
+            label = ' '.join(tmplist[:-3])
+            atom_number = get_atom_number(tmplist[0])
+            label_list.append(label)
+            atom_number_list.append(atom_number)
+            coord_list.append(tmplist[-3:])
+            if label != ELEMENT_LIST[atom_number] and label != str(atom_number):
+                plain = False
+        coord = np.array(coord_list, dtype=np.float64).reshape(-1, 3)
+        return cls(atom_number_list, coord, charge, multiplicity, title, None if plain else label_list)
+
+    @classmethod
+    def from_gjf(cls, gjf_file):
+        '''
+        read the first structure in gjf file, cartesian coordinates only
+        '''
+        with open(gjf_file) as f:
+            line_list = f.readlines()
+        empty_idx_list = [i for i, line in enumerate(line_list) if line.strip() == '']
+        title = ''.join(line_list[empty_idx_list[0]+1:empty_idx_list[1]]).strip()
+        c_m = line_list[empty_idx_list[1]+1].split()
+        end = empty_idx_list[2] if len(empty_idx_list) > 2 else len(line_list)
+        return cls.from_coord_lines(line_list[empty_idx_list[1]+2:end], int(c_m[0]), int(c_m[1]), title)
+
+    @classmethod
+    def from_xyz(cls, xyz_file):
+        '''
+        read single structure xyz file
+        '''
+        with open(xyz_file) as f:
+            atom_num = int(f.readline().split()[0])
+            title = f.readline().strip()
+            line_list = [f.readline() for i in range(atom_num)]
+        return cls.from_coord_lines(line_list, title=title)
+
+    @classmethod
+    def from_log_table(cls, table):
+        '''
+        read orientation table of gaussian log (bytes or str), rows: center, atomic number, atomic type, x, y, z
+        '''
+        value = np.array(table.split(), dtype=np.float64).reshape(-1, 6)
+        return cls(value[:, 1], value[:, 3:])
+
+    @classmethod
+    def from_log(cls, log_file):
+        '''
+        read the last Input orientation (Standard orientation if not found) in gaussian log file
+        file is searched from the end by mmap, the lines are not read one by one
+        '''
+        with open(log_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = data.rfind(b'Input orientation:')
+            if start < 0:
+                start = data.rfind(b'Standard orientation:')
+            assert start >= 0, 'no structure found in ' + log_file
+            for i in range(5):  # title and 4 header lines
+                start = data.find(b'\n', start) + 1
+            end = data.find(b' ---', start)
+            molecule = cls.from_log_table(data[start:end])
+
+            c_m_start = data.find(b'Multiplicity =')
+            if c_m_start >= 0:
+                c_m_line = data[data.rfind(b'\n', 0, c_m_start)+1:data.find(b'\n', c_m_start)].decode()
+                c_m = re.findall(r'-?\d+', c_m_line)
+                molecule.charge, molecule.multiplicity = int(c_m[0]), int(c_m[1])
+        return molecule
+
+    @classmethod
+    def from_xtb(cls, xtb_file):
+        '''
+        read xtb output structure, xyz (xtbopt.xyz, -out.xyz) or turbomole coord in bohr (xtbopt.coord)
+        '''
+        if xtb_file.endswith('.xyz'):
+            return cls.from_xyz(xtb_file)
+        atom_number_list = []
+        coord_list = []
+        with open(xtb_file) as f:
+            in_coord = 0
+            for line in f:
+                if line.startswith('$'):
+                    in_coord = line.startswith('$coord')
+                    continue
+                if in_coord:
+                    tmplist = line.split()
+                    atom_number_list.append(get_atom_number(tmplist[3]))
+                    coord_list.append(tmplist[:3])
+        return cls(atom_number_list, np.array(coord_list, dtype=np.float64) * BOHR_TO_ANGSTROM)
+
+    # writers
+    def get_gjf_lines(self):
+        '''
+        coordinate lines of gjf file, atom labels are kept
+        '''
+        label_list = self.label_list if self.label_list is not None else self.get_element_list()
+        return [GJF_COORD_FORMAT.format(label, *xyz) for label, xyz in zip(label_list, self.coord.tolist())]
+
+    def get_xyz_lines(self, title=None):
+        '''
+        lines of xyz file, default title is self.title
+        '''
+        title = self.title if title is None else title
+        return [str(len(self)) + '\n', title + '\n'] + \
+               [XYZ_COORD_FORMAT.format(element, *xyz) for element, xyz in zip(self.get_element_list(), self.coord.tolist())]
+
+    def write_xyz(self, xyz_file, title=None):
+        with open(xyz_file, 'w') as f:
+            f.writelines(self.get_xyz_lines(title))
@@ -0,0 +1,90 @@
+'''
+Persistent cache of parsed calculation output files
+
+Author: Zihao Ye
+
+records are stored in a SQLite file (default data/parse_cache.sqlite)
+each record is keyed by (path, parser) and only valid when file size, mtime and parser version are unchanged
+'''
+
+import os
+import json
+import sqlite3
+
+
+class ParseCache:
+    '''
+    on-disk cache of records returned by parsers in extractor
+    records must be json serializable
+    '''
+    def __init__(self, cache_file):
+        self.cache_file = os.path.abspath(cache_file)
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        self.conn = sqlite3.connect(self.cache_file)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS parse_cache (
+            path TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            record TEXT NOT NULL,
+            PRIMARY KEY (path, parser))''')
+        self.conn.commit()
+
+    @staticmethod
+    def get_file_stamp(file_name):
+        '''
+        return (size, mtime in ns) of file_name, None if file not found
+        '''
+        try:
+            stat = os.stat(file_name)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, file_name, parser, version):
+        '''
+        get cached record of file_name parsed by parser
+        return None if not cached or file changed since it was parsed
+        '''
+        stamp = self.get_file_stamp(file_name)
+        if stamp is None:
+            return None
+        row = self.conn.execute('SELECT size, mtime, version, record FROM parse_cache WHERE path=? AND parser=?',
+                                (os.path.abspath(file_name), parser)).fetchone()
+        if row is None or tuple(row[:3]) != (stamp[0], stamp[1], version):
+            return None
+        return json.loads(row[3])
+
+    def put_many(self, item_list):
+        '''
+        store records in one transaction
+        item_list: [(file_name, parser, version, record, stamp), ...]
+        stamp: (size, mtime) taken by get_file_stamp before the file was parsed,
+               so a file changed while being parsed does not match it and is parsed again
+        '''
+        row_list = []
+        for file_name, parser, version, record, stamp in item_list:
+            if stamp is None:
+                continue
+            row_list.append((os.path.abspath(file_name), parser, stamp[0], stamp[1], version, json.dumps(record)))
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?, ?)', row_list)
+
+    def put(self, file_name, parser, version, record, stamp=None):
+        '''
+        store a single record, stamp is taken now if not given
+        '''
+        if stamp is None:
+            stamp = self.get_file_stamp(file_name)
+        self.put_many([(file_name, parser, version, record, stamp)])
+
+    def clear(self):
+        '''
+        remove all cached records
+        '''
+        with self.conn:
+            self.conn.execute('DELETE FROM parse_cache')
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,247 @@
+'''
+Dependency-aware pipeline runner of database calculations
+
+Author: Zihao Ye
+
+every (structure, stage) pair is a node, which depends on (structure, parent stage)
+a node starts as soon as its own parent node is done, not when the whole parent stage is done
+xtb and crest nodes run in a local pool (scripts/runxtb.py, scripts/runcrest.py), gaussian nodes are submitted by a scheduler (scripts/scheduler.py)
+progress is saved into a json file (default data/pipeline.json) after every change, so the run can be resumed
+
+node states: pending, running, done, failed
+'''
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from scripts.runxtb import run_xtb_job
+from scripts.executor import JobLedger
+from scripts.scheduler import get_gau_job, IN_FLIGHT_STATE_LIST
+from scripts.statusindex import StatusIndex
+
+LOCAL_ENGINE_LIST = ['xtb', 'crest']  # engines run in the local pool
+
+
+class Pipeline:
+    '''
+    DB: DBgenerator
+    stage_list: stages to run, default all xtb stages, conformation search if first step stages start from it,
+                and all gaussian stages if scheduler is given
+    xtb_workers, omp_threads, xtb_bin, timeout: see run_xtb_jobs, crest nodes share the local pool
+    crest_bin: see run_crest_jobs
+    scheduler: Scheduler of gaussian nodes, None to skip gaussian stages
+    gau_bin, formchk_bin: see get_gau_job
+    max_attempt: a failed node is retried until max_attempt runs
+    '''
+    def __init__(self, DB, stage_list=None, xtb_workers=1, omp_threads=None, xtb_bin='xtb', timeout=None,
+                 scheduler=None, gau_bin='g09', formchk_bin='formchk', max_attempt=1, progress_file=None, crest_bin='crest'):
+        self.DB = DB
+        if stage_list is None:
+            parent_list = [stage.parent for stage in DB.stage_dict.values()]
+            stage_list = [name for name, stage in DB.stage_dict.items()
+                          if stage.engine == 'xtb' or (stage.engine == 'crest' and name in parent_list) or (stage.is_gaussian() and scheduler is not None)]
+        for stage_name in stage_list:
+            assert stage_name in DB.stage_dict, 'stage {} not registered'.format(stage_name)
+            assert DB.stage_dict[stage_name].engine in LOCAL_ENGINE_LIST or scheduler is not None, 'scheduler is needed by gaussian stage ' + stage_name
+        self.stage_list = stage_list
+        self.xtb_workers = xtb_workers
+        self.omp_threads = omp_threads if omp_threads is not None else max(1, (os.cpu_count() or 1) // xtb_workers)
+        self.xtb_bin = xtb_bin
+        self.crest_bin = crest_bin
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.gau_bin = gau_bin
+        self.formchk_bin = formchk_bin
+        self.max_attempt = max_attempt
+        self.progress_file = progress_file if progress_file is not None else os.path.join(DB.data_dir, 'pipeline.json')
+        self.ledger = JobLedger(DB.get_ledger_file())
+
+        self.node_dict = {}  # {stage: {model: {'state', 'attempt', 'job_id'}}}
+        self.load_progress()
+
+    # progress
+    def load_progress(self):
+        '''
+        set node states from output files and progress file
+        nodes with all output files are done, running nodes without output files are checked again by their jobs
+        '''
+        saved_dict = {}
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file) as f:
+                saved_dict = json.load(f).get('node_dict', {})
+
+        self.DB.status_index = StatusIndex(self.DB.db_dir)
+        model_state_dict = self.DB.get_model_state()
+        for stage_name in self.stage_list:
+            self.node_dict[stage_name] = {}
+            for model in self.DB.model_list:
+                node = dict(saved_dict.get(stage_name, {}).get(model, {'state': 'pending', 'attempt': 0, 'job_id': None}))
+                if model_state_dict[stage_name][model] == 3:
+                    node['state'] = 'done'
+                elif node['state'] == 'done':  # output files removed
+                    node['state'] = 'pending'
+                self.node_dict[stage_name][model] = node
+
+    def save_progress(self):
+        '''
+        write progress file atomically
+        '''
+        os.makedirs(os.path.dirname(self.progress_file), exist_ok=True)
+        tmp_file = self.progress_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'stage_list': self.stage_list, 'node_dict': self.node_dict}, f, indent=1)
+        os.replace(tmp_file, self.progress_file)
+
+    def get_summary(self):
+        '''
+        return {stage: {state: number of nodes}}
+        '''
+        summary_dict = {}
+        for stage_name, model_dict in self.node_dict.items():
+            summary_dict[stage_name] = {}
+            for node in model_dict.values():
+                summary_dict[stage_name][node['state']] = summary_dict[stage_name].get(node['state'], 0) + 1
+        return summary_dict
+
+    # node status
+    def _is_output_ready(self, stage_name, model):
+        stage = self.DB.stage_dict[stage_name]
+        return all([os.path.exists(os.path.join(self.DB.db_dir, stage_name, file)) for file in stage.get_output_list(model)])
+
+    def _is_parent_done(self, stage_name, model):
+        '''
+        parent node is done, or parent stage is not in pipeline and its output files exist
+        '''
+        parent = self.DB.stage_dict[stage_name].parent
+        if parent is None:
+            return True
+        if parent in self.node_dict:
+            return self.node_dict[parent][model]['state'] == 'done'
+        return self._is_output_ready(parent, model)
+
+    def _get_ready_list(self):
+        ready_list = []
+        for stage_name in self.stage_list:
+            for model, node in self.node_dict[stage_name].items():
+                if node['state'] == 'pending' and self._is_parent_done(stage_name, model):
+                    ready_list.append((stage_name, model))
+        return ready_list
+
+    def _finish_node(self, stage_name, model):
+        '''
+        mark node done if output files exist, else failed or pending for retry
+        '''
+        node = self.node_dict[stage_name][model]
+        node['job_id'] = None
+        if self._is_output_ready(stage_name, model):
+            node['state'] = 'done'
+        elif node['attempt'] < self.max_attempt:
+            node['state'] = 'pending'
+        else:
+            node['state'] = 'failed'
+            print('{} of {} failed'.format(stage_name, model))
+
+    # run
+    def _prepare_input(self, stage_name, model, prepared_list):
+        stage = self.DB.stage_dict[stage_name]
+        if stage_name not in prepared_list:
+            self.DB.prepare_stage_dir(stage_name)
+            prepared_list.append(stage_name)
+        if not os.path.exists(os.path.join(self.DB.db_dir, stage_name, stage.get_input_file(model))):
+            return self.DB.generate_model_input(stage_name, model)
+        return True
+
+    def run(self, interval=10, retry_failed=False):
+        '''
+        run all nodes until every node is done or failed, or blocked by a failed parent
+        retry_failed: reset failed nodes to pending before running
+        return {stage: {state: number of nodes}}
+        '''
+        if retry_failed:
+            for model_dict in self.node_dict.values():
+                for node in model_dict.values():
+                    if node['state'] == 'failed':
+                        node['state'], node['attempt'] = 'pending', 0
+
+        # nodes left running by a previous run, gaussian jobs may still be in queue
+        for stage_name in self.stage_list:
+            for model, node in self.node_dict[stage_name].items():
+                if node['state'] != 'running':
+                    continue
+                if node['job_id'] is None:  # local job killed with previous run, not counted as an attempt
+                    node['attempt'] -= 1
+                    node['state'] = 'done' if self._is_output_ready(stage_name, model) else 'pending'
+                elif self.scheduler.poll(node['job_id']) not in IN_FLIGHT_STATE_LIST:
+                    self._finish_node(stage_name, model)
+                else:
+                    self.scheduler.job_dict[node['job_id']] = model
+        self.save_progress()
+
+        prepared_list = []
+        xtb_future_dict = {}  # {(stage, model): future}
+        xtb_executor = ThreadPoolExecutor(max_workers=self.xtb_workers)
+        try:
+            while True:
+                changed = False
+                # collect finished xtb nodes
+                for key, future in list(xtb_future_dict.items()):
+                    if future.done():
+                        del xtb_future_dict[key]
+                        self._finish_node(*key)
+                        changed = True
+                # collect finished gaussian nodes
+                for stage_name in self.stage_list:
+                    for model, node in self.node_dict[stage_name].items():
+                        if node['state'] == 'running' and node['job_id'] is not None:
+                            if self.scheduler.poll(node['job_id']) not in IN_FLIGHT_STATE_LIST:
+                                self._finish_node(stage_name, model)
+                                changed = True
+
+                # start ready nodes
+                gau_in_flight = len([1 for model_dict in self.node_dict.values() for node in model_dict.values()
+                                     if node['state'] == 'running' and node['job_id'] is not None])
+                for stage_name, model in self._get_ready_list():
+                    stage = self.DB.stage_dict[stage_name]
+                    if stage.engine in LOCAL_ENGINE_LIST and len(xtb_future_dict) >= self.xtb_workers:
+                        continue
+                    if stage.engine not in LOCAL_ENGINE_LIST and self.scheduler.max_in_flight is not None and gau_in_flight >= self.scheduler.max_in_flight:
+                        continue
+                    node = self.node_dict[stage_name][model]
+                    node['attempt'] += 1
+                    changed = True
+                    if not self._prepare_input(stage_name, model, prepared_list):
+                        node['state'] = 'failed'
+                        continue
+                    input_file = os.path.join(self.DB.db_dir, stage_name, stage.get_input_file(model))
+                    if stage.engine == 'xtb':
+                        inp_name = '' if stage.xtb_inp_file is None else os.path.join(self.DB.db_dir, stage_name, stage.xtb_inp_file)
+                        xtb_future_dict[(stage_name, model)] = xtb_executor.submit(run_xtb_job, input_file, *self.DB.get_model_charge(model), inp_name, stage.xtb_job_type,
+                                                                                   self.omp_threads, self.xtb_bin, self.timeout, self.ledger)
+                        node['state'] = 'running'
+                    elif stage.engine == 'crest':
+                        xtb_future_dict[(stage_name, model)] = xtb_executor.submit(self.DB.run_conformation_model, model, self.omp_threads,
+                                                                                   self.crest_bin, self.timeout, self.ledger)
+                        node['state'] = 'running'
+                    else:
+                        job = get_gau_job(input_file, stage.nproc, self.gau_bin, self.formchk_bin)
+                        job_id = self.scheduler.submit(job['job_name'], job['cmd'], job['cwd'], job['nproc'])
+                        if job_id is None:
+                            node['state'] = 'pending' if node['attempt'] < self.max_attempt else 'failed'
+                            continue
+                        node['state'], node['job_id'] = 'running', job_id
+                        gau_in_flight += 1
+
+                if changed:
+                    self.save_progress()
+                running = any([node['state'] == 'running' for model_dict in self.node_dict.values() for node in model_dict.values()])
+                if not running and self._get_ready_list() == []:
+                    break
+                time.sleep(interval if xtb_future_dict == {} else min(interval, 1))
+        finally:
+            xtb_executor.shutdown(wait=True)
+            self.save_progress()
+
+        summary_dict = self.get_summary()
+        print(summary_dict)
+        return summary_dict
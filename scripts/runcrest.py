@@ -0,0 +1,90 @@
+'''
+Conformation search jobs by CREST
+
+Author: Zihao Ye
+
+every job runs in its own temporary working directory next to the input xyz file, like xtb jobs in runxtb.py
+output files: {xyz_name}.log, {xyz_name}-conformers.xyz (crest_conformers.xyz, energy in Eh as title of each frame)
+scripts/fakecrest.py can be used as crest_bin for testing without CREST
+'''
+
+import os
+import sys
+import shlex
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from scripts.executor import run_command, JobLedger
+except ImportError:  # run as a script in scripts/
+    from executor import run_command, JobLedger
+
+def get_crest_cmd(xyz_name, charge=0, uhf=0, omp_threads=1, crest_bin='crest'):
+    '''
+    get crest command as argument list
+    crest_bin can include arguments, e.g. 'python scripts/fakecrest.py'
+    use gfn2-xTB for the search
+    '''
+    return shlex.split(crest_bin) + [xyz_name, '--gfn2', '--chrg', str(charge), '--uhf', str(uhf), '-T', str(omp_threads)]
+
+def run_crest_job(xyz_name, charge=0, uhf=0, omp_threads=1, crest_bin='crest', timeout=None, ledger=None):
+    '''
+    run a single crest job in its own temporary working directory
+    conformer file is moved only if the job finished, log file is moved last
+    timeout: seconds before the job is killed, None for no limit
+    ledger: JobLedger, exit code and timings of the job are recorded
+    return True if the job finished
+    '''
+    xyz_name = os.path.abspath(xyz_name)
+    conformer_name = xyz_name.rsplit('.', 1)[0] + '-conformers.xyz'
+    log_name = xyz_name.rsplit('.', 1)[0] + '.log'
+
+    env = dict(os.environ)
+    env['OMP_NUM_THREADS'] = str(omp_threads)
+    env['MKL_NUM_THREADS'] = str(omp_threads)
+
+    work_dir = tempfile.mkdtemp(prefix='.cresttmp-', dir=os.path.dirname(xyz_name))
+    try:
+        with open(os.path.join(work_dir, 'crest.log'), 'w') as log_file:
+            record = run_command(get_crest_cmd(xyz_name, charge, uhf, omp_threads, crest_bin), cwd=work_dir, env=env,
+                                 stdout=log_file, timeout=timeout)
+        finished = record['returncode'] == 0 and os.path.exists(os.path.join(work_dir, 'crest_conformers.xyz'))
+        if finished:
+            os.replace(os.path.join(work_dir, 'crest_conformers.xyz'), conformer_name)
+        os.replace(os.path.join(work_dir, 'crest.log'), log_name)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    record.update({'job': xyz_name, 'job_type': 'crest', 'omp_threads': omp_threads, 'finished': finished})
+    if ledger is not None:
+        ledger.add(record)
+
+    if finished:
+        print('crest conformation search finished for {} ({:.1f} s)'.format(xyz_name, record['wall_time']))
+    elif record['timed_out']:
+        print('crest conformation search killed after {} s for {}'.format(timeout, xyz_name))
+    else:
+        print('crest conformation search failed for {}, exit code {}'.format(xyz_name, record['returncode']))
+    return finished
+
+def run_crest_jobs(job_list, workers=1, omp_threads=None, crest_bin='crest', timeout=None, ledger_file=None):
+    '''
+    run crest jobs concurrently
+    job_list: [(xyz_name, charge, uhf), ...]
+    workers, omp_threads, timeout, ledger_file: see run_xtb_jobs
+    return {xyz_name: finished}
+    '''
+    ledger = JobLedger(ledger_file) if ledger_file is not None else None
+    if omp_threads is None:
+        omp_threads = max(1, (os.cpu_count() or 1) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        finished_list = list(executor.map(lambda job: run_crest_job(job[0], job[1], job[2], omp_threads, crest_bin, timeout, ledger), job_list))
+    print('{} of {} crest jobs finished'.format(sum(finished_list), len(job_list)))
+    return dict(zip([job[0] for job in job_list], finished_list))
+
+
+if __name__ == '__main__':
+    xyz_name = sys.argv[1]
+    charge = int(sys.argv[2])
+    uhf = int(sys.argv[3])
+    run_crest_job(xyz_name, charge, uhf, omp_threads=os.cpu_count() or 1)
@@ -1,55 +1,113 @@
 import os
 import sys
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from scripts.executor import run_command, JobLedger
+except ImportError:  # run as a script in scripts/
+    from executor import run_command, JobLedger
 
-def submit_xtb_job(xyz_name, charge=0, uhf=0, inp_name='', job_type='sp'):
+def get_xtb_cmd(xyz_name, charge=0, uhf=0, inp_name=None, job_type='sp', xtb_bin='xtb'):
     '''
-    Submit a single xtb job
-    default charge is 0, default uhf is 0
+    get xtb command as argument list
     use gfn2-xTB for the calculation
-    default not input file
-    default output file is {xyz_name}-out.xyz
     '''
-    out_name = xyz_name.split('.')[0] + '-out.xyz'
-    log_name = xyz_name.split('.')[0] + '.log'
-    chrg_name = xyz_name.split('.')[0] + '.charges'
-    wbo_name = xyz_name.split('.')[0] + '.wbo'
+    xtbcmd = [xtb_bin, xyz_name, '--gfn2', '--chrg', str(charge), '--uhf', str(uhf)]
+    if job_type == 'opt':
+        xtbcmd.append('--opt')
+    if inp_name is not None:
+        xtbcmd += ['--input', inp_name]
+    return xtbcmd
+
+def run_xtb_job(xyz_name, charge=0, uhf=0, inp_name='', job_type='sp', omp_threads=1, xtb_bin='xtb', timeout=None, ledger=None):
+    '''
+    run a single xtb job in its own temporary working directory
+    temporary directory is created next to xyz_name, so output files are moved back atomically
+    output files: {xyz_name}.log, {xyz_name}.charges, {xyz_name}.wbo, {xyz_name}-out.xyz (opt only)
+    log file is moved last, other outputs are moved only if the job finished
+    timeout: seconds before the job is killed, None for no limit
+    ledger: JobLedger, exit code and timings of the job are recorded
+    return True if the job finished
+    '''
+    if job_type not in ['sp', 'opt']:
+        print('Job type not recognized')
+        return False
+
+    xyz_name = os.path.abspath(xyz_name)
+    out_name = xyz_name.rsplit('.', 1)[0] + '-out.xyz'
+    log_name = xyz_name.rsplit('.', 1)[0] + '.log'
+    chrg_name = xyz_name.rsplit('.', 1)[0] + '.charges'
+    wbo_name = xyz_name.rsplit('.', 1)[0] + '.wbo'
 
     if not os.path.exists(inp_name):
         print('input file not found!')
         inp_name = None
+    else:
+        inp_name = os.path.abspath(inp_name)
 
-    if job_type == 'sp':
-        if inp_name is None:
-            xtbcmd = 'xtb {xyz_name} --gfn2 --chrg {charge} --uhf {uhf} > {log_name}'.format(xyz_name=xyz_name, charge=charge, uhf=uhf, log_name=log_name)
-        else:
-            xtbcmd = 'xtb {xyz_name} --gfn2 --chrg {charge} --uhf {uhf} --input {inp_name} > {log_name}'.format(xyz_name=xyz_name, charge=charge, uhf=uhf, inp_name=inp_name, log_name=log_name)
-        try:
-            os.system(xtbcmd)
-            os.system('mv charges {chrg_name}'.format(chrg_name=chrg_name))  # rename output charges
-            os.system('mv wbo {wbo_name}'.format(wbo_name=wbo_name))  # rename output wbo
-            os.system('rm -f xtbrestart xtbtopo.mol')
-        except Exception as e:
-            print('xtb sp calculation failed for {xyz_name}'.format(xyz_name=xyz_name))
-            print(e)
-        else:
-            print('xtb sp calculation finished for {xyz_name}'.format(xyz_name=xyz_name))
+    env = dict(os.environ)
+    env['OMP_NUM_THREADS'] = str(omp_threads)
+    env['MKL_NUM_THREADS'] = str(omp_threads)
 
-    elif job_type == 'opt':
-        if inp_name is None:
-            xtbcmd = 'xtb {xyz_name} --gfn2 --chrg {charge} --uhf {uhf} --opt > {log_name}'.format(xyz_name=xyz_name, charge=charge, uhf=uhf, log_name=log_name)
-        else:
-            xtbcmd = 'xtb {xyz_name} --gfn2 --chrg {charge} --uhf {uhf} --opt --input {inp_name} > {log_name}'.format(xyz_name=xyz_name, charge=charge, uhf=uhf, inp_name=inp_name, log_name=log_name) 
-        os.system(xtbcmd)
-        if os.path.exists('.xtboptok'):
-            os.system('mv xtbopt.xyz {out_name}'.format(out_name=out_name))  # rename output structure
-            os.system('mv charges {chrg_name}'.format(chrg_name=chrg_name))  # rename output charges
-            os.system('mv wbo {wbo_name}'.format(wbo_name=wbo_name))  # rename output wbo
-            os.system('rm -f .xtboptok xtbrestart xtbtopo.mol xtbopt.log')
-            print('xtb opt calculation finished for {xyz_name}'.format(xyz_name=xyz_name))
+    work_dir = tempfile.mkdtemp(prefix='.xtbtmp-', dir=os.path.dirname(xyz_name))
+    try:
+        with open(os.path.join(work_dir, 'xtb.log'), 'w') as log_file:
+            record = run_command(get_xtb_cmd(xyz_name, charge, uhf, inp_name, job_type, xtb_bin), cwd=work_dir, env=env,
+                                 stdout=log_file, timeout=timeout)
+
+        if job_type == 'opt':
+            finished = record['returncode'] == 0 and os.path.exists(os.path.join(work_dir, '.xtboptok'))
+            result_dict = {'xtbopt.xyz': out_name, 'charges': chrg_name, 'wbo': wbo_name}
         else:
-            print('xtb opt calculation failed for {xyz_name}'.format(xyz_name=xyz_name))
+            finished = record['returncode'] == 0 and os.path.exists(os.path.join(work_dir, 'charges'))
+            result_dict = {'charges': chrg_name, 'wbo': wbo_name}
+        if finished:
+            for file, target in result_dict.items():
+                if os.path.exists(os.path.join(work_dir, file)):
+                    os.replace(os.path.join(work_dir, file), target)
+        os.replace(os.path.join(work_dir, 'xtb.log'), log_name)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    record.update({'job': xyz_name, 'job_type': job_type, 'omp_threads': omp_threads, 'finished': finished})
+    if ledger is not None:
+        ledger.add(record)
+
+    if finished:
+        print('xtb {} calculation finished for {} ({:.1f} s)'.format(job_type, xyz_name, record['wall_time']))
+    elif record['timed_out']:
+        print('xtb {} calculation killed after {} s for {}'.format(job_type, timeout, xyz_name))
     else:
-        print('Job type not recognized')
+        print('xtb {} calculation failed for {}, exit code {}'.format(job_type, xyz_name, record['returncode']))
+    return finished
+
+def run_xtb_jobs(xyz_list, charge=0, uhf=0, inp_name='', job_type='sp', workers=1, omp_threads=None, xtb_bin='xtb', timeout=None, ledger_file=None):
+    '''
+    run xtb jobs concurrently, each job in its own temporary working directory
+    workers: number of jobs running at the same time
+    omp_threads: OMP_NUM_THREADS of each job, default cpu_count // workers
+    timeout: seconds before each job is killed, None for no limit
+    ledger_file: job ledger (json lines) recording exit code and timings of each job, None for no ledger
+    return {xyz_name: finished}
+    '''
+    ledger = JobLedger(ledger_file) if ledger_file is not None else None
+    if omp_threads is None:
+        omp_threads = max(1, (os.cpu_count() or 1) // workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        finished_list = list(executor.map(lambda xyz_name: run_xtb_job(xyz_name, charge, uhf, inp_name, job_type, omp_threads, xtb_bin, timeout, ledger), xyz_list))
+    print('{} of {} xtb jobs finished'.format(sum(finished_list), len(xyz_list)))
+    return dict(zip(xyz_list, finished_list))
+
+def submit_xtb_job(xyz_name, charge=0, uhf=0, inp_name='', job_type='sp'):
+    '''
+    Submit a single xtb job
+    default charge is 0, default uhf is 0
+    use gfn2-xTB for the calculation
+    default not input file
+    default output file is {xyz_name}-out.xyz
+    '''
+    return run_xtb_job(xyz_name, charge, uhf, inp_name, job_type, omp_threads=os.cpu_count() or 1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,265 @@
+'''
+Job schedulers of gaussian calculations
+
+Author: Zihao Ye
+
+a scheduler submits per-structure jobs and gives back job ids, which can be polled or cancelled
+SGEScheduler: submit to SGE by qsub, poll by qstat (exit status of jobs left the queue by qacct), cancel by qdel
+LocalScheduler: run jobs in a local process pool, e.g. with scripts/fakegau.py as gaussian for testing
+submit_all keeps at most max_in_flight jobs queued or running, so the queue quota is used without flooding it
+
+job states: queued, running, finished, failed, cancelled
+'''
+
+import os
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from scripts.executor import run_command, kill_process_group, JobLedger
+
+IN_FLIGHT_STATE_LIST = ['queued', 'running']
+QSTAT_TIMEOUT = 60  # seconds before a hanging qstat call is given up
+
+
+def get_gau_job(gjf_file, nproc=8, gau_bin='g09', formchk_bin='formchk'):
+    '''
+    get job of one gaussian input file
+    job runs in the dir of gjf_file, writes log/{name}.log and fchk/{name}.fchk
+    log file is moved into log/ last, so an existing log/{name}.log means the job is over
+    '''
+    job_dir, gjf_name = os.path.split(os.path.abspath(gjf_file))
+    name = gjf_name.rsplit('.', 1)[0]
+    cmd = ('mkdir -p log fchk; '
+           '{gau} < {name}.gjf > {name}.log; status=$?; '
+           'if [ -f {name}.chk ]; then {formchk} {name}.chk fchk/{name}.fchk > /dev/null && rm -f {name}.chk; fi; '
+           'mv {name}.log log/; exit $status').format(gau=gau_bin, formchk=formchk_bin, name=name)
+    return {'job_name': name, 'cmd': cmd, 'cwd': job_dir, 'nproc': nproc}
+
+
+class Scheduler:
+    '''
+    base class of schedulers
+    subclass implements submit, poll, cancel and get_in_flight
+    '''
+    def __init__(self, max_in_flight=None):
+        self.max_in_flight = max_in_flight  # None for no limit
+        self.job_dict = {}  # {job id: job name}
+
+    def submit(self, job_name, cmd, cwd, nproc=1):
+        '''
+        submit shell command cmd running in cwd, return job id
+        '''
+        raise NotImplementedError
+
+    def poll(self, job_id):
+        '''
+        return state of job
+        '''
+        raise NotImplementedError
+
+    def cancel(self, job_id):
+        '''
+        cancel queued or running job
+        '''
+        raise NotImplementedError
+
+    def get_in_flight(self):
+        '''
+        get ids of queued or running jobs submitted by this scheduler
+        '''
+        return [job_id for job_id in self.job_dict if self.poll(job_id) in IN_FLIGHT_STATE_LIST]
+
+    def submit_all(self, job_list, interval=10):
+        '''
+        submit jobs (dicts with job_name, cmd, cwd, nproc), keep at most max_in_flight jobs in flight
+        return {job name: job id}
+        '''
+        job_id_dict = {}
+        for job in job_list:
+            if self.max_in_flight is not None:
+                while len(self.get_in_flight()) >= self.max_in_flight:
+                    time.sleep(interval)
+            job_id = self.submit(job['job_name'], job['cmd'], job['cwd'], job.get('nproc', 1))
+            if job_id is not None:
+                job_id_dict[job['job_name']] = job_id
+        return job_id_dict
+
+    def wait_all(self, job_id_list=None, interval=10):
+        '''
+        wait until jobs are over, all submitted jobs if job_id_list is None
+        return {job id: state}
+        '''
+        if job_id_list is None:
+            job_id_list = list(self.job_dict.keys())
+        while True:
+            state_dict = {job_id: self.poll(job_id) for job_id in job_id_list}
+            if all([state not in IN_FLIGHT_STATE_LIST for state in state_dict.values()]):
+                return state_dict
+            time.sleep(interval)
+
+
+class SGEScheduler(Scheduler):
+    '''
+    submit jobs to SGE
+    a job script {job_name}.sh is written in cwd and submitted by qsub
+    pe: parallel environment, queue: queue name, None for default
+    a job left the queue is failed if qacct reports a nonzero failed code or exit status,
+    finished if it succeeded or qacct has no record of it (e.g. accounting disabled), check output files then
+    '''
+    def __init__(self, max_in_flight=None, pe='smp', queue=None, qsub_option=''):
+        super().__init__(max_in_flight)
+        self.pe = pe
+        self.queue = queue
+        self.qsub_option = qsub_option
+        self.cancelled_list = []
+        self.state_dict = {}  # {job id: last known state}, used when qstat fails
+
+    def submit(self, job_name, cmd, cwd, nproc=1):
+        script_file = os.path.join(cwd, job_name + '.sh')
+        with open(script_file, 'w') as f:
+            f.write('#!/bin/bash\n')
+            f.write('#$ -N {}\n'.format(job_name))
+            f.write('#$ -cwd\n')
+            f.write('#$ -j y\n')
+            f.write('#$ -o {}.o\n'.format(job_name))
+            f.write('#$ -pe {} {}\n'.format(self.pe, nproc))
+            if self.queue is not None:
+                f.write('#$ -q {}\n'.format(self.queue))
+            f.write(cmd + '\n')
+
+        qsub_cmd = ['qsub', '-terse'] + self.qsub_option.split() + [script_file]
+        result = subprocess.run(qsub_cmd, cwd=cwd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print('qsub failed for {}: {}'.format(job_name, result.stderr.strip()))
+            return None
+        job_id = result.stdout.strip().split('.')[0]  # array jobs are printed as id.1-n:1
+        self.job_dict[job_id] = job_name
+        print('{} submitted, job id {}'.format(job_name, job_id))
+        return job_id
+
+    def _qstat(self):
+        '''
+        get {job id: SGE state} of all jobs of current user by one qstat call
+        return None if qstat failed, e.g. the scheduler is not reachable for a moment
+        '''
+        try:
+            result = subprocess.run(['qstat'], capture_output=True, text=True, timeout=QSTAT_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print('qstat failed: {}'.format(e))
+            return None
+        if result.returncode != 0:
+            print('qstat failed, exit code {}: {}'.format(result.returncode, result.stderr.strip()))
+            return None
+        qstat_dict = {}
+        for line in result.stdout.splitlines()[2:]:  # skip header lines
+            if len(line.split()) > 4:
+                qstat_dict[line.split()[0]] = line.split()[4]
+        return qstat_dict
+
+    def _qacct(self, job_id):
+        '''
+        get state of job left the queue from SGE accounting, failed if failed code or exit status is nonzero
+        return None if qacct failed or has no record of the job
+        '''
+        try:
+            result = subprocess.run(['qacct', '-j', job_id], capture_output=True, text=True, timeout=QSTAT_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print('qacct failed: {}'.format(e))
+            return None
+        if result.returncode != 0:
+            return None
+        code_list = [line.split()[1] for line in result.stdout.splitlines()
+                     if len(line.split()) > 1 and line.split()[0] in ['failed', 'exit_status']]  # one record per task
+        if len(code_list) == 0:
+            return None
+        return 'finished' if all([code == '0' for code in code_list]) else 'failed'
+
+    def _get_state(self, job_id, qstat_dict):
+        if job_id in self.cancelled_list:
+            return 'cancelled'
+        if qstat_dict is None:  # qstat failed, keep the last known state, new jobs are queued
+            return self.state_dict.get(job_id, 'queued')
+        if job_id not in qstat_dict:
+            if self.state_dict.get(job_id) in ['finished', 'failed']:  # qacct is called once per job
+                return self.state_dict[job_id]
+            state = self._qacct(job_id) or 'finished'  # no accounting record, check output files for success
+        elif 'E' in qstat_dict[job_id]:
+            state = 'failed'
+        elif 'q' in qstat_dict[job_id] or 'h' in qstat_dict[job_id]:
+            state = 'queued'
+        else:
+            state = 'running'
+        self.state_dict[job_id] = state
+        return state
+
+    def poll(self, job_id):
+        return self._get_state(job_id, self._qstat())
+
+    def get_in_flight(self):
+        qstat_dict = self._qstat()
+        return [job_id for job_id in self.job_dict if self._get_state(job_id, qstat_dict) in IN_FLIGHT_STATE_LIST]
+
+    def cancel(self, job_id):
+        subprocess.run(['qdel', job_id], capture_output=True)
+        self.cancelled_list.append(job_id)
+
+
+class LocalScheduler(Scheduler):
+    '''
+    run jobs in a local process pool
+    workers: number of jobs running at the same time
+    ledger_file: job ledger recording exit code and timings of each job, None for no ledger
+    '''
+    def __init__(self, workers=1, max_in_flight=None, ledger_file=None):
+        super().__init__(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.ledger = JobLedger(ledger_file) if ledger_file is not None else None
+        self.future_dict = {}  # {job id: future of job record}
+        self.proc_dict = {}  # {job id: Popen of running job}
+        self.cancelled_list = []
+        self.lock = threading.Lock()
+        self.job_num = 0
+
+    def _run(self, job_id, job_name, cmd, cwd):
+        with open(os.path.join(cwd, job_name + '.o'), 'w') as out_file:
+            record = run_command(['bash', '-c', cmd], cwd=cwd, stdout=out_file,
+                                 started=lambda proc: self.proc_dict.__setitem__(job_id, proc))
+        self.proc_dict.pop(job_id, None)
+        record.update({'job': job_name, 'job_id': job_id})
+        if self.ledger is not None:
+            self.ledger.add(record)
+        return record
+
+    def submit(self, job_name, cmd, cwd, nproc=1):
+        with self.lock:
+            self.job_num += 1
+            job_id = str(self.job_num)
+        self.job_dict[job_id] = job_name
+        self.future_dict[job_id] = self.executor.submit(self._run, job_id, job_name, cmd, cwd)
+        return job_id
+
+    def poll(self, job_id):
+        if job_id not in self.future_dict:  # submitted by another process, which is over
+            return 'finished'
+        future = self.future_dict[job_id]
+        if job_id in self.cancelled_list:
+            return 'cancelled'
+        if not future.done():
+            return 'running' if future.running() else 'queued'
+        if future.result()['returncode'] == 0:
+            return 'finished'
+        return 'failed'
+
+    def cancel(self, job_id):
+        if self.poll(job_id) not in IN_FLIGHT_STATE_LIST:
+            return
+        self.cancelled_list.append(job_id)
+        if not self.future_dict[job_id].cancel() and job_id in self.proc_dict:
+            kill_process_group(self.proc_dict[job_id])
+
+    def shutdown(self):
+        '''
+        wait for running jobs and stop the pool
+        '''
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,138 @@
+'''
+Stage registry of database generator
+
+Author: Zihao Ye
+
+every calculation stage (dir in database) is described once here,
+generation, status check, execution and extraction in DBgenerator are all driven by the registry
+new stages can be added by register_stage() or by utils/stages.json in database dir, e.g.
+[
+    {"name": "DFT-mod-gau-sp-tz", "parent": "DFT-mod", "suffix": "-gautzsp", "engine": "gau",
+     "source_file": "log/{}.log", "model_file": "gautzmodel.gjf"}
+]
+'''
+
+import os
+import json
+
+
+class Stage:
+    '''
+    description of one calculation stage
+
+    name: dir name of stage, e.g. DFT-mod
+    parent: name of parent stage, None if input is generated from rawmodel
+    suffix: file name suffix, file name = model + suffix, e.g. -gau
+    engine: gau (gaussian), gauxtb (gaussian invoking xtb), xtb or crest (conformation search)
+    source_file: file in parent dir (or rawmodel dir) used to generate input, {} is model + parent suffix
+    model_file: model gjf file in utils/, needed when input file is gjf
+    util_list: files copied from utils/ into stage dir
+    xtb_job_type: opt or sp, used by xtb engine
+    xtb_inp_file: xtb input file in stage dir, used by xtb engine
+    submit_option: qg09 options, used by gau and gauxtb engine
+    nproc: processors of each job, used by gau and gauxtb engine when jobs are submitted by a scheduler
+    input_file, output_list: patterns relative to stage dir, {} is model + suffix, default by engine
+    '''
+    def __init__(self, name, parent=None, suffix='', engine='gau', source_file='{}.gjf', model_file=None, util_list=None,
+                 xtb_job_type='sp', xtb_inp_file=None, submit_option='-p 8 -a', nproc=8, input_file=None, output_list=None):
+        assert engine in ['gau', 'gauxtb', 'xtb', 'crest'], 'engine should be gau, gauxtb, xtb or crest'
+        self.name = name
+        self.parent = parent
+        self.suffix = suffix
+        self.engine = engine
+        self.source_file = source_file
+        self.model_file = model_file
+        self.util_list = util_list if util_list is not None else []
+        self.xtb_job_type = xtb_job_type
+        self.xtb_inp_file = xtb_inp_file
+        self.submit_option = submit_option
+        self.nproc = nproc
+
+        if input_file is None:
+            input_file = '{}.xyz' if engine in ['xtb', 'crest'] else '{}.gjf'
+        self.input_file = input_file
+        if output_list is None:
+            if engine == 'xtb' and xtb_job_type == 'opt':
+                output_list = ['{}.log', '{}-out.xyz', '{}.charges', '{}.wbo']
+            elif engine == 'xtb':
+                output_list = ['{}.log', '{}.charges', '{}.wbo']
+            elif engine == 'crest':  # whole ensemble, pruned ensemble and lowest energy conformation
+                output_list = ['{}.log', '{}-conformers.xyz', '{}-ensemble.xyz', '{}-best.gjf']
+            else:
+                output_list = ['log/{}.log', 'fchk/{}.fchk']
+        self.output_list = output_list
+
+    def get_input_file(self, model):
+        '''
+        input file of model, relative to stage dir
+        '''
+        return self.input_file.format(model + self.suffix)
+
+    def get_output_list(self, model):
+        '''
+        output files of model, relative to stage dir
+        '''
+        return [pattern.format(model + self.suffix) for pattern in self.output_list]
+
+    def is_gaussian(self):
+        return self.engine in ['gau', 'gauxtb']
+
+
+STAGE_REGISTRY = {}  # {stage name: Stage} of built-in stages, parent stage is always registered before its children
+
+def register_stage(stage, registry=None):
+    '''
+    add stage into registry (default STAGE_REGISTRY), stage with the same name is replaced
+    '''
+    if registry is None:
+        registry = STAGE_REGISTRY
+    assert stage.parent is None or stage.parent in registry, 'parent stage {} not registered'.format(stage.parent)
+    registry[stage.name] = stage
+    return stage
+
+def load_stage_file(stage_file, registry=None):
+    '''
+    register stages described in a json file (a list of Stage keyword arguments) into registry, default STAGE_REGISTRY
+    '''
+    with open(stage_file) as f:
+        stage_arg_list = json.load(f)
+    for stage_args in stage_arg_list:
+        register_stage(Stage(**stage_args), registry)
+
+def get_stage_registry(stage_file=None):
+    '''
+    copy of STAGE_REGISTRY with stages of stage_file added, e.g. registry of one database
+    STAGE_REGISTRY itself is not changed
+    '''
+    registry = dict(STAGE_REGISTRY)
+    if stage_file is not None:
+        load_stage_file(stage_file, registry)
+    return registry
+
+def get_stage_list(engine_list=None, registry=None):
+    '''
+    get stage names in registry (default STAGE_REGISTRY), filtered by engine
+    '''
+    if registry is None:
+        registry = STAGE_REGISTRY
+    return [name for name, stage in registry.items() if engine_list is None or stage.engine in engine_list]
+
+
+register_stage(Stage('conformation', suffix='-cf', engine='crest'))
+register_stage(Stage('DFT-mod', suffix='-gau', engine='gau', model_file='gaumodel.gjf'))
+register_stage(Stage('DFT-mod-gau-sp', parent='DFT-mod', suffix='-gaugausp', engine='gau',
+                     source_file='log/{}.log', model_file='gauspmodel.gjf'))
+register_stage(Stage('gauxtb-mod', suffix='-gauxtb', engine='gauxtb', model_file='gauxtbmodel.gjf',
+                     util_list=['extderi', 'genxyz', 'xtb.sh'], submit_option='-p 1 -x -a', nproc=1))
+register_stage(Stage('gauxtb-mod-gau-sp', parent='gauxtb-mod', suffix='-gauxtbgausp', engine='gau',
+                     source_file='log/{}.log', model_file='gauspmodel.gjf'))
+register_stage(Stage('xtb-mod', suffix='-xtb', engine='xtb', util_list=['constrain.inp'],
+                     xtb_job_type='opt', xtb_inp_file='constrain.inp'))
+register_stage(Stage('xtb-fixmod', suffix='-xtbfix', engine='xtb', util_list=['fix.inp'],
+                     xtb_job_type='opt', xtb_inp_file='fix.inp'))
+register_stage(Stage('xtb-mod-xtb-sp', parent='xtb-mod', suffix='-xtb-sp', engine='xtb', source_file='{}-out.xyz'))
+register_stage(Stage('xtb-fixmod-xtb-sp', parent='xtb-fixmod', suffix='-xtbfix-sp', engine='xtb', source_file='{}-out.xyz'))
+register_stage(Stage('xtb-fixmod-gau-sp', parent='xtb-fixmod', suffix='-xtbfixgausp', engine='gau',
+                     source_file='{}-out.xyz', model_file='gauspmodel.gjf'))
+register_stage(Stage('xtb-mod-gau-sp', parent='xtb-mod', suffix='-xtbgausp', engine='gau',
+                     source_file='{}-out.xyz', model_file='gauspmodel.gjf'))
@@ -0,0 +1,87 @@
+'''
+File status index of database directories
+
+Author: Zihao Ye
+
+every directory is listed once with os.scandir, file checks are set lookups afterwards
+'''
+
+import os
+
+
+class StatusIndex:
+    '''
+    index of file names in db_dir and its sub dirs
+    paths are relative to db_dir, e.g. 'DFT-mod/log'
+    '''
+    def __init__(self, db_dir):
+        self.db_dir = db_dir
+        self.file_dict = {}  # {rel_dir: set of entry names}, None if rel_dir not found
+
+    def scan(self, rel_dir):
+        '''
+        list rel_dir once and cache the entry names
+        log/ and fchk/ sub dirs are listed together with rel_dir
+        '''
+        self.file_dict[rel_dir] = self._scandir(rel_dir)
+        for sub_dir in ['log', 'fchk']:
+            if self.file_dict[rel_dir] is not None and sub_dir in self.file_dict[rel_dir]:
+                self.file_dict[rel_dir + '/' + sub_dir] = self._scandir(rel_dir + '/' + sub_dir)
+            else:
+                self.file_dict[rel_dir + '/' + sub_dir] = None
+
+    def _scandir(self, rel_dir):
+        try:
+            with os.scandir(os.path.join(self.db_dir, rel_dir)) as it:
+                return set(entry.name for entry in it)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def get_dir(self, rel_dir):
+        '''
+        get entry names in rel_dir, scan it if not indexed yet
+        return None if rel_dir not found
+        '''
+        if rel_dir not in self.file_dict:
+            parent_dir = os.path.dirname(rel_dir)
+            if parent_dir != '' and parent_dir not in self.file_dict:
+                self.scan(parent_dir)
+            if rel_dir not in self.file_dict:
+                self.file_dict[rel_dir] = self._scandir(rel_dir)
+        return self.file_dict[rel_dir]
+
+    def exists(self, *path_list):
+        '''
+        check whether path (joined by path_list, relative to db_dir) exists
+        e.g. exists('DFT-mod'), exists('DFT-mod/log', 'Xu01-1a-2a-major-gau.log')
+        '''
+        path = '/'.join(path_list).strip('/')
+        if path in self.file_dict:  # indexed dir
+            return self.file_dict[path] is not None
+        rel_dir, name = os.path.split(path)
+        if rel_dir == '':
+            if '' not in self.file_dict:
+                self.file_dict[''] = self._scandir('')
+            entry_set = self.file_dict['']
+        else:
+            entry_set = self.get_dir(rel_dir)
+        return entry_set is not None and name in entry_set
+
+    def get_stage_state(self, rel_dir, model_list, input_list, output_list):
+        '''
+        get state of every model in one stage
+        input_list, output_list: file name patterns relative to rel_dir, {} is replaced by model name
+        return {model: state}, 0: no dir, 1: dir exists, 2: input files exist, 3: output files exist
+        '''
+        if not self.exists(rel_dir):
+            return {model: 0 for model in model_list}
+
+        state_dict = {}
+        for model in model_list:
+            state = 1
+            if all([self.exists(rel_dir, pattern.format(model)) for pattern in input_list]):
+                state = 2
+                if all([self.exists(rel_dir, pattern.format(model)) for pattern in output_list]):
+                    state = 3
+            state_dict[model] = state
+        return state_dict
@@ -0,0 +1,112 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from scripts.MLdataset import *
+
+
+@pytest.fixture
+def dataset_files(tmp_path):
+    rng = np.random.default_rng(0)
+    structure_list = ['T{:02d}-1a-2a'.format(i) for i in range(12)]
+    ee = rng.uniform(-90, 90, size=12)
+    expdata_df = pd.DataFrame({'ee(%)': ee}, index=pd.Index(structure_list, name='structure'))
+    pair_data_df = pd.DataFrame({'DFT-mod_SPE_diff': ee * 0.01 + rng.normal(scale=0.05, size=12),
+                                 'DFT-mod_G_diff': rng.normal(size=12),
+                                 'xtb-mod_SPE_major': rng.normal(size=12),
+                                 'xtb-mod_SPE_minor': rng.normal(size=12)},
+                                index=expdata_df.index)
+    expdata_file = str(tmp_path / 'expdata.csv')
+    pair_data_file = str(tmp_path / 'pair_data.csv')
+    expdata_df.to_csv(expdata_file)
+    pair_data_df.to_csv(pair_data_file)
+    return expdata_file, pair_data_file
+
+
+def test_tensors_do_not_share_dataframe_memory(dataset_files):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # e.g. non-writable numpy array
+        dataset = PairDataset(*dataset_files, use_cache=False)
+    assert dataset.para_tensor.is_contiguous() and dataset.target_tensor.is_contiguous()
+    para_array = dataset.filtered_pair_data_df.to_numpy().copy()
+    target_array = dataset.expdata_enantio_df.to_numpy().copy()
+    dataset.para_tensor -= dataset.para_tensor.mean(0)  # in-place normalisation
+    dataset.target_tensor /= 100
+    np.testing.assert_array_equal(dataset.filtered_pair_data_df.to_numpy(), para_array)
+    np.testing.assert_array_equal(dataset.expdata_enantio_df.to_numpy(), target_array)
+
+
+def test_batches_follow_index(dataset_files):
+    dataset = PairDataset(*dataset_files, dtype=torch.float32, use_cache=False)
+    para, target = dataset.get_batch([3, 0])
+    assert para.dtype == torch.float32 and para.shape == (2, 4)
+    np.testing.assert_allclose(target.numpy(), dataset.expdata_enantio_df.to_numpy()[[3, 0]], rtol=1e-6)
+    np.testing.assert_allclose(dataset[5][0].numpy(), dataset.filtered_pair_data_df.iloc[5].to_numpy(), rtol=1e-6)
+
+
+def test_t_test_pvalue_matches_ols():
+    rng = np.random.default_rng(1)
+    n_case = 30
+    target = rng.normal(size=n_case)
+    para_array = np.column_stack([target * 0.5 + rng.normal(size=n_case),
+                                  rng.normal(size=n_case),
+                                  rng.normal(loc=1e3, size=n_case),
+                                  np.full(n_case, 2.5),  # constant column
+                                  np.full(n_case, np.nan)])
+    para_array[[2, 7, 11], 0] = np.nan
+    para_array[[0, 5], 1] = np.nan
+    para_array[3:, 4] = np.nan
+    para_array[:2, 4] = [1.0, 2.0]  # 2 valid cases only
+    target[9] = np.nan
+    t_value, p_value = get_t_test_pvalue(para_array, target)
+    for i in range(3):
+        valid = ~(np.isnan(para_array[:, i]) | np.isnan(target))
+        result = sm.OLS(target[valid], sm.add_constant(para_array[valid, i])).fit()
+        np.testing.assert_allclose(t_value[i], result.tvalues[1], rtol=1e-8)
+        np.testing.assert_allclose(p_value[i], result.pvalues[1], rtol=1e-8)
+    assert np.isnan(t_value[3:]).all() and np.isnan(p_value[3:]).all()
+
+
+def test_fdr_pvalue():
+    p_value = np.array([0.01, 0.04, 0.03, 0.005, np.nan, 0.2])
+    np.testing.assert_allclose(get_fdr_pvalue(p_value), [0.025, 0.05, 0.05, 0.025, np.nan, 0.2])
+    np.testing.assert_allclose(get_fdr_pvalue([0.01, 0.02, 0.03, 0.04, 0.05]), [0.05] * 5)
+    np.testing.assert_allclose(get_fdr_pvalue([0.5, 0.9]), [0.9, 0.9])
+    assert np.isnan(get_fdr_pvalue([np.nan, np.nan])).all()
+
+
+def assert_same_dataset(dataset, reference):
+    for name in STATE_LIST:
+        value, reference_value = getattr(dataset, name), getattr(reference, name)
+        if isinstance(reference_value, pd.DataFrame):
+            pd.testing.assert_frame_equal(value, reference_value)
+        elif isinstance(reference_value, pd.Series):
+            pd.testing.assert_series_equal(value, reference_value)
+        else:
+            assert value == reference_value, name
+    torch.testing.assert_close(dataset.para_tensor, reference.para_tensor)
+    torch.testing.assert_close(dataset.target_tensor, reference.target_tensor)
+
+
+@pytest.mark.parametrize('integer_index', [False, True])
+def test_cache_hit_matches_fresh_build(dataset_files, tmp_path, integer_index):
+    expdata_file, pair_data_file = dataset_files
+    if integer_index:  # numeric labels must not come back from npz as strings
+        for file_name in [expdata_file, pair_data_file]:
+            df = pd.read_csv(file_name, index_col=0)
+            df.index = pd.RangeIndex(100, 100 + len(df), name='structure')
+            df.to_csv(file_name)
+    cache_dir = str(tmp_path / 'cache')
+    setting_dict = {'major_minor_filter': ['minor'], 't_test_filter': True, 't_test_threshold': 0.5}
+    DATASET_CACHE.clear()
+    reference = PairDataset(expdata_file, pair_data_file, use_cache=False, **setting_dict)
+    PairDataset(expdata_file, pair_data_file, cache_dir=cache_dir, **setting_dict)  # fill cache
+    memory_hit = PairDataset(expdata_file, pair_data_file, cache_dir=cache_dir, **setting_dict)
+    DATASET_CACHE.clear()
+    disk_hit = PairDataset(expdata_file, pair_data_file, cache_dir=cache_dir, **setting_dict)
+    assert len(DATASET_CACHE) == 1
+    for dataset in [memory_hit, disk_hit]:
+        assert_same_dataset(dataset, reference)
+        assert dataset.full_pair_data_df is not None
+        assert list(dataset.structure_name_list) == list(reference.structure_name_list)
@@ -0,0 +1,85 @@
+import numpy as np
+from scripts.conformer import *
+
+# chiral, non-planar structure
+REF = np.array([[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.0, 1.2, 0.0], [0.0, 0.0, 0.9], [-0.7, -0.8, 0.6]])
+
+
+def rotation(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    k = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    return np.eye(3) + np.sin(angle) * k + (1 - np.cos(angle)) * k @ k
+
+
+def get_ensemble(rng):
+    '''
+    two distinct conformers, each with 3 rotated and shaken copies
+    '''
+    other = REF.copy()
+    other[4] = [0.9, 0.9, -0.9]
+    coord_list = []
+    for base in [REF, other]:
+        for k in range(3):
+            shaken = base + rng.normal(scale=0.01, size=base.shape)
+            coord_list.append(shaken @ rotation(rng.normal(size=3), rng.uniform(0, 2 * np.pi)).T + rng.normal(size=3))
+    return np.array(coord_list)
+
+
+def test_rmsd_rotation_translation_invariant():
+    rng = np.random.default_rng(0)
+    coord = np.array([REF @ rotation(rng.normal(size=3), rng.uniform(0, 2 * np.pi)).T + rng.normal(size=3) for i in range(10)])
+    np.testing.assert_allclose(get_rmsd(coord, REF), 0.0, atol=1e-6)
+    np.testing.assert_allclose(get_rmsd_matrix(coord, batch_size=3), 0.0, atol=1e-6)
+
+
+def test_rmsd_mirror_image_is_not_superposed():
+    mirror = REF * np.array([1.0, 1.0, -1.0])
+    rmsd = get_rmsd(np.array([mirror, mirror @ rotation([1, 2, 3], 1.0).T]), REF)
+    assert (rmsd > 0.1).all()
+    np.testing.assert_allclose(rmsd[0], rmsd[1], atol=1e-8)
+    # best proper rotation of the mirror image, found by brute force over rotations around random axes
+    rng = np.random.default_rng(1)
+    centered_ref = REF - REF.mean(0)
+    centered_mirror = mirror - mirror.mean(0)
+    brute = min(np.sqrt(((centered_mirror @ rotation(rng.normal(size=3), rng.uniform(0, 2 * np.pi)).T - centered_ref) ** 2).sum(-1).mean())
+                for i in range(20000))
+    assert rmsd[0] <= brute + 1e-8
+
+
+def test_rmsd_matrix_matches_rmsd():
+    coord = get_ensemble(np.random.default_rng(2))
+    rmsd_matrix = get_rmsd_matrix(coord, batch_size=4)
+    np.testing.assert_allclose(rmsd_matrix, rmsd_matrix.T)
+    np.testing.assert_array_equal(np.diag(rmsd_matrix), 0.0)
+    for k in range(len(coord)):
+        np.testing.assert_allclose(rmsd_matrix[k], get_rmsd(coord, coord[k]), atol=1e-6)
+
+
+def test_leader_and_hierarchical_clusters_agree():
+    coord = get_ensemble(np.random.default_rng(3))
+    energy = np.array([0.3, 0.1, 0.2, 0.05, 0.4, 0.6])
+    leader_label, leader_representative = cluster_conformers(coord, 0.2, energy, 'leader')
+    tree_label, tree_representative = cluster_conformers(coord, 0.2, energy, 'hierarchical')
+    assert leader_representative == tree_representative == [3, 1]  # lowest energy conformer of each cluster, by energy
+    assert leader_label.tolist() == tree_label.tolist() == [1, 1, 1, 0, 0, 0]
+
+
+def test_select_conformers_energy_window():
+    coord = get_ensemble(np.random.default_rng(4))
+    energy = np.array([0.0, 0.1, 0.2, 5.0, 5.1, 5.2]) / HARTREE_TO_KCAL  # second conformer 5 kcal/mol higher
+    assert select_conformers(coord, energy, energy_window=10.0, rmsd_threshold=0.2) == [0, 3]
+    assert select_conformers(coord, energy, energy_window=1.0, rmsd_threshold=0.2) == [0]
+    assert select_conformers(coord, energy, energy_window=1.0, rmsd_threshold=None) == [0, 1, 2]
+
+
+def test_select_conformers_empty_window():
+    coord = get_ensemble(np.random.default_rng(5))
+    energy = np.zeros(len(coord))
+    assert select_conformers(coord, energy, energy_window=-1.0) == []
+    assert select_conformers(coord[:0], energy[:0], energy_window=1.0) == []
+
+
+def test_boltzmann_weight():
+    weight = get_boltzmann_weight([0.0, 1.0 / HARTREE_TO_KCAL], 298.15)
+    np.testing.assert_allclose(weight.sum(), 1.0)
+    np.testing.assert_allclose(weight[1] / weight[0], np.exp(-1.0 / (R_KCAL * 298.15)))
@@ -0,0 +1,79 @@
+import os
+import sys
+import ast
+import subprocess
+import numpy as np
+from scripts.extractor import *
+
+XTB_LOG_LINE_LIST = ['        40        2.0000           -0.4123412             -11.2198 (HOMO)\n',
+                     '        41                         -0.2123412              -5.7780 (LUMO)\n',
+                     '          :: TOTAL ENERGY             -42.123456 Eh    ::\n',
+                     '          :: GRADIENT NORM              0.000123 Eh/a0 ::\n',
+                     '          :: HOMO-LUMO GAP              5.441800 eV    ::\n']
+
+
+def write_fchk(file_name, alpha_num, beta_num, alpha_energy, beta_energy=None):
+    def header(name, data_type, value=None, n=None):
+        if n is not None:
+            return '{:<40s}   {}   N={:12d}\n'.format(name, data_type, n)
+        return '{:<40s}   {}     {:>12}\n'.format(name, data_type, value)
+
+    def array(value_list):
+        return ''.join(''.join('{:16.8E}'.format(value) for value in value_list[i:i+5]) + '\n' for i in range(0, len(value_list), 5))
+
+    text = 'title\nSP        RB3LYP                                                      6-31G\n'
+    text += header('Number of atoms', 'I', 1) + header('Charge', 'I', 0) + header('Multiplicity', 'I', alpha_num - beta_num + 1)
+    text += header('Number of alpha electrons', 'I', alpha_num) + header('Number of beta electrons', 'I', beta_num)
+    text += header('Alpha Orbital Energies', 'R', n=len(alpha_energy)) + array(alpha_energy)
+    if beta_energy is not None:
+        text += header('Beta Orbital Energies', 'R', n=len(beta_energy)) + array(beta_energy)
+    with open(file_name, 'w') as f:
+        f.write(text)
+
+
+def test_closed_shell_orbital_window(tmp_path):
+    fchk_file = str(tmp_path / 'closed.fchk')
+    write_fchk(fchk_file, 3, 3, [-3.0, -2.0, -1.0, 0.5, 1.0, 2.0])
+    fchk = FchkFile(fchk_file)
+    homo_window, lumo_window = fchk.get_orbital_window(5)
+    fchk.close()
+    np.testing.assert_array_equal(homo_window, [-1.0, -2.0, -3.0, np.nan, np.nan])
+    np.testing.assert_array_equal(lumo_window, [0.5, 1.0, 2.0, np.nan, np.nan])
+    assert extract_gau_MO(fchk_file) == (-1.0, 0.5, -1.5)
+    record = parse_gau_fchk(fchk_file)
+    assert record['homo_window'] == [-1.0, -2.0, -3.0, None, None]
+    assert record['lumo_window'] == [0.5, 1.0, 2.0, None, None]
+
+
+def test_open_shell_orbital_window(tmp_path):
+    fchk_file = str(tmp_path / 'open.fchk')
+    write_fchk(fchk_file, 2, 1, [-3.0, -1.0, 0.5, 2.0], [-2.5, 0.2, 1.0, 3.0])
+    fchk = FchkFile(fchk_file)
+    homo_window, lumo_window = fchk.get_orbital_window(4)
+    fchk.close()
+    np.testing.assert_array_equal(homo_window, [-1.0, -2.5, -3.0, np.nan])
+    np.testing.assert_array_equal(lumo_window, [0.2, 0.5, 1.0, 2.0])
+
+
+def test_truncated_xtb_log(tmp_path):
+    log_file = tmp_path / 'model-xtb.log'
+    log_file.write_text(''.join(XTB_LOG_LINE_LIST[:2]) + '          :: TOTAL ENERGY             ******** Eh    ::\n')
+    record = parse_xtb_log(str(log_file))
+    status_dict = {}
+    data_dict = extract_xtb_record('xtb-mod', {'xtb_log': record}, ['SPE', 'Grad', 'EHOMO', 'ELUMO'], [], status_dict=status_dict)
+    assert np.isnan(data_dict['xtb-mod_SPE']) and np.isnan(data_dict['xtb-mod_Grad'])
+    assert data_dict['xtb-mod_EHOMO'] == -11.2198 and data_dict['xtb-mod_ELUMO'] == -5.778
+    assert status_dict == {'xtb-mod_SPE': STATUS_PARSE_ERROR, 'xtb-mod_Grad': STATUS_NOT_FOUND,
+                           'xtb-mod_EHOMO': STATUS_OK, 'xtb-mod_ELUMO': STATUS_OK}
+
+
+def test_truncated_xtb_log_without_asserts(tmp_path):
+    log_file = tmp_path / 'model-xtb.log'
+    log_file.write_text(''.join(XTB_LOG_LINE_LIST[:2]))
+    code = 'from scripts.extractor import *; print(parse_xtb_log({!r})["status_dict"])'.format(str(log_file))
+    result = subprocess.run([sys.executable, '-O', '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    status_dict = ast.literal_eval(result.stdout)
+    assert status_dict['SPE'] == STATUS_NOT_FOUND and status_dict['Grad'] == STATUS_NOT_FOUND
+    assert status_dict['EHOMO'] == STATUS_OK and status_dict['ELUMO'] == STATUS_OK
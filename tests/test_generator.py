@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import pytest
+from scripts.bench_extract import create_database
+from scripts.generator import *
+
+
+@pytest.fixture
+def bench_db(tmp_path):
+    create_database(str(tmp_path), 4, 5, 2)
+    return tmp_path
+
+
+def test_missing_and_broken_files_are_nan_with_status(bench_db):
+    os.remove(bench_db / 'xtb-mod' / 'Bench00000-1a-2a-major-xtb.log')
+    (bench_db / 'xtb-mod' / 'Bench00000-1a-2a-minor-xtb.charges').write_text('0.1\nnot-a-charge\n')
+    os.remove(bench_db / 'DFT-mod' / 'log' / 'Bench00001-1a-2a-minor-gau.log')
+
+    DB = DBgenerator(str(bench_db / 'rawmodel'))
+    DB.extract_xtb_result(dir_list=['xtb-mod'], discriptor_list=['SPE', 'charge'], atom_list=['1'], use_cache=False)
+    DB.extract_gaussian_result(dir_list=['DFT-mod'], discriptor_list=['SPE', 'charge'], atom_list=['1'], use_cache=False)
+    status_df = DB.get_status_df()
+
+    assert np.isnan(DB.data_dict['xtb-mod_SPE'][0])
+    assert status_df.loc['Bench00000-1a-2a-major', 'xtb-mod_SPE'] == STATUS_MISSING_FILE
+    assert np.isnan(DB.data_dict['xtb-mod_charge-1'][1])
+    assert status_df.loc['Bench00000-1a-2a-minor', 'xtb-mod_charge-1'] == STATUS_PARSE_ERROR
+    assert status_df.loc['Bench00001-1a-2a-minor', 'DFT-mod_SPE'] == STATUS_MISSING_FILE
+    assert status_df.loc['Bench00001-1a-2a-minor', 'DFT-mod_charge-1'] == STATUS_MISSING_FILE
+    # other structures are not affected
+    assert DB.data_dict['xtb-mod_SPE'][1:] == [-42.123456] * 3
+    assert DB.data_dict['DFT-mod_SPE'][:3] == [-1001.3579246] * 3
+    assert (status_df.drop(['Bench00000-1a-2a-major', 'Bench00000-1a-2a-minor', 'Bench00001-1a-2a-minor']) == STATUS_OK).all().all()
+
+
+def test_failed_files_are_not_cached(bench_db):
+    charge_file = bench_db / 'xtb-mod' / 'Bench00000-1a-2a-major-xtb.charges'
+    charge_file.write_text('x.xx\n')
+    stat = os.stat(charge_file)
+    DB = DBgenerator(str(bench_db / 'rawmodel'))
+    DB.extract_xtb_result(dir_list=['xtb-mod'], discriptor_list=['charge'], atom_list=['1'])
+    assert DB.status_dict['xtb-mod_charge-1'][0] == STATUS_PARSE_ERROR
+    charge_file.write_text('0.25\n')  # same size and mtime, a cached record would still be used
+    os.utime(charge_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    DB.extract_xtb_result(dir_list=['xtb-mod'], discriptor_list=['charge'], atom_list=['1'])
+    assert DB.status_dict['xtb-mod_charge-1'][0] == STATUS_OK
+    assert DB.data_dict['xtb-mod_charge-1'][0] == 0.25
+
+
+def test_geometry_missing_file_is_nan_with_status(bench_db):
+    os.remove(bench_db / 'DFT-mod' / 'log' / 'Bench00000-1a-2a-major-gau.log')
+    DB = DBgenerator(str(bench_db / 'rawmodel'))
+    DB.extract_geometry_result(dir_list=['DFT-mod'], distance_list=[('1', '2')], use_cache=False)
+    assert np.isnan(DB.data_dict['DFT-mod_dist-1-2'][0])
+    np.testing.assert_allclose(DB.data_dict['DFT-mod_dist-1-2'][1:], [np.sqrt(0.14)] * 3)
+    assert DB.get_status_df()['DFT-mod_dist-1-2'].tolist() == [STATUS_MISSING_FILE] + [STATUS_OK] * 3
+
+
+@pytest.fixture
+def small_db(tmp_path):
+    os.makedirs(tmp_path / 'rawmodel')
+    os.makedirs(tmp_path / 'utils')
+    for model_file in ['gaumodel.gjf', 'gauxtbmodel.gjf']:
+        (tmp_path / 'utils' / model_file).write_text('%nproc=8\n#p b3lyp opt\n\ntitle\n\n0 1\n[geometry]\n\n')
+    for model in ['T01-1a-2a-major', 'T01-1a-2a-minor']:
+        (tmp_path / 'rawmodel' / (model + '.gjf')).write_text('#p opt\n\ntitle\n\n0 1\n C 0.0 0.0 0.0\n H 0.0 0.0 1.0\n\n')
+    return tmp_path
+
+
+def test_conformation_stage_only_used_with_use_conformation(small_db):
+    DB = DBgenerator(str(small_db / 'rawmodel'))
+    assert 'conformation' not in DB.generator_dict
+    assert 'conformation' not in DB.get_stage_list()
+    DB.generate_all_first_step()
+    assert not os.path.exists(small_db / 'conformation')
+    assert os.path.exists(small_db / 'DFT-mod' / 'T01-1a-2a-major-gau.gjf')
+
+    DB = DBgenerator(str(small_db / 'rawmodel'), use_conformation=True)
+    assert 'conformation' in DB.generator_dict
+    assert DB.stage_dict['DFT-mod'].parent == 'conformation'
+
+
+def test_stage_file_is_only_seen_by_its_database(small_db, tmp_path_factory):
+    (small_db / 'utils' / 'stages.json').write_text(
+        '[{"name": "DFT-mod-gau-sp-tz", "parent": "DFT-mod", "suffix": "-gautzsp", "engine": "gau", '
+        '"source_file": "log/{}.log", "model_file": "gautzmodel.gjf"}]')
+    other_db = tmp_path_factory.mktemp('other')
+    os.makedirs(other_db / 'rawmodel')
+    (other_db / 'rawmodel' / 'T02-1a-2a-major.gjf').write_text('#p opt\n\ntitle\n\n0 1\n C 0.0 0.0 0.0\n\n')
+
+    DB = DBgenerator(str(small_db / 'rawmodel'))
+    other_DB = DBgenerator(str(other_db / 'rawmodel'))
+    assert 'DFT-mod-gau-sp-tz' in DB.stage_dict and 'DFT-mod-gau-sp-tz' in DB.generator_dict
+    assert 'DFT-mod-gau-sp-tz' not in other_DB.stage_dict and 'DFT-mod-gau-sp-tz' not in other_DB.generator_dict
+    assert 'DFT-mod-gau-sp-tz' not in STAGE_REGISTRY
+    assert DB._get_gau_key_list(['DFT-mod-gau-sp-tz'], ['SPE'])[0] == [('DFT-mod-gau-sp-tz', 'gau_log')]
+    with pytest.raises(AssertionError):
+        other_DB._get_gau_key_list(['DFT-mod-gau-sp-tz'], ['SPE'])
+
+
+def test_pair_data_duplicated_structure_keeps_first(small_db, capsys):
+    DB = DBgenerator(str(small_db / 'rawmodel'))
+    DB.data_dict = {'structure': ['A-1a-major', 'A-1a-minor', 'A-1a-major', 'B-1a-minor', 'B-1a-major', 'C-1a-major'],
+                    'xtb-mod_SPE': [3.0, 1.0, 10.0, 2.0, 5.0, 7.0]}
+    pair_data_df = DB.get_pair_data_df()
+    assert 'duplicated structures dropped' in capsys.readouterr().out
+    assert pair_data_df['structure'].tolist() == ['A-1a', 'B-1a']
+    assert pair_data_df['xtb-mod_SPE_major'].tolist() == [3.0, 5.0]
+    assert pair_data_df['xtb-mod_SPE_diff'].tolist() == [2.0, 3.0]
+    pair_data_df = DB.get_pair_data_df(keep_unpaired=True)
+    assert pair_data_df['structure'].tolist() == ['A-1a', 'B-1a', 'C-1a']
+    assert np.isnan(pair_data_df['xtb-mod_SPE_diff'].iloc[2])
@@ -0,0 +1,39 @@
+import numpy as np
+from scripts.geometry import *
+
+# ethyl iodide like structure: scaffold I-C(2) behind the attachment atom C(0), methyl substituent C(1) H(3-5)
+ATOM_NUMBER = np.array([[6, 6, 6, 1, 1, 1, 53]])
+COORD = np.array([[[0.0, 0.0, 0.0], [0.0, 0.0, 1.54], [0.0, 0.0, -1.54],
+                   [1.03, 0.0, 1.90], [-0.51, 0.89, 1.90], [-0.51, -0.89, 1.90],
+                   [2.0, 0.0, -2.3]]])
+
+
+def test_substituent_mask_cuts_bond():
+    mask = get_substituent_mask(COORD, ATOM_NUMBER, 0, 1)
+    assert mask[0].tolist() == [False, True, False, True, True, True, False]
+    mask = get_substituent_mask(COORD, ATOM_NUMBER, 0, 2)
+    assert mask[0].tolist() == [False, False, True, False, False, False, True]
+
+
+def test_sterimol_default_substituent_excludes_scaffold():
+    default = get_sterimol(COORD, ATOM_NUMBER, [(0, 1)])
+    explicit = get_sterimol(COORD, ATOM_NUMBER, [(0, 1)], substituent_list=[[1, 3, 4, 5]])
+    for value, expected in zip(default, explicit):
+        np.testing.assert_allclose(value, expected)
+    L, B1, B5 = default
+    np.testing.assert_allclose(L, [[1.54 + 1.70]])  # methyl carbon reaches further than its hydrogens
+    np.testing.assert_allclose(B5, [[1.03 + 1.20]], atol=1e-2)  # iodine of scaffold is not counted
+    assert B1[0, 0] < B5[0, 0]
+
+
+def test_sterimol_bond_in_ring_is_nan():
+    atom_number = np.array([[6, 6, 6]])
+    coord = np.array([[[0.0, 0.0, 0.0], [1.5, 0.0, 0.0], [0.75, 1.3, 0.0]]])
+    L, B1, B5 = get_sterimol(coord, atom_number, [(0, 1)])
+    assert np.isnan(L).all() and np.isnan(B1).all() and np.isnan(B5).all()
+
+
+def test_sterimol_padded_structure_is_nan():
+    atom_number, coord = stack_structures([ATOM_NUMBER[0].tolist(), []], [COORD[0].tolist(), []])
+    L, B1, B5 = get_sterimol(coord, atom_number, [(0, 1)])
+    assert np.isfinite(L[0, 0]) and np.isnan(L[1, 0])
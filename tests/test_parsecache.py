@@ -0,0 +1,35 @@
+import scripts.extractor as extractor
+from scripts.parsecache import ParseCache
+
+
+def test_file_changed_while_parsing_is_parsed_again(tmp_path, monkeypatch):
+    charge_file = tmp_path / 'model-charges'
+    charge_file.write_text('0.1\n-0.2\n')
+
+    def parse_and_append(file_name):  # the job writes more output while the file is parsed
+        record = extractor.parse_xtb_charges(file_name)
+        with open(file_name, 'a') as f:
+            f.write('0.3\n')
+        return record
+
+    monkeypatch.setitem(extractor.PARSER_DICT, 'xtb_charges', (parse_and_append, 1))
+    cache = ParseCache(str(tmp_path / 'cache.sqlite'))
+    record_list = extractor.parse_all_structures([[('xtb_charges', str(charge_file))]], cache=cache)
+    assert record_list[0][0]['charge'] == [0.1, -0.2]
+    assert cache.get(str(charge_file), 'xtb_charges', 1) is None  # stale record is not used
+
+    monkeypatch.setitem(extractor.PARSER_DICT, 'xtb_charges', (extractor.parse_xtb_charges, 1))
+    record_list = extractor.parse_all_structures([[('xtb_charges', str(charge_file))]], cache=cache)
+    assert record_list[0][0]['charge'] == [0.1, -0.2, 0.3]
+    assert cache.get(str(charge_file), 'xtb_charges', 1) == {'charge': [0.1, -0.2, 0.3]}
+    cache.close()
+
+
+def test_unchanged_file_is_loaded_from_cache(tmp_path):
+    charge_file = tmp_path / 'model-charges'
+    charge_file.write_text('0.1\n-0.2\n')
+    cache = ParseCache(str(tmp_path / 'cache.sqlite'))
+    extractor.parse_all_structures([[('xtb_charges', str(charge_file))]], cache=cache)
+    record_list = extractor.parse_all_structures([[('xtb_charges', str(charge_file))]], cache=cache)
+    assert record_list[0][0] == {'charge': [0.1, -0.2]}
+    cache.close()
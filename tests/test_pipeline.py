@@ -0,0 +1,19 @@
+import os
+import scripts.pipeline
+from scripts.generator import *
+
+
+def test_xtb_nodes_use_model_charge(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'rawmodel')
+    os.makedirs(tmp_path / 'utils')
+    for model, charge_line in [('T01-1a-2a-major', '0 1'), ('T01-1a-2a-minor', '-1 2')]:
+        (tmp_path / 'rawmodel' / (model + '.gjf')).write_text('#p opt\n\ntitle\n\n{}\n C 0.0 0.0 0.0\n H 0.0 0.0 1.0\n\n'.format(charge_line))
+    job_list = []
+    def fake_run_xtb_job(xyz_name, charge=0, uhf=0, *args):
+        job_list.append((os.path.basename(xyz_name), charge, uhf))
+        return False
+    monkeypatch.setattr(scripts.pipeline, 'run_xtb_job', fake_run_xtb_job)
+
+    DB = DBgenerator(str(tmp_path / 'rawmodel'))
+    DB.run_pipeline(['xtb-mod'], interval=0.01, max_attempt=1)
+    assert sorted(job_list) == [('T01-1a-2a-major-xtb.xyz', 0, 0), ('T01-1a-2a-minor-xtb.xyz', -1, 1)]
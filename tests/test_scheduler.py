@@ -0,0 +1,63 @@
+import subprocess
+import scripts.scheduler as scheduler
+from scripts.scheduler import SGEScheduler
+
+QSTAT_HEADER = ('job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID\n'
+                '-----------------------------------------------------------------------------------------------------------------\n')
+
+
+def fake_run(result_list):
+    def run(cmd, **kwargs):
+        result = result_list.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return subprocess.CompletedProcess(cmd, result[0], result[1], result[2])
+    return run
+
+
+def qacct_output(failed, exit_status):
+    return ('==============================================================\n'
+            'qname        all.q\n'
+            'jobname      job\n'
+            'failed       {}\n'
+            'exit_status  {}\n').format(failed, exit_status)
+
+
+def test_qstat_failure_keeps_last_state(monkeypatch):
+    sge = SGEScheduler()
+    sge.job_dict = {'101': 'job-a', '102': 'job-b'}
+    running = QSTAT_HEADER + '    101 0.5 job-a user r 01/01/2024 00:00:00 all.q@node1 8\n' \
+                             '    102 0.5 job-b user qw 01/01/2024 00:00:00 8\n'
+    monkeypatch.setattr(scheduler.subprocess, 'run', fake_run([
+        (0, running, ''),
+        (1, '', 'error: failed receiving gdi request'),
+        subprocess.TimeoutExpired('qstat', 60),
+        (0, QSTAT_HEADER, ''),
+        (0, qacct_output(0, 0), ''),
+        (0, qacct_output(0, 0), ''),
+    ]))
+    assert sge.poll('101') == 'running'
+    assert sorted(sge.get_in_flight()) == ['101', '102']  # qstat exit code 1
+    assert sorted(sge.get_in_flight()) == ['101', '102']  # qstat timed out
+    assert sge.get_in_flight() == []  # jobs left the queue
+
+
+def test_qstat_failure_before_first_poll_is_queued(monkeypatch):
+    sge = SGEScheduler()
+    sge.job_dict = {'201': 'job-c'}
+    monkeypatch.setattr(scheduler.subprocess, 'run', fake_run([(1, '', 'cannot reach qmaster')]))
+    assert sge.poll('201') == 'queued'
+
+
+def test_exit_status_of_jobs_left_queue(monkeypatch):
+    sge = SGEScheduler()
+    sge.job_dict = {'301': 'job-ok', '302': 'job-killed', '303': 'job-error', '304': 'job-no-record'}
+    monkeypatch.setattr(scheduler.subprocess, 'run', fake_run([
+        (0, QSTAT_HEADER, ''), (0, qacct_output(0, 0), ''),
+        (0, QSTAT_HEADER, ''), (0, qacct_output('100 : assumedly after job', 137), ''),  # killed by the queue, e.g. h_rt exceeded
+        (0, QSTAT_HEADER, ''), (0, qacct_output(0, 1), ''),
+        (0, QSTAT_HEADER, ''), (1, '', 'error: job id 304 not found'),
+        (0, QSTAT_HEADER, ''),  # states are kept, qacct is not called again
+    ]))
+    assert sge.wait_all(interval=0) == {'301': 'finished', '302': 'failed', '303': 'failed', '304': 'finished'}
+    assert sge.get_in_flight() == []